@@ -0,0 +1,12 @@
+"""Loads the translator's core module (translator_core.py) for the benchmark scripts."""
+import importlib
+import os
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+def load_app():
+    """Imports translator_core from the repository root (no GUI, HTTP clients loaded on first use)."""
+    if ROOT not in sys.path:
+        sys.path.insert(0, ROOT)
+    return importlib.import_module("translator_core")
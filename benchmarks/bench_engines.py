@@ -0,0 +1,62 @@
+"""
+Compares the thread-pool and asyncio translation engines at equal concurrency.
+The local mock endpoint answers every request after a fixed delay, so the numbers
+reflect engine overhead rather than the real API.
+
+Usage: python benchmarks/bench_engines.py [--requests 400] [--latency 0.05] [--concurrency 10 50 100 200]
+"""
+import argparse
+import threading
+import time
+
+from _app import load_app
+from mock_server import MockConfig, MockDeepSeekServer
+
+app = load_app()
+
+
+def run_engine(engine_name, concurrency, request_count):
+    batches = [[(i, f"line {i}")] for i in range(request_count)]
+    done = []
+    peak_threads = threading.active_count()
+
+    def on_result(batch, translations, error):
+        nonlocal peak_threads
+        done.append(error is None)
+        peak_threads = max(peak_threads, threading.active_count())
+
+    app.configure_rate_controller(concurrency)
+    engine = app.TRANSLATION_ENGINES[engine_name](concurrency, log_func=lambda message: None)
+    start = time.perf_counter()
+    engine.run(batches, "benchmark-key", "auto", "zh", app.DEFAULT_MODEL, on_result)
+    elapsed = time.perf_counter() - start
+    engine.close()
+    return elapsed, sum(done), peak_threads
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=400)
+    parser.add_argument("--latency", type=float, default=0.05, help="Server-side delay per request in seconds")
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[10, 50, 100, 200])
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(MockConfig(latency=f"fixed:{args.latency}")).start()
+    app.DEEPSEEK_API_URL = server.url
+
+    engines = [name for name in app.TRANSLATION_ENGINES if name != "asyncio" or app.aiohttp_available()]
+    if "asyncio" not in engines:
+        print("aiohttp is not installed; benchmarking the thread engine only.")
+
+    print(f"{args.requests} requests, {args.latency * 1000:.0f} ms server latency")
+    print(f"{'engine':<10}{'concurrency':>12}{'seconds':>10}{'req/s':>10}{'ok':>8}{'peak threads':>14}")
+    for concurrency in args.concurrency:
+        for engine_name in engines:
+            elapsed, ok, peak_threads = run_engine(engine_name, concurrency, args.requests)
+            print(f"{engine_name:<10}{concurrency:>12}{elapsed:>10.2f}{args.requests / elapsed:>10.1f}{ok:>8}{peak_threads:>14}")
+
+    server.stop()
+
+
+if __name__ == "__main__":
+    main()
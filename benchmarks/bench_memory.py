@@ -0,0 +1,110 @@
+"""
+Memory used to hold a parsed and translated file, by subtitle representation.
+
+Compares the original Subtitle class (one __dict__ per cue, string timestamps, a
+new object per translated cue), the __slots__ Subtitle, and SubtitleStore (typed
+arrays, integer-ms times, shared duplicate texts, translations filled in place).
+Translations are simulated, so every variant stores the same strings.
+
+Usage: python benchmarks/bench_memory.py [--cues 500000] [--duplicates 0.3]
+"""
+import argparse
+import gc
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+
+from _app import load_app
+from bench_parser import format_timestamp
+
+app = load_app()
+
+
+class DictSubtitle:
+    """The Subtitle class as it was before __slots__."""
+
+    def __init__(self, index, start_time, end_time, content):
+        self.index = index
+        self.start_time = start_time
+        self.end_time = end_time
+        self.content = content
+
+
+def write_srt(path, cue_count, duplicates, seed=1):
+    """Writes cue_count cues, about `duplicates` of which repeat an earlier line (as real subtitles do)."""
+    rng = random.Random(seed)
+    seen = []
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, cue_count + 1):
+            if seen and rng.random() < duplicates:
+                text = rng.choice(seen)
+            else:
+                text = f"Line {i} of the benchmark subtitle file.\nSecond line, café #{i % 97}."
+                if len(seen) < 1000:
+                    seen.append(text)
+            start = i * 1000
+            f.write(f"{i}\n{format_timestamp(start)} --> {format_timestamp(start + 800)}\n{text}\n\n")
+
+
+def translate(text):
+    return f"<tr> {text}"
+
+
+def dict_subtitles(path):
+    """Old pipeline: parsed objects plus a new object per translated cue."""
+    subtitles = [DictSubtitle(*fields) for fields in app.NativeSrtParser._iter_block_fields(path, quiet)]
+    results = [DictSubtitle(sub.index, sub.start_time, sub.end_time, translate(sub.content)) for sub in subtitles]
+    return subtitles, results
+
+
+def slotted_subtitles(path):
+    subtitles = list(app.NativeSrtParser.iter_parse(path, quiet))
+    results = [app.Subtitle(sub.index, sub.start_time, sub.end_time, translate(sub.content)) for sub in subtitles]
+    return subtitles, results
+
+
+def subtitle_store(path):
+    store = app.NativeSrtParser.parse_store(path, quiet)
+    for position, content in enumerate(store.contents):
+        store.translated[position] = translate(content)
+    return store
+
+
+def quiet(message):
+    pass
+
+
+def measure(label, func, path, cue_count):
+    gc.collect()
+    start = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - start
+    gc.collect()
+    tracemalloc.start()
+    kept = func(path)
+    retained, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    del kept
+    print(f"{label:<22}{elapsed:>10.2f}{retained / 1e6:>14.1f}{peak / 1e6:>10.1f}{retained / cue_count:>12.0f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, default=500000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="Fraction of cues repeating an earlier line")
+    args = parser.parse_args()
+
+    path = os.path.join(tempfile.mkdtemp(), "bench.srt")
+    write_srt(path, args.cues, args.duplicates)
+    print(f"{args.cues} cues, {os.path.getsize(path) / 1e6:.1f} MB, {args.duplicates:.0%} repeated lines")
+    print(f"{'representation':<22}{'seconds':>10}{'retained MB':>14}{'peak MB':>10}{'bytes/cue':>12}")
+    measure("Subtitle (__dict__)", dict_subtitles, path, args.cues)
+    measure("Subtitle (__slots__)", slotted_subtitles, path, args.cues)
+    measure("SubtitleStore", subtitle_store, path, args.cues)
+    os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,68 @@
+"""
+Compares NativeSrtParser.parse with the streaming NativeSrtParser.iter_parse.
+Generates an SRT file of the requested size, then reports throughput and peak
+traced memory for parse(), list(iter_parse()) and a pure streaming pass.
+
+Usage: python benchmarks/bench_parser.py [--cues 200000] [--keep FILE]
+"""
+import argparse
+import os
+import tempfile
+import time
+import tracemalloc
+
+from _app import load_app
+
+app = load_app()
+
+
+def format_timestamp(ms):
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+
+def write_srt(path, cue_count):
+    with open(path, "w", encoding="utf-8") as f:
+        for i in range(1, cue_count + 1):
+            start = i * 1000
+            f.write(f"{i}\n{format_timestamp(start)} --> {format_timestamp(start + 800)}\n")
+            f.write(f"Line {i} of the benchmark subtitle file.\nSecond line, café #{i % 97}.\n\n")
+
+
+def measure(label, func, file_size):
+    start = time.perf_counter()
+    count = func()
+    elapsed = time.perf_counter() - start
+    # Second pass for memory, since tracing slows the parser down considerably
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"{label:<22}{count:>10}{elapsed:>10.2f}{file_size / elapsed / 1e6:>10.1f}{count / elapsed:>12.0f}{peak / 1e6:>12.1f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, default=200000)
+    parser.add_argument("--keep", help="Write the generated file here instead of a temporary file")
+    args = parser.parse_args()
+
+    path = args.keep or os.path.join(tempfile.mkdtemp(), "bench.srt")
+    write_srt(path, args.cues)
+    file_size = os.path.getsize(path)
+    quiet = lambda message: None
+
+    print(f"{args.cues} cues, {file_size / 1e6:.1f} MB")
+    print(f"{'parser':<22}{'cues':>10}{'seconds':>10}{'MB/s':>10}{'cues/s':>12}{'peak MB':>12}")
+    measure("parse", lambda: len(app.NativeSrtParser.parse(path, quiet)), file_size)
+    measure("list(iter_parse)", lambda: len(list(app.NativeSrtParser.iter_parse(path, quiet))), file_size)
+    measure("iter_parse (stream)", lambda: sum(1 for _ in app.NativeSrtParser.iter_parse(path, quiet)), file_size)
+
+    if not args.keep:
+        os.remove(path)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,141 @@
+"""
+End-to-end benchmark of the file pipeline against the local mock endpoint.
+
+Starts a MockDeepSeekServer, generates SRT files of each requested size and runs
+translate_srt_file (parse -> batched translation -> ordered write) on each one in
+a fresh subprocess, so peak RSS is measured per size. Reports cues/s, per-attempt
+request latency percentiles and retries (from the app's request metrics), tokens,
+the share of prompt tokens served from the (mock) context cache and peak memory.
+With --second-backend, a second mock endpoint with its own latency is added as a
+backend next to the first (equal weights), e.g. to measure --hedge against a slow
+or flaky provider.
+
+Usage:
+    python benchmarks/bench_pipeline.py [--cues 100 1000 10000 100000] [--threads 10] [--engine threads]
+        [--batch-size 20] [--latency lognormal:0.3,0.5] [--rate-429 0.02] [--rate-5xx 0.01]
+        [--second-backend lognormal:0.3,1.2 [--hedge]]
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+from bench_parser import write_srt
+from mock_server import MockConfig, MockDeepSeekServer, add_config_arguments, config_from_args
+
+
+def run_worker(args):
+    """Runs one file through the pipeline and prints a JSON line with the measurements."""
+    from _app import load_app
+    app = load_app()
+    app.RETRY_DELAY = args.retry_delay
+
+    work_dir = tempfile.mkdtemp()
+    input_file = os.path.join(work_dir, "bench.srt")
+    output_file = os.path.join(work_dir, "bench_out.srt")
+    write_srt(input_file, args.worker)
+
+    app.configure_rate_controller(args.threads)
+    metrics = app.configure_request_metrics()
+    backends = app.configure_backends(args.backends_file, args.hedge, args.threads, log_func=lambda message: None)
+    engine = app.TRANSLATION_ENGINES[args.engine](args.threads, log_func=lambda message: None, stream=args.stream)
+    start = time.perf_counter()
+    try:
+        # Retry warnings are printed from the worker threads; keep them out of the report
+        with contextlib.redirect_stdout(io.StringIO()):
+            result = app.translate_srt_file(input_file, output_file, "bench-key", "English", "Chinese",
+                                            engine, batch_size=args.batch_size, log_func=lambda message: None)
+    finally:
+        engine.close()
+        backends.close()
+    elapsed = time.perf_counter() - start
+
+    stats = metrics.snapshot()
+    latency = stats["attempt_latency_seconds"]
+    print(json.dumps({
+        "cues": result.total,
+        "seconds": elapsed,
+        "cues_per_second": result.total / elapsed if elapsed else 0.0,
+        "requests": stats["requests"],
+        "p50": latency["p50"],
+        "p95": latency["p95"],
+        "p99": latency["p99"],
+        "retries": stats["retries"],
+        "tokens": stats["tokens"]["prompt"] + stats["tokens"]["completion"],
+        "cache_hit_rate": stats["prompt_cache_hit_rate"] or 0.0,
+        "errors": result.errors,
+        "backends": {name: {"wins": backend["wins"], "attempts": backend["attempts"], "hedges": backend["hedges"],
+                            "hedge_wins": backend["hedge_wins"]}
+                     for name, backend in backends.snapshot()["backends"].items()} if args.backends_file else None,
+        # ru_maxrss is in kilobytes on Linux and bytes on macOS
+        "peak_rss_mb": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / (1e6 if sys.platform == "darwin" else 1e3),
+    }))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cues", type=int, nargs="+", default=[100, 1000, 10000, 100000])
+    parser.add_argument("--threads", type=int, default=10, help="Concurrent requests")
+    parser.add_argument("--engine", choices=["threads", "asyncio"], default="threads")
+    parser.add_argument("--stream", action="store_true", help="Stream replies (see --rate-runaway and --token-interval)")
+    parser.add_argument("--batch-size", type=int, default=20, help="Cues per request")
+    parser.add_argument("--retry-delay", type=float, default=0.2, help="Overrides RETRY_DELAY so injected errors don't dominate")
+    parser.add_argument("--second-backend", metavar="LATENCY", help="Add a second mock backend with this latency spec")
+    parser.add_argument("--hedge", action="store_true", default=None, help="Hedge slow requests on the other backend")
+    parser.add_argument("--worker", type=int, help=argparse.SUPPRESS)
+    parser.add_argument("--backends-file", help=argparse.SUPPRESS)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    if args.worker:
+        run_worker(args)
+        return
+
+    server = MockDeepSeekServer(config_from_args(args)).start()
+    env = dict(os.environ, DEEPSEEK_API_URL=server.url)
+    second = None
+    backend_args = []
+    if args.second_backend:
+        second = MockDeepSeekServer(MockConfig(latency=args.second_backend, seed=args.seed)).start()
+        backends_file = os.path.join(tempfile.mkdtemp(), "backends.json")
+        with open(backends_file, "w", encoding="utf-8") as f:
+            json.dump({"backends": [{"name": "first", "url": server.url}, {"name": "second", "url": second.url}]}, f)
+        backend_args = ["--backends-file", backends_file] + (["--hedge"] if args.hedge else [])
+        print(f"second backend latency {args.second_backend}{', hedging' if args.hedge else ''}")
+    print(f"latency {args.latency}, 429 rate {args.rate_429}, 5xx rate {args.rate_5xx}, "
+          f"truncation rate {args.rate_truncated}, runaway rate {args.rate_runaway}, {args.engine} engine{' (streaming)' if args.stream else ''}, {args.threads} concurrent requests, "
+          f"{args.batch_size} cues/request")
+    print(f"{'cues':>8}{'seconds':>10}{'cues/s':>10}{'requests':>10}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+          f"{'retries':>9}{'tokens':>10}{'cached':>8}{'errors':>8}{'peak MB':>9}")
+    try:
+        for cue_count in args.cues:
+            command = [sys.executable, os.path.abspath(__file__), "--worker", str(cue_count),
+                       "--threads", str(args.threads), "--engine", args.engine] + (["--stream"] if args.stream else []) + ["--batch-size", str(args.batch_size),
+                       "--retry-delay", str(args.retry_delay)] + backend_args
+            completed = subprocess.run(command, env=env, capture_output=True, text=True)
+            if completed.returncode != 0:
+                print(f"{cue_count:>8}  failed:\n{completed.stderr}")
+                continue
+            row = json.loads(completed.stdout.strip().splitlines()[-1])
+            print(f"{row['cues']:>8}{row['seconds']:>10.2f}{row['cues_per_second']:>10.0f}{row['requests']:>10}"
+                  f"{row['p50'] * 1000:>9.0f}{row['p95'] * 1000:>9.0f}{row['p99'] * 1000:>9.0f}"
+                  f"{row['retries']:>9}{row['tokens']:>10}{row['cache_hit_rate']:>8.0%}{row['errors']:>8}{row['peak_rss_mb']:>9.1f}")
+            if row["backends"]:
+                print("          " + ", ".join(f"{name}: {stats['wins']} replies used of {stats['attempts']} attempts, "
+                                            f"{stats['hedge_wins']}/{stats['hedges']} hedges won"
+                                            for name, stats in row["backends"].items()))
+    finally:
+        server.stop()
+        if second:
+            second.stop()
+    print(f"Server stats: {server.stats.as_dict()}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,118 @@
+"""
+Start-up time of the translator, so slow imports creeping back in get noticed.
+
+Each scenario runs in a fresh interpreter and is timed from process start until
+it is ready: bare Python (the floor), importing translator_core and translator_gui,
+the command line up to its --help text, the first request's HTTP client import,
+and the GUI until its window has been drawn (skipped without a display). The
+modules are byte-compiled first so compilation isn't measured. Also lists the
+slow modules (tkinter, the HTTP clients, asyncio) each import pulls in; importing
+translator_core should pull in none of them.
+
+Usage: python benchmarks/bench_startup.py [--runs 10] [--max-core-ms 150]
+"""
+import argparse
+import compileall
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from _app import ROOT
+
+SLOW_MODULES = ("tkinter", "requests", "httpx", "aiohttp", "asyncio")
+
+# name -> code run in the fresh interpreter; it prints READY once started up
+SCENARIOS = {
+    "python": "print('READY')",
+    "import translator_core": "import translator_core\nprint('READY')",
+    "import translator_gui": "import translator_gui\nprint('READY')",
+    "code.py --help": None, # Run as a script, see command_for
+    "first request's client": "import translator_core\ntranslator_core.HttpSessionPool()._get_client()\nprint('READY')",
+    "window shown": (
+        "import tkinter as tk\n"
+        "try:\n"
+        "    root = tk.Tk()\n"
+        "except tk.TclError as e:\n"
+        "    print('SKIPPED', e)\n"
+        "    raise SystemExit\n"
+        "import translator_gui\n"
+        "translator_gui.TranslatorApp(root)\n"
+        "root.update() # Maps and draws the window\n"
+        "print('READY', flush=True)\n"
+        "root.destroy()\n"),
+}
+
+LOADED = "import sys\nprint('LOADED', ','.join(name for name in {modules} if name in sys.modules))\n"
+
+
+def command_for(name, code):
+    if code is None:
+        return [sys.executable, os.path.join(ROOT, "code.py"), "--help"]
+    return [sys.executable, "-c", code.rstrip("\n") + "\n" + LOADED.format(modules=SLOW_MODULES)]
+
+
+def time_once(command):
+    """Seconds until the process printed READY (or exited), plus its output."""
+    start = time.perf_counter()
+    process = subprocess.Popen(command, cwd=ROOT, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+    elapsed = None
+    lines = []
+    for line in process.stdout:
+        lines.append(line.strip())
+        if line.startswith("READY") and elapsed is None:
+            elapsed = time.perf_counter() - start
+    stderr = process.stderr.read()
+    process.wait()
+    if process.returncode != 0:
+        raise RuntimeError(f"{' '.join(command[:2])} failed:\n{stderr}")
+    if elapsed is None:
+        elapsed = time.perf_counter() - start
+    return elapsed, lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10, help="Runs of each scenario (the median is reported)")
+    parser.add_argument("--max-core-ms", type=float,
+                        help="Exit with status 1 if importing translator_core takes longer than this (median)")
+    args = parser.parse_args()
+
+    for name in ("translator_core.py", "translator_gui.py", "code.py"):
+        compileall.compile_file(os.path.join(ROOT, name), quiet=1)
+
+    print(f"{args.runs} runs each, {sys.executable} {sys.version.split()[0]}")
+    print(f"{'scenario':<26}{'median ms':>11}{'min ms':>9}{'max ms':>9}  slow modules loaded")
+    medians = {}
+    for name, code in SCENARIOS.items():
+        command = command_for(name, code)
+        times = []
+        lines = []
+        for _ in range(args.runs):
+            elapsed, lines = time_once(command)
+            if any(line.startswith("SKIPPED") for line in lines):
+                break
+            times.append(elapsed)
+        skipped = next((line for line in lines if line.startswith("SKIPPED")), None)
+        if skipped:
+            print(f"{name:<26}{'skipped (no display: ' + skipped[8:] + ')':>29}")
+            continue
+        loaded = next((line[7:] for line in lines if line.startswith("LOADED")), "n/a")
+        medians[name] = statistics.median(times) * 1000
+        print(f"{name:<26}{medians[name]:>11.1f}{min(times) * 1000:>9.1f}{max(times) * 1000:>9.1f}  {loaded or '-'}")
+
+    status = 0
+    core_loaded = time_once(command_for("import translator_core", SCENARIOS["import translator_core"]))[1]
+    if any(line.startswith("LOADED ") and line[7:] for line in core_loaded):
+        print("Regression: importing translator_core loads slow modules that should be imported on first use.")
+        status = 1
+    if args.max_core_ms is not None and medians["import translator_core"] > args.max_core_ms:
+        print(f"Regression: importing translator_core took {medians['import translator_core']:.1f} ms "
+              f"(limit {args.max_core_ms:g} ms).")
+        status = 1
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(main())
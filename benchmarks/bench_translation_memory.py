@@ -0,0 +1,114 @@
+"""
+Lookup latency and recall of the fuzzy translation memory at scale.
+
+Fills a fresh TranslationMemory with synthetic subtitle lines, then looks up three
+kinds of lines: variants of stored lines that differ only in case, punctuation and
+speaker dashes (normalized hits), variants with a one-letter typo (fuzzy hits), and
+lines that were never stored (misses). Reports per-lookup p50/p99 latency, how many
+lookups found the stored line, and how many could have (their trigram similarity to
+it reaches the threshold), so index misses show as found < eligible.
+
+Usage: python benchmarks/bench_translation_memory.py [--segments 200000 1000000] [--lookups 2000] [--threshold 0.9]
+"""
+import argparse
+import os
+import random
+import tempfile
+import time
+
+from _app import load_app
+
+app = load_app()
+
+WORDS = ("the you what we he she they this that here there now come go know think want need tell look "
+         "time night day home house door car money man woman father mother brother sister friend police "
+         "never always maybe really right okay sorry please thank wait stop listen remember believe happen "
+         "kill find leave stay keep call help talk work love hate little big old new last first good bad").split()
+
+
+def make_vocabulary(size=5000, seed=2):
+    """Common words first, then made-up ones, with Zipf-like weights as in real dialogue."""
+    rng = random.Random(seed)
+    syllables = ["ba", "ker", "lo", "min", "tra", "vel", "son", "da", "ri", "ent", "pol", "ast", "gue", "nor", "ith"]
+    words = list(WORDS)
+    while len(words) < size:
+        words.append("".join(rng.choice(syllables) for _ in range(rng.randint(1, 4))))
+    return words, [1 / rank for rank in range(1, len(words) + 1)]
+
+
+VOCABULARY, WEIGHTS = make_vocabulary()
+
+
+def make_line(rng):
+    line = " ".join(rng.choices(VOCABULARY, WEIGHTS, k=rng.randint(5, 12)))
+    return line[0].upper() + line[1:] + rng.choice([".", "?", "!", "..."])
+
+
+def punctuation_variant(line, rng):
+    return "- " + line.upper().rstrip(".?!") + rng.choice(["!", "...", "?!"])
+
+
+def typo_variant(line, rng):
+    position = rng.randrange(len(line) // 2, len(line) - 2) # Away from the start so the line stays recognizable
+    return line[:position] + line[position + 1:]
+
+
+def percentile(values, fraction):
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def measure(memory, label, queries, expected, stored):
+    latencies = []
+    found = 0
+    eligible = 0
+    for query, translation, line in zip(queries, expected, stored):
+        if line is not None:
+            similarity = app._jaccard(app._trigrams(app.normalize_memory_text(query)),
+                                      app._trigrams(app.normalize_memory_text(line)))
+            eligible += similarity >= memory.threshold
+        start = time.perf_counter()
+        match = memory.get(query, "en", "zh", "bench")
+        latencies.append(time.perf_counter() - start)
+        found += match is not None and match[0] == translation
+    print(f"{label:<22}{percentile(latencies, 0.5) * 1000:>10.3f}{percentile(latencies, 0.99) * 1000:>10.3f}"
+          f"{found / len(queries):>10.1%}{eligible / len(queries):>10.1%}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--segments", type=int, nargs="+", default=[200000])
+    parser.add_argument("--lookups", type=int, default=2000, help="Lookups of each kind")
+    parser.add_argument("--threshold", type=float, default=app.DEFAULT_MEMORY_THRESHOLD)
+    args = parser.parse_args()
+
+    for segment_count in args.segments:
+        rng = random.Random(1)
+        path = os.path.join(tempfile.mkdtemp(), "memory.sqlite3")
+        memory = app.TranslationMemory(path, threshold=args.threshold, max_entries=segment_count)
+        lines = {}
+        start = time.perf_counter()
+        while len(lines) < segment_count:
+            chunk = {}
+            while len(chunk) < 10000 and len(lines) + len(chunk) < segment_count:
+                line = make_line(rng)
+                chunk[line] = f"<tr> {line}"
+            memory.put_many(chunk.items(), "en", "zh", "bench")
+            lines.update(chunk)
+        fill_seconds = time.perf_counter() - start
+
+        stored = rng.sample(list(lines), args.lookups)
+        expected = [lines[line] for line in stored]
+        print(f"{segment_count} segments stored in {fill_seconds:.1f}s ({segment_count / fill_seconds:.0f}/s), "
+              f"{os.path.getsize(path) / 1e6:.0f} MB, threshold {args.threshold}")
+        print(f"{'lookup':<22}{'p50 ms':>10}{'p99 ms':>10}{'found':>10}{'eligible':>10}")
+        measure(memory, "case/punctuation", [punctuation_variant(line, rng) for line in stored], expected, stored)
+        measure(memory, "one-letter typo", [typo_variant(line, rng) for line in stored], expected, stored)
+        measure(memory, "never stored", [make_line(rng) + " again" for _ in stored], [None] * len(stored),
+                [None] * len(stored))
+        print(memory.summary())
+        memory.close()
+
+
+if __name__ == "__main__":
+    main()
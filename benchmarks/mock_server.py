@@ -0,0 +1,368 @@
+"""
+Local stand-in for the DeepSeek /v1/chat/completions endpoint.
+
+Answers every request with a fake translation after a configurable delay, and can
+inject 429s (with Retry-After), 5xx errors, truncated replies and runaway replies
+that ramble on until max_tokens. Batched prompts ([[n]] markers) are answered
+marker by marker, like the real model is asked to, and prompts asking for several
+languages get a [[n:LANGUAGE]] block per cue and language. Requests with "stream": true
+get a chunked server-sent-event stream, optionally paced with --token-interval.
+Like DeepSeek's context cache, a prompt prefix seen before (in whole 64-token
+blocks) is reported as prompt_cache_hit_tokens, the rest as prompt_cache_miss_tokens.
+Point the translator at it with the DEEPSEEK_API_URL environment variable.
+
+Usage:
+    python benchmarks/mock_server.py --port 8765 --latency lognormal:0.4,0.5 --rate-429 0.02
+    DEEPSEEK_API_URL=http://127.0.0.1:8765/v1/chat/completions python code.py ...
+
+Latency specs: fixed:S, uniform:A,B, exponential:MEAN, lognormal:MEDIAN,SIGMA (seconds).
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import math
+import random
+import re
+import threading
+import time
+
+MARKER_REGEX = re.compile(r"^\[\[(\d+)\]\]$")
+LANGUAGES_REGEX = re.compile(r"into each of these languages: (.+?)(?:\.|, detecting)")
+
+
+def parse_latency(spec):
+    """Turns a latency spec such as 'lognormal:0.4,0.5' into a function returning seconds."""
+    kind, _, params = spec.partition(":")
+    values = [float(value) for value in params.split(",") if value]
+    if kind == "fixed":
+        return lambda: values[0]
+    if kind == "uniform":
+        return lambda: random.uniform(values[0], values[1])
+    if kind == "exponential":
+        return lambda: random.expovariate(1.0 / values[0])
+    if kind == "lognormal":
+        return lambda: random.lognormvariate(math.log(values[0]), values[1])
+    raise ValueError(f"Unknown latency distribution: {spec}")
+
+
+class MockConfig:
+    """Behaviour of the mock endpoint. All rates are probabilities per request."""
+
+    def __init__(self, latency="fixed:0.05", rate_429=0.0, rate_5xx=0.0, rate_truncated=0.0,
+                 retry_after=1, seed=None, rate_runaway=0.0, token_interval=0.0):
+        self.latency = latency
+        self.rate_429 = rate_429
+        self.rate_5xx = rate_5xx
+        self.rate_truncated = rate_truncated
+        self.retry_after = retry_after
+        self.seed = seed
+        self.rate_runaway = rate_runaway
+        self.token_interval = token_interval # Seconds between streamed chunks (of STREAM_CHUNK_CHARS)
+
+
+class MockStats:
+    def __init__(self):
+        self.requests = 0
+        self.ok = 0
+        self.rate_limited = 0
+        self.server_errors = 0
+        self.truncated = 0
+        self.runaway = 0
+        self.streams = 0
+        self.streams_cancelled = 0 # Client hung up before the end of the stream
+        self.completion_tokens_sent = 0
+        self.prompt_cache_hit_tokens = 0
+        self.prompt_cache_miss_tokens = 0
+
+    def as_dict(self):
+        return {name: round(value) if isinstance(value, float) else value for name, value in self.__dict__.items()}
+
+
+MAX_TOKENS_DEFAULT = 8192
+STREAM_CHUNK_CHARS = 8
+RUNAWAY_FILLER = " And so the story goes on, and on, and on."
+CACHE_BLOCK_CHARS = 256 # 64 tokens at 4 characters per token
+
+
+class PrefixCache:
+    """Remembers prompt prefixes in whole blocks and reports how much of a new prompt was seen before."""
+
+    def __init__(self):
+        self._blocks = set()
+
+    def lookup_and_store(self, prompt):
+        """Returns the number of leading characters of prompt already cached, then caches its blocks."""
+        digest = hashlib.sha256()
+        hit_chars = 0
+        missed = False
+        for end in range(CACHE_BLOCK_CHARS, len(prompt) + 1, CACHE_BLOCK_CHARS):
+            digest.update(prompt[end - CACHE_BLOCK_CHARS:end].encode("utf-8"))
+            key = digest.copy().digest()
+            if not missed and key in self._blocks:
+                hit_chars = end
+            else:
+                missed = True
+                self._blocks.add(key)
+        return hit_chars
+
+
+class StreamedReply:
+    """A 200 reply to be sent as server-sent events."""
+
+    def __init__(self, completion, content_chunks, finish_reason, usage):
+        self.completion = completion # Common fields of every chunk
+        self.content_chunks = content_chunks
+        self.finish_reason = finish_reason
+        self.usage = usage
+
+    def events(self):
+        for chunk in self.content_chunks:
+            yield dict(self.completion, choices=[{"index": 0, "delta": {"content": chunk}, "finish_reason": None}])
+        yield dict(self.completion, choices=[{"index": 0, "delta": {}, "finish_reason": self.finish_reason}],
+                   usage=self.usage)
+
+
+def fake_translation(text, language=None):
+    return f"<tr:{language}> {text}" if language else f"<tr> {text}"
+
+
+def build_multi_reply(user_prompt, languages, truncate):
+    """Answers a multi-language prompt with a [[n:LANGUAGE]] block per cue and language."""
+    cues = []
+    for line in user_prompt.split("\n"):
+        match = MARKER_REGEX.match(line)
+        if match:
+            cues.append((match.group(1), []))
+        elif cues:
+            cues[-1][1].append(line)
+    blocks = [f"[[{number}:{language}]]\n" + "\n".join(fake_translation(line, language) for line in lines)
+              for number, lines in cues for language in languages]
+    if truncate and len(blocks) > 1:
+        blocks = blocks[:len(blocks) // 2]
+    return "\n".join(blocks)
+
+
+def build_reply(user_prompt, truncate, system_prompt=""):
+    """Translates the user message's cues, keeping [[n]] markers for batched prompts."""
+    languages = LANGUAGES_REGEX.search(system_prompt)
+    if languages:
+        return build_multi_reply(user_prompt, languages.group(1).split(", "), truncate)
+    body = user_prompt
+    lines = body.split("\n")
+    if not any(MARKER_REGEX.match(line) for line in lines):
+        reply = fake_translation(body)
+        return reply[:max(1, len(reply) // 2)] if truncate else reply
+
+    out = []
+    for line in lines:
+        out.append(line if MARKER_REGEX.match(line) else fake_translation(line))
+    if truncate:
+        markers = [i for i, line in enumerate(out) if MARKER_REGEX.match(line)]
+        out = out[:markers[len(markers) // 2]] if len(markers) > 1 else out
+    return "\n".join(out)
+
+
+def runaway_continuation(reply):
+    """What a runaway model adds: invented extra cues after a batched reply, rambling after a single one."""
+    markers = [int(match.group(1)) for match in map(MARKER_REGEX.match, reply.split("\n")) if match]
+    if not markers:
+        return RUNAWAY_FILLER * (MAX_TOKENS_DEFAULT // 8)
+    extra = range(max(markers) + 1, max(markers) + MAX_TOKENS_DEFAULT // 8)
+    return "".join(f"\n[[{n}]]\n<tr> A line the model made up.{RUNAWAY_FILLER}" for n in extra)
+
+
+class MockDeepSeekServer:
+    """Runs the mock endpoint on its own event loop thread."""
+
+    def __init__(self, config=None, host="127.0.0.1", port=0):
+        self.config = config or MockConfig()
+        self.host = host
+        self.port = port
+        self.stats = MockStats()
+        self._latency = parse_latency(self.config.latency)
+        self._random = random.Random(self.config.seed)
+        self._prefix_cache = PrefixCache()
+        self._loop = None
+        self._server = None
+        self._ready = threading.Event()
+        self._thread = None
+
+    @property
+    def url(self):
+        return f"http://{self.host}:{self.port}/v1/chat/completions"
+
+    def start(self):
+        self._thread = threading.Thread(target=self._serve, daemon=True)
+        self._thread.start()
+        self._ready.wait()
+        return self
+
+    def stop(self):
+        if self._loop:
+            asyncio.run_coroutine_threadsafe(self._shutdown(), self._loop)
+            self._thread.join(timeout=5)
+
+    async def _shutdown(self):
+        self._server.close()
+        tasks = [task for task in asyncio.all_tasks() if task is not asyncio.current_task()]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._loop.stop()
+
+    def _serve(self):
+        self._loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(self._loop)
+        self._server = self._loop.run_until_complete(
+            asyncio.start_server(self._handle, self.host, self.port, backlog=4096))
+        self.port = self._server.sockets[0].getsockname()[1]
+        self._ready.set()
+        self._loop.run_forever()
+        self._loop.close()
+
+    async def _handle(self, reader, writer):
+        try:
+            while True:
+                head = await reader.readuntil(b"\r\n\r\n")
+                request_line, *header_lines = head.decode("latin-1").split("\r\n")
+                headers = {}
+                for line in header_lines:
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, extra_headers, payload = await self._respond(request_line, body)
+                if isinstance(payload, StreamedReply):
+                    await self._stream(writer, payload)
+                    continue
+                data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+                reason = {200: "OK", 404: "Not Found", 429: "Too Many Requests", 503: "Service Unavailable"}.get(status, "Error")
+                head_out = [f"HTTP/1.1 {status} {reason}", "Content-Type: application/json",
+                            f"Content-Length: {len(data)}"] + extra_headers
+                writer.write(("\r\n".join(head_out) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+        except (asyncio.IncompleteReadError, ConnectionError, asyncio.LimitOverrunError,
+                asyncio.CancelledError):
+            pass
+        finally:
+            writer.close()
+
+    async def _stream(self, writer, reply):
+        self.stats.streams += 1
+        writer.write(b"HTTP/1.1 200 OK\r\nContent-Type: text/event-stream\r\nTransfer-Encoding: chunked\r\n\r\n")
+        started = time.monotonic()
+        sent_chunks = 0
+        try:
+            for event in reply.events():
+                data = f"data: {json.dumps(event, ensure_ascii=False)}\n\n".encode("utf-8")
+                writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n")
+                await writer.drain()
+                choice = event["choices"][0]
+                if choice["delta"].get("content"):
+                    self.stats.completion_tokens_sent += len(choice["delta"]["content"]) / 4
+                    sent_chunks += 1
+                    delay = started + sent_chunks * self.config.token_interval - time.monotonic()
+                    if delay > 0.001: # Keep to the schedule without paying for many tiny sleeps
+                        await asyncio.sleep(delay)
+            data = b"data: [DONE]\n\n"
+            writer.write(f"{len(data):x}\r\n".encode("latin-1") + data + b"\r\n0\r\n\r\n")
+            await writer.drain()
+        except ConnectionError:
+            self.stats.streams_cancelled += 1
+            raise
+
+    async def _respond(self, request_line, body):
+        method, path, _ = request_line.split(" ", 2)
+        if method != "POST" or not path.endswith("/chat/completions"):
+            return 404, [], {"error": {"message": "Not found"}}
+
+        self.stats.requests += 1
+        await asyncio.sleep(self._latency())
+        roll = self._random.random()
+        if roll < self.config.rate_429:
+            self.stats.rate_limited += 1
+            return 429, [f"Retry-After: {self.config.retry_after}"], {"error": {"message": "Rate limit reached"}}
+        if roll < self.config.rate_429 + self.config.rate_5xx:
+            self.stats.server_errors += 1
+            return 503, [], {"error": {"message": "Server overloaded"}}
+
+        request = json.loads(body or b"{}")
+        messages = request.get("messages", [])
+        user_prompt = messages[-1]["content"] if messages else ""
+        system_prompt = messages[0]["content"] if len(messages) > 1 else ""
+        truncate = self._random.random() < self.config.rate_truncated
+        if truncate:
+            self.stats.truncated += 1
+        reply = build_reply(user_prompt, truncate, system_prompt)
+        finish_reason = "length" if truncate else "stop"
+        if self._random.random() < self.config.rate_runaway:
+            self.stats.runaway += 1
+            reply += runaway_continuation(reply)
+        max_chars = 4 * (request.get("max_tokens") or MAX_TOKENS_DEFAULT)
+        if len(reply) > max_chars:
+            reply = reply[:max_chars]
+            finish_reason = "length"
+        prompt = "\x00".join(f"{message.get('role')}\x00{message.get('content', '')}" for message in messages)
+        prompt_tokens = len(prompt) // 4 + 1
+        hit_tokens = self._prefix_cache.lookup_and_store(prompt) // 4
+        self.stats.prompt_cache_hit_tokens += hit_tokens
+        self.stats.prompt_cache_miss_tokens += prompt_tokens - hit_tokens
+        completion_tokens = len(reply) // 4 + 1
+        usage = {"prompt_tokens": prompt_tokens, "completion_tokens": completion_tokens,
+                 "total_tokens": prompt_tokens + completion_tokens,
+                 "prompt_cache_hit_tokens": hit_tokens, "prompt_cache_miss_tokens": prompt_tokens - hit_tokens}
+        completion = {
+            "id": f"mock-{self.stats.requests}",
+            "created": int(time.time()),
+            "model": request.get("model", "mock"),
+        }
+        self.stats.ok += 1
+        chunks = [reply[i:i + STREAM_CHUNK_CHARS] for i in range(0, len(reply), STREAM_CHUNK_CHARS)]
+        if request.get("stream"):
+            return 200, [], StreamedReply(dict(completion, object="chat.completion.chunk"), chunks, finish_reason, usage)
+        if self.config.token_interval:
+            await asyncio.sleep(self.config.token_interval * len(chunks)) # Same generation time as a stream
+        self.stats.completion_tokens_sent += completion_tokens
+        return 200, [], dict(completion, object="chat.completion",
+                             choices=[{"index": 0, "message": {"role": "assistant", "content": reply},
+                                       "finish_reason": finish_reason}],
+                             usage=usage)
+
+
+def add_config_arguments(parser):
+    """Adds the MockConfig options to an argparse parser (shared with the benchmark suite)."""
+    parser.add_argument("--latency", default="lognormal:0.3,0.5", help="Latency distribution (see module doc)")
+    parser.add_argument("--rate-429", type=float, default=0.0, help="Probability of a 429 response")
+    parser.add_argument("--rate-5xx", type=float, default=0.0, help="Probability of a 503 response")
+    parser.add_argument("--rate-truncated", type=float, default=0.0, help="Probability of a truncated reply")
+    parser.add_argument("--rate-runaway", type=float, default=0.0, help="Probability of a reply that runs on until max_tokens")
+    parser.add_argument("--token-interval", type=float, default=0.0, help="Seconds between streamed chunks")
+    parser.add_argument("--retry-after", type=int, default=1, help="Retry-After seconds sent with 429s")
+    parser.add_argument("--seed", type=int, help="Random seed for reproducible runs")
+
+
+def config_from_args(args):
+    return MockConfig(args.latency, args.rate_429, args.rate_5xx, args.rate_truncated, args.retry_after, args.seed,
+                      args.rate_runaway, args.token_interval)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8765)
+    add_config_arguments(parser)
+    args = parser.parse_args()
+
+    server = MockDeepSeekServer(config_from_args(args), args.host, args.port).start()
+    print(f"Mock DeepSeek endpoint listening on {server.url}")
+    print(f"Use it with: DEEPSEEK_API_URL={server.url}")
+    try:
+        while True:
+            time.sleep(10)
+            print(f"Stats: {server.stats.as_dict()}", flush=True)
+    except KeyboardInterrupt:
+        server.stop()
+
+
+if __name__ == "__main__":
+    main()
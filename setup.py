@@ -1,3 +1,4 @@
+import importlib.util
 import sys
 from cx_Freeze import setup, Executable
 
@@ -7,13 +8,26 @@ if sys.platform == "win32":
 
 app_icon = "app_icon.ico"
 
+# code.py only imports translator_core / translator_gui for the mode it runs in, and
+# translator_core imports its HTTP client on first use, so list them all explicitly.
+# httpx (HTTP/2) and aiohttp (asyncio engine) are optional: bundled when installed.
+optional_packages = [name for name in ("httpx", "h2", "aiohttp") if importlib.util.find_spec(name)]
+
+build_exe_options = {
+    "includes": ["translator_core", "translator_gui"],
+    "packages": ["requests", "certifi", "email"] + optional_packages + (["asyncio"] if "aiohttp" in optional_packages else []),
+    # Developer tools the HTTP clients' optional plugins would otherwise drag in
+    "excludes": ["pytest", "_pytest", "IPython", "jedi", "pygments"],
+}
+
 setup(
     name="Gesture Password",
     version="0.1",
     description="Gesture Password",
+    options={"build_exe": build_exe_options},
     executables=[Executable(
         "code.py",  # 你的主脚本
         base=base,
         icon=app_icon  # 指定图标文件
     )],
-)
\ No newline at end of file
+)
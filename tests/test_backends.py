@@ -0,0 +1,164 @@
+"""BackendPool: weighted choice, resting and rejecting backends, failover and hedged requests."""
+import json
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import translator_core
+from translator_core import BACKEND_FAILURE_THRESHOLD, HEDGE_MIN_SAMPLES, Backend, BackendPool
+
+quiet = lambda message: None
+PAYLOAD = {"model": "m", "messages": [{"role": "user", "content": "Hello."}], "max_tokens": 100}
+
+
+class Handler(BaseHTTPRequestHandler):
+    """/ok answers at once, /slow after half a second, /auth with 401 and /down with 503."""
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        if self.path in ("/auth", "/down"):
+            self.send_response(401 if self.path == "/auth" else 503)
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        if self.path == "/slow":
+            time.sleep(0.5)
+        body = json.dumps({"choices": [{"message": {"content": f"Hola from {self.path[1:]}"}, "finish_reason": "stop"}],
+                           "usage": {"prompt_tokens": 5, "completion_tokens": 3}}).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture(scope="module")
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    thread = threading.Thread(target=httpd.serve_forever, daemon=True)
+    thread.start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+@pytest.fixture
+def configure(tmp_path):
+    """Sets up a run against backends file entries (name, path, weight) on the test server."""
+    def configure(base_url, entries, hedge=False, log_func=quiet):
+        path = tmp_path / "backends.json"
+        path.write_text(json.dumps({"hedge": hedge, "backends": [
+            {"name": name, "url": base_url + route, "weight": weight} for name, route, weight in entries]}), encoding="utf-8")
+        translator_core.configure_cancellation()
+        translator_core.configure_rate_controller(4, log_func=log_func)
+        translator_core.configure_retry_policy(log_func=log_func)
+        translator_core.configure_request_metrics()
+        translator_core.configure_http_sessions(4, log_func=log_func)
+        return translator_core.configure_backends(str(path), None, 4, log_func)
+    yield configure
+    translator_core.configure_backends(None, None, 4, quiet)
+    translator_core.http_sessions.close()
+
+
+def test_choice_follows_weights():
+    heavy, light = Backend("heavy", weight=3), Backend("light", weight=1)
+    pool = BackendPool([heavy, light], log_func=quiet)
+    picks = [pool.choose() for _ in range(4000)]
+    assert 0.7 < picks.count(heavy) / len(picks) < 0.8
+    assert {pool.choose(avoid={heavy}) for _ in range(20)} == {light}
+
+
+def test_failing_backend_is_rested():
+    first, second = Backend("first"), Backend("second")
+    log = []
+    pool = BackendPool([first, second], log_func=log.append)
+    for _ in range(BACKEND_FAILURE_THRESHOLD - 1):
+        pool.record_attempt(first, 1.0, False)
+    pool.record_attempt(first, 1.0, True) # A success resets the count
+    for _ in range(BACKEND_FAILURE_THRESHOLD):
+        pool.record_attempt(first, 1.0, False)
+    assert len(log) == 1 and log[0].startswith("Warning: Backend 'first'")
+    assert {pool.choose() for _ in range(20)} == {second}
+    assert not pool.has_alternative({second})
+    assert pool.choose(avoid={second}) is first # Nothing healthy left: the one back soonest
+
+
+def test_rejected_backend_is_never_chosen_again():
+    first, second = Backend("first"), Backend("second")
+    log = []
+    pool = BackendPool([first, second], log_func=log.append)
+    pool.reject(first, 401)
+    pool.reject(first, 401)
+    assert len(log) == 1 and "HTTP 401" in log[0]
+    second.resting_until = time.monotonic() + 60
+    assert pool.choose() is second # Rested backends come back; rejected ones don't
+
+
+def test_hedge_delay_is_recent_p95_and_capped():
+    pool = BackendPool([Backend("first"), Backend("second")], hedge=True, log_func=quiet)
+    assert pool.hedge_delay() is None # Too few samples
+    for n in range(1, HEDGE_MIN_SAMPLES + 1):
+        pool.record_attempt(pool.backends[0], n / 10, True)
+    assert pool.hedge_delay() == pytest.approx(HEDGE_MIN_SAMPLES / 10)
+    for _ in range(5):
+        pool.choose_hedge({pool.backends[0]})
+    assert pool.hedge_delay() is None # Already hedged more than HEDGE_MAX_FRACTION of attempts
+    assert not BackendPool([Backend("only")], hedge=True).hedge
+    assert pool.choose_hedge(set(pool.backends)) is None
+
+
+def test_backends_file_is_validated(tmp_path, monkeypatch):
+    path = tmp_path / "backends.json"
+    for config, message in [({}, "no \"backends\" list"), ({"backends": [{"url": "x"}]}, "needs a \"name\""),
+                            ({"backends": [{"name": "a", "weight": 0}]}, "weight must be greater than 0"),
+                            ({"backends": [{"name": "a", "api_key_env": "NO_SUCH_KEY_VAR"}]}, "NO_SUCH_KEY_VAR")]:
+        path.write_text(json.dumps(config), encoding="utf-8")
+        with pytest.raises(ValueError, match=message):
+            BackendPool.from_file(str(path))
+    monkeypatch.setenv("SECOND_KEY", "secret")
+    path.write_text(json.dumps({"hedge": True, "backends": [
+        {"name": "a"}, {"name": "b", "api_key_env": "SECOND_KEY", "weight": 2, "requests_per_minute": 60}]}), encoding="utf-8")
+    pool = BackendPool.from_file(str(path), log_func=quiet)
+    assert pool.hedge and pool.backends[1].api_key == "secret" and pool.backends[1].weight == 2
+    assert pool.backends[0].controller is translator_core.rate_controller
+    assert pool.backends[1].controller is not translator_core.rate_controller
+    assert not BackendPool.from_file(str(path), hedge=False).hedge
+
+
+def test_server_error_fails_over_at_once(server, configure):
+    log = []
+    pool = configure(server, [("down", "/down", 1000), ("ok", "/ok", 0.001)], log_func=log.append)
+    started = time.monotonic()
+    for _ in range(3):
+        assert translator_core._post_chat_completion(PAYLOAD, "key", log_func=log.append) == ("Hola from ok", False)
+    assert time.monotonic() - started < 2 # No backoff before trying the other backend
+    assert any(message.endswith("Retrying on another backend...") for message in log)
+    assert pool.backends[1].wins == 3
+
+
+def test_refused_key_fails_over_or_raises(server, configure):
+    log = []
+    pool = configure(server, [("auth", "/auth", 1000), ("ok", "/ok", 0.001)], log_func=log.append)
+    for _ in range(3):
+        assert translator_core._post_chat_completion(PAYLOAD, "key", log_func=log.append)[0] == "Hola from ok"
+    assert pool.backends[0].attempts == 1 # Never chosen again after the 401
+    assert translator_core.retry_policy.retries == 0 # Moving past it doesn't spend the retry budget
+
+    configure(server, [("auth", "/auth", 1)])
+    with pytest.raises(ValueError, match="Authentication Error"):
+        translator_core._post_chat_completion(PAYLOAD, "key")
+
+
+def test_slow_attempt_is_hedged(server, configure):
+    pool = configure(server, [("slow", "/slow", 1000), ("fast", "/ok", 0.001)], hedge=True)
+    for _ in range(HEDGE_MIN_SAMPLES):
+        pool.record_attempt(pool.backends[1], 0.05, True)
+    started = time.monotonic()
+    assert translator_core._post_chat_completion(PAYLOAD, "key")[0] == "Hola from ok"
+    assert time.monotonic() - started < 0.4
+    assert pool.backends[1].hedges == pool.backends[1].hedge_wins == 1
@@ -0,0 +1,91 @@
+"""Batched requests: packing cues, splitting [[n]] replies and re-sending missing cues one at a time."""
+import pytest
+
+import translator_core
+from translator_core import (
+    TranslationCancelled, _split_batch_result, make_batches, split_batch_reply, translate_batch_deepseek,
+)
+
+
+def test_reply_is_split_on_markers():
+    reply = "[[1]]\nHola.\n[[2]]\n¿Cómo estás?\nBien.\n\n[[3]]  \n  Adiós.  "
+    assert split_batch_reply(reply, 3) == {1: "Hola.", 2: "¿Cómo estás?\nBien.", 3: "Adiós."}
+
+
+def test_duplicated_empty_and_unknown_markers_are_dropped():
+    reply = "[[1]]\nHola.\n[[2]]\n\n[[3]]\nUno\n[[3]]\nDos\n[[4]]\nExtra"
+    assert split_batch_reply(reply, 3) == {1: "Hola."}
+
+
+def test_markers_must_be_on_their_own_line():
+    reply = "[[1]]\nSee [[2]] below\n[[2]]\nAbajo."
+    assert split_batch_reply(reply, 2) == {1: "See [[2]] below", 2: "Abajo."}
+    assert split_batch_reply("No markers at all.", 1) == {}
+
+
+def test_truncated_reply_drops_its_last_cue():
+    reply = "[[1]]\nHola.\n[[2]]\n¿Cómo est"
+    assert _split_batch_result(reply, False, 3) == {1: "Hola.", 2: "¿Cómo est"}
+    assert _split_batch_result(reply, True, 3) == {1: "Hola."}
+    # Cut off while inventing cues past the last one requested: every requested cue is complete
+    assert _split_batch_result("[[1]]\nHola.\n[[2]]\nAdiós.\n[[3]]\nMás", True, 2) == {1: "Hola.", 2: "Adiós."}
+
+
+def test_batches_respect_cue_and_token_limits():
+    items = [(n, "word " * 10) for n in range(7)] # ~13 tokens each
+    assert [len(batch) for batch in make_batches(items, max_cues=3, max_tokens=1000)] == [3, 3, 1]
+    assert [len(batch) for batch in make_batches(items, max_cues=10, max_tokens=30)] == [2, 2, 2, 1]
+    assert make_batches([(0, "x" * 1000)], max_cues=3, max_tokens=10) == [[(0, "x" * 1000)]] # Oversized cue alone
+    assert make_batches([]) == []
+
+
+class FakeCompletions:
+    """Stands in for _post_chat_completion: answers batches with a canned reply and single cues by rule."""
+
+    def __init__(self, batch_reply, single=None):
+        self.batch_reply = batch_reply
+        self.single = single or (lambda text: f"<{text}>")
+        self.singles = []
+
+    def __call__(self, payload, api_key, stream=False, expected_cues=1, log_func=print):
+        content = payload["messages"][-1]["content"]
+        if content.startswith("[[1]]"):
+            return self.batch_reply, False
+        self.singles.append(content)
+        return self.single(content), False
+
+
+def test_missing_cues_are_sent_one_at_a_time(monkeypatch):
+    completions = FakeCompletions("[[1]]\nUno\n[[3]]\nTres")
+    monkeypatch.setattr(translator_core, "_post_chat_completion", completions)
+    log = []
+    results = translate_batch_deepseek(["One", "Two", "Three"], "key", "en", "es", "m", log_func=log.append)
+    assert results == ["Uno", "<Two>", "Tres"]
+    assert completions.singles == ["Two"]
+    assert log == ["Warning: Batch reply was missing 1 of 3 cues; translated them individually."]
+
+
+def test_failing_fallback_only_fails_its_own_cue(monkeypatch):
+    def single(text):
+        if text == "Two":
+            raise ValueError("API Error: 400")
+        return f"<{text}>"
+    monkeypatch.setattr(translator_core, "_post_chat_completion", FakeCompletions("[[3]]\nTres", single))
+    results = translate_batch_deepseek(["One", "Two", "Three"], "key", "en", "es", "m", log_func=lambda message: None)
+    assert results[0] == "<One>" and results[2] == "Tres"
+    assert isinstance(results[1], ValueError)
+
+
+def test_cancel_during_fallback_stops_the_batch(monkeypatch):
+    def single(text):
+        raise TranslationCancelled()
+    monkeypatch.setattr(translator_core, "_post_chat_completion", FakeCompletions("[[1]]\nUno", single))
+    with pytest.raises(TranslationCancelled):
+        translate_batch_deepseek(["One", "Two"], "key", "en", "es", "m", log_func=lambda message: None)
+
+
+def test_single_cue_skips_the_markers(monkeypatch):
+    completions = FakeCompletions("unused")
+    monkeypatch.setattr(translator_core, "_post_chat_completion", completions)
+    assert translate_batch_deepseek(["One"], "key", "en", "es", "m") == ["<One>"]
+    assert completions.singles == ["One"]
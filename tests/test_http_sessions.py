@@ -0,0 +1,84 @@
+"""HttpSessionPool: keep-alive connections sized for the run's workers, hedge legs and backend hosts."""
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+import translator_core
+from translator_core import Backend, BackendPool, HttpSessionPool, ThreadPoolEngine
+
+quiet = lambda message: None
+
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1" # Keep-alive
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = b'{"ok": true}'
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@pytest.fixture
+def server():
+    httpd = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    yield f"http://127.0.0.1:{httpd.server_address[1]}"
+    httpd.shutdown()
+    httpd.server_close()
+
+
+def test_requests_reuse_one_connection(server):
+    sessions = HttpSessionPool(4, log_func=quiet)
+    try:
+        for _ in range(10):
+            assert sessions.post(server + "/v1/chat/completions", json={}).json() == {"ok": True}
+        assert sessions.connection_stats() == (10, 1)
+        assert sessions.summary() == "Connections (HTTP/1.1): 10 requests over 1 connections (9 reused)."
+    finally:
+        sessions.close()
+
+
+def test_adapter_is_sized_from_workers_and_hosts():
+    sessions = HttpSessionPool(12, log_func=quiet, hosts=3)
+    try:
+        sessions._get_client()
+        assert sessions._adapter._pool_connections == 3
+        assert sessions._adapter._pool_maxsize == 12
+    finally:
+        sessions.close()
+
+
+def test_pool_counts_hosts_and_hedge_legs():
+    same_host = BackendPool([Backend("a", "https://api.example.com/v1/chat/completions"),
+                             Backend("b", "https://api.example.com/v1/chat/completions", model="other")], hedge=True)
+    assert same_host.hosts == 1
+    assert same_host.max_in_flight(10) == 20
+    two_hosts = BackendPool([Backend("a", "https://api.example.com/v1"), Backend("b", "http://127.0.0.1:8000/v1")])
+    assert two_hosts.hosts == 2
+    assert two_hosts.max_in_flight(10) == 10 # No hedging
+    assert BackendPool([Backend("deepseek")]).hosts == 1
+
+
+def test_thread_engine_sizes_sessions_for_hedged_backends(tmp_path):
+    path = tmp_path / "backends.json"
+    path.write_text(json.dumps({"hedge": True, "backends": [{"name": "a", "url": "https://a.example.com/v1"},
+                                                            {"name": "b", "url": "https://b.example.com/v1"}]}),
+                    encoding="utf-8")
+    translator_core.configure_backends(str(path), None, 6, quiet)
+    engine = ThreadPoolEngine(6, log_func=quiet)
+    try:
+        assert engine.sessions is translator_core.http_sessions
+        assert engine.sessions.pool_size == 12 # Both legs of every worker's attempt
+        assert engine.sessions.hosts == 2
+    finally:
+        engine.close()
+        translator_core.configure_backends(None, None, 6, quiet)
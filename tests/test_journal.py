@@ -0,0 +1,123 @@
+"""TranslationJournal and LanguageRun checkpoints: what an interrupted run resumes from."""
+import os
+
+from translator_core import LanguageRun, SourceFallback, SubtitleStore, TranslationJournal, _single_result
+
+quiet = lambda message: None
+
+CUES = [(1, 1000, "Hello."), (2, 2000, "How are you?"), (3, 3000, "Goodbye.")]
+
+
+def make_store(cues=CUES):
+    store = SubtitleStore()
+    for number, start, text in cues:
+        store.append(number, start, start + 900, text)
+    return store
+
+
+def test_empty_or_cut_off_reply_falls_back_to_source():
+    log = []
+    assert isinstance(_single_result("Hello.", "", log_func=log.append), SourceFallback)
+    assert _single_result("Hello.", "Hola, qué", truncated=True, log_func=log.append) == "Hello."
+    assert isinstance(_single_result("Hello.", "Hola, qué", truncated=True, log_func=log.append), SourceFallback)
+    assert type(_single_result("Hello.", "Hola.", log_func=log.append)) is str
+    assert all(message.startswith("Warning") for message in log)
+
+
+def test_source_fallback_is_written_but_not_checkpointed(tmp_path):
+    output_file = str(tmp_path / "out.srt")
+    run = LanguageRun(make_store(), str(tmp_path / "in.srt"), output_file, "es", quiet)
+    run.start("en", "m")
+    run.groups = {"a": [0], "b": [1], "c": [2]}
+    run.finish_group("a", "Hello.", "Hola.", None, None, "en", "m")
+    run.finish_group("b", "How are you?", SourceFallback("How are you?"), None, None, "en", "m")
+    run.finish_group("c", "Goodbye.", "Adiós.", None, None, "en", "m")
+    run.finish()
+    run.close()
+    assert run.result.errors == run.result.untranslated == 1
+    assert run.failed == {1}
+    with open(output_file, encoding="utf-8") as f:
+        assert "How are you?" in f.read() # Kept in the output...
+    assert os.path.exists(output_file + ".journal") # ...and the journal kept for the next run
+
+    again = LanguageRun(make_store(), str(tmp_path / "in.srt"), output_file, "es", quiet)
+    done = again.start("en", "m")
+    again.close()
+    assert done == {0, 2}
+    assert again.subtitles.translated == ["Hola.", None, "Adiós."]
+
+
+def journal(tmp_path, store, target_lang="es", log_func=quiet):
+    return TranslationJournal(str(tmp_path / "out.srt"), store, "en", target_lang, "m", log_func)
+
+
+def resumed(tmp_path, store):
+    """What a new run with the same settings would resume."""
+    reader = journal(tmp_path, store)
+    try:
+        return reader.resume(store)
+    finally:
+        reader.close()
+
+
+def test_resume_returns_recorded_cues(tmp_path):
+    store = make_store()
+    first = journal(tmp_path, store)
+    assert first.resume(store) == {}
+    first.record(0, "Hello.", "Hola.")
+    first.record(2, "Goodbye.", "Adiós.")
+    first.close()
+    second = journal(tmp_path, store)
+    assert second.resume(store) == {0: "Hola.", 2: "Adiós."}
+    second.record(1, "How are you?", "¿Cómo estás?")
+    second.close()
+    assert resumed(tmp_path, store) == {0: "Hola.", 1: "¿Cómo estás?", 2: "Adiós."}
+
+
+def test_other_input_or_settings_start_a_new_journal(tmp_path):
+    store = make_store()
+    first = journal(tmp_path, store)
+    first.resume(store)
+    first.record(0, "Hello.", "Hola.")
+    first.close()
+    log = []
+    other = journal(tmp_path, store, target_lang="fr", log_func=log.append)
+    assert other.resume(store) == {}
+    other.close()
+    assert log == ["Found a journal from a different input file or settings; starting a new one."]
+    # The mismatched journal was replaced; the original settings find nothing to resume either
+    retimed = make_store([(1, 1500, "Hello."), (2, 2000, "How are you?"), (3, 3000, "Goodbye.")])
+    assert resumed(tmp_path, store) == {}
+    assert TranslationJournal.make_fingerprint(store, "en", "es", "m") != TranslationJournal.make_fingerprint(retimed, "en", "es", "m")
+
+
+def test_torn_last_line_is_ignored_and_terminated(tmp_path):
+    store = make_store()
+    first = journal(tmp_path, store)
+    first.resume(store)
+    first.record(0, "Hello.", "Hola.")
+    first.close()
+    with open(first.path, 'a', encoding='utf-8') as f:
+        f.write('{"i": 1, "h": "') # Crashed mid-write
+    second = journal(tmp_path, store)
+    assert second.resume(store) == {0: "Hola."}
+    second.record(2, "Goodbye.", "Adiós.")
+    second.close()
+    assert resumed(tmp_path, store) == {0: "Hola.", 2: "Adiós."}
+
+
+def test_entries_for_edited_text_are_skipped(tmp_path):
+    store = make_store()
+    first = journal(tmp_path, store)
+    first.resume(store)
+    first.record(1, "How are you doing?", "¿Qué tal?") # Hash of a different source text
+    first.close()
+    assert resumed(tmp_path, store) == {}
+
+
+def test_discard_removes_the_journal(tmp_path):
+    store = make_store()
+    first = journal(tmp_path, store)
+    first.resume(store)
+    first.discard()
+    assert not os.path.exists(first.path)
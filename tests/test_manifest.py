@@ -0,0 +1,78 @@
+"""TranslationManifest: which cues an incremental run can carry over from the previous one."""
+import json
+
+from translator_core import LanguageRun, SourceFallback, SubtitleStore, TranslationManifest
+
+quiet = lambda message: None
+
+
+def make_store(cues, translations=None):
+    """cues: (number, start ms, text) triples; translations fills the translated column."""
+    store = SubtitleStore()
+    for number, start, text in cues:
+        store.append(number, start, start + 900, text)
+    if translations is not None:
+        store.translated[:] = translations
+    return store
+
+
+def manifest(tmp_path, target_lang="es", model="deepseek-chat"):
+    return TranslationManifest(str(tmp_path / "out.srt"), "en", target_lang, model, quiet)
+
+
+ORIGINAL = [(1, 1000, "Hello."), (2, 2000, "How are you?"), (3, 3000, "Goodbye.")]
+
+
+def test_saved_translations_load_by_text(tmp_path):
+    manifest(tmp_path).save(make_store(ORIGINAL, ["Hola.", "¿Cómo estás?", "Adiós."]))
+    previous = manifest(tmp_path).load()
+    assert previous == {TranslationManifest.cue_hash("Hello."): "Hola.",
+                        TranslationManifest.cue_hash("How are you?"): "¿Cómo estás?",
+                        TranslationManifest.cue_hash("Goodbye."): "Adiós."}
+
+
+def test_cue_hash_ignores_whitespace_and_line_endings():
+    assert TranslationManifest.cue_hash("- Hi  there\r\n- Bye ") == TranslationManifest.cue_hash("- Hi there\n- Bye")
+    assert TranslationManifest.cue_hash("Hi there") != TranslationManifest.cue_hash("Hi there!")
+
+
+def test_failed_and_untranslated_cues_are_left_out(tmp_path):
+    manifest(tmp_path).save(make_store(ORIGINAL, ["Hola.", "[TRANSLATION_ERROR] How are you?", None]), skip={1})
+    assert list(manifest(tmp_path).load().values()) == ["Hola."]
+
+
+def test_source_fallbacks_are_left_out(tmp_path):
+    manifest(tmp_path).save(make_store(ORIGINAL, ["Hola.", SourceFallback("How are you?"), "Adiós."]))
+    assert sorted(manifest(tmp_path).load().values()) == ["Adiós.", "Hola."]
+
+
+def test_other_settings_start_over(tmp_path):
+    manifest(tmp_path).save(make_store(ORIGINAL, ["Hola.", "¿Cómo estás?", "Adiós."]))
+    assert manifest(tmp_path, target_lang="fr").load() == {}
+    assert manifest(tmp_path, model="other-model").load() == {}
+    assert manifest(tmp_path, target_lang="ES").load() != {} # Language codes are compared case-insensitively
+
+
+def test_missing_or_unreadable_manifest_translates_everything(tmp_path):
+    log = []
+    assert TranslationManifest(str(tmp_path / "out.srt"), "en", "es", "m", log.append).load() == {}
+    (tmp_path / "out.srt.manifest.json").write_text("{not json", encoding="utf-8")
+    assert TranslationManifest(str(tmp_path / "out.srt"), "en", "es", "m", log.append).load() == {}
+    assert log[-1].startswith("Warning: Ignoring unreadable manifest")
+    (tmp_path / "out.srt.manifest.json").write_text(json.dumps({"cues": []}), encoding="utf-8")
+    assert TranslationManifest(str(tmp_path / "out.srt"), "en", "es", "m", log.append).load() == {}
+
+
+def test_revised_source_reuses_unchanged_cues_under_new_numbers(tmp_path):
+    output_file = str(tmp_path / "out.srt")
+    TranslationManifest(output_file, "en", "es", "m", quiet).save(make_store(ORIGINAL, ["Hola.", "¿Cómo estás?", "Adiós."]))
+
+    # Re-timed and renumbered, one line edited, one inserted, one blank
+    revised = make_store([(1, 500, "Hello."), (2, 1500, "New line."), (3, 2500, "How are you today?"),
+                          (4, 3500, ""), (5, 4500, "Goodbye.")])
+    run = LanguageRun(revised, str(tmp_path / "in.srt"), output_file, "es", quiet, incremental=True)
+    done = run.start("en", "m")
+    run.journal.close()
+    assert done == {0, 4}
+    assert run.result.reused == 2
+    assert revised.translated == ["Hola.", None, None, "", "Adiós."]
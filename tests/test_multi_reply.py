@@ -0,0 +1,63 @@
+"""Multi-language replies: splitting [[n:LANGUAGE]] blocks and re-sending missing ones."""
+import translator_core
+from translator_core import split_multi_reply, translate_batch_deepseek, translate_multi_deepseek
+
+LANGUAGES = ("es", "FR")
+
+
+def test_reply_is_split_per_cue_and_language():
+    reply = "[[1:es]]\nHola.\n[[1:fr]]\nSalut.\n[[2: ES ]]\nAdiós.\nHasta luego.\n[[2:Fr]]\nAu revoir."
+    assert split_multi_reply(reply, 2, LANGUAGES) == {
+        (1, "es"): "Hola.", (1, "FR"): "Salut.", (2, "es"): "Adiós.\nHasta luego.", (2, "FR"): "Au revoir.",
+    } # Keyed by the language as given, matched case-insensitively
+
+
+def test_duplicated_empty_and_unknown_blocks_are_dropped():
+    reply = ("[[1:es]]\nHola.\n[[1:fr]]\n\n[[1:de]]\nHallo.\n[[3:es]]\nExtra\n"
+             "[[2:es]]\nUno\n[[2:es]]\nDos\n[[2:fr]]\nDeux")
+    assert split_multi_reply(reply, 2, LANGUAGES) == {(1, "es"): "Hola.", (2, "FR"): "Deux"}
+
+
+def test_truncated_reply_drops_its_last_block():
+    reply = "[[1:es]]\nHola.\n[[1:fr]]\nSal"
+    assert split_multi_reply(reply, 1, LANGUAGES) == {(1, "es"): "Hola.", (1, "FR"): "Sal"}
+    assert split_multi_reply(reply, 1, LANGUAGES, truncated=True) == {(1, "es"): "Hola."}
+
+
+class FakeCompletions:
+    """Stands in for _post_chat_completion: a canned multi-language reply, then single cues by rule."""
+
+    def __init__(self, multi_reply, single):
+        self.multi_reply = multi_reply
+        self.single = single
+        self.singles = []
+
+    def __call__(self, payload, api_key, stream=False, expected_cues=1, log_func=print):
+        content = payload["messages"][-1]["content"]
+        if content.startswith("[[1]]"):
+            return self.multi_reply, False
+        self.singles.append(content)
+        return self.single(content), False
+
+
+def test_missing_blocks_are_sent_one_at_a_time(monkeypatch):
+    def single(text):
+        if text == "Two":
+            raise ValueError("API Error: 400")
+        return f"<{text}>"
+    completions = FakeCompletions("[[1:es]]\nUno\n[[1:fr]]\nUn\n[[2:es]]\nDos", single)
+    monkeypatch.setattr(translator_core, "_post_chat_completion", completions)
+    log = []
+    results = translate_multi_deepseek(["One", "Two", "Three"], "key", "en", LANGUAGES, "m", log_func=log.append)
+    assert results[0] == {"es": "Uno", "FR": "Un"}
+    assert results[1]["es"] == "Dos" and isinstance(results[1]["FR"], ValueError)
+    assert results[2] == {"es": "<Three>", "FR": "<Three>"}
+    assert completions.singles == ["Two", "Three", "Three"]
+    assert log == ["Warning: Batch reply was missing 3 of 6 cues; translated them individually."]
+
+
+def test_batch_with_language_tuple_asks_for_every_language(monkeypatch):
+    completions = FakeCompletions("[[1:es]]\nUno\n[[1:fr]]\nUn", lambda text: f"<{text}>")
+    monkeypatch.setattr(translator_core, "_post_chat_completion", completions)
+    assert translate_batch_deepseek(["One"], "key", "en", LANGUAGES, "m") == [{"es": "Uno", "FR": "Un"}]
+    assert completions.singles == []
@@ -0,0 +1,115 @@
+"""OrderedSrtWriter: file-order output, the bounded reorder buffer and the atomic rename."""
+import os
+import random
+
+import pytest
+
+import translator_core
+from translator_core import NativeSrtParser, OrderedSrtWriter, SubtitleStore, translate_srt_file
+
+quiet = lambda message: None
+
+
+def make_store(count):
+    store = SubtitleStore()
+    for position in range(count):
+        store.append(position + 1, position * 1000, position * 1000 + 900, f"Line {position + 1}")
+    return store
+
+
+def finish(writer, store, positions):
+    for position in positions:
+        store.translated[position] = store.contents[position].upper()
+        writer.add(position)
+
+
+def read_cues(path):
+    return NativeSrtParser.parse_store(path, quiet).contents
+
+
+def test_cues_are_written_in_file_order(tmp_path):
+    store = make_store(50)
+    writer = OrderedSrtWriter(str(tmp_path / "out.srt"), store, quiet)
+    order = list(range(50))
+    random.Random(7).shuffle(order)
+    finish(writer, store, order)
+    writer.close()
+    assert read_cues(str(tmp_path / "out.srt")) == [f"LINE {n}" for n in range(1, 51)]
+
+
+def test_partial_file_holds_the_contiguous_prefix(tmp_path):
+    store = make_store(5)
+    writer = OrderedSrtWriter(str(tmp_path / "out.srt"), store, quiet)
+    finish(writer, store, [1, 0, 3])
+    assert writer.written == 2
+    assert writer.partial_path == str(tmp_path / "out.partial.srt")
+    assert read_cues(writer.partial_path) == ["LINE 1", "LINE 2"]
+    assert not os.path.exists(tmp_path / "out.srt")
+    writer.abort()
+
+
+def test_close_replaces_the_target_atomically(tmp_path):
+    target = tmp_path / "out.srt"
+    target.write_text("old translation", encoding="utf-8")
+    store = make_store(3)
+    writer = OrderedSrtWriter(str(target), store, quiet)
+    finish(writer, store, [2, 1])
+    assert target.read_text(encoding="utf-8") == "old translation" # Untouched until close()
+    finish(writer, store, [0])
+    writer.close()
+    assert read_cues(str(target)) == ["LINE 1", "LINE 2", "LINE 3"]
+    assert not os.path.exists(writer.partial_path)
+
+
+def test_incomplete_output_is_kept_as_partial(tmp_path):
+    store = make_store(3)
+    writer = OrderedSrtWriter(str(tmp_path / "out.srt"), store, quiet)
+    finish(writer, store, [0, 2])
+    with pytest.raises(ValueError, match="1 of 3"):
+        writer.close()
+    writer.abort()
+    assert read_cues(writer.partial_path) == ["LINE 1"]
+    assert not os.path.exists(tmp_path / "out.srt")
+
+
+def test_abort_without_output_removes_partial(tmp_path):
+    writer = OrderedSrtWriter(str(tmp_path / "out.srt"), make_store(3), quiet)
+    writer.abort()
+    assert not os.path.exists(writer.partial_path)
+
+
+def test_reorder_buffer_is_bounded(tmp_path):
+    store = make_store(100)
+    writer = OrderedSrtWriter(str(tmp_path / "out.srt"), store, quiet, max_buffered=10)
+    finish(writer, store, range(99, -1, -1)) # Worst case: the first cue finishes last
+    writer.close()
+    assert writer.peak_buffered == 10
+    assert writer.overflowed == 89
+    assert read_cues(str(tmp_path / "out.srt")) == [f"LINE {n}" for n in range(1, 101)]
+
+
+class InOrderEngine:
+    """Finishes batches in the order they are submitted, without any network."""
+
+    name = "test"
+    concurrency = 4
+
+    def run(self, batches, api_key, source_lang, target_lang, model, on_result, max_ahead=None):
+        for batch in batches:
+            on_result(batch, [text.upper() for _, text in batch], None)
+
+
+def test_priority_range_stays_within_the_bound(tmp_path, monkeypatch):
+    monkeypatch.setattr(translator_core, "DEFAULT_MAX_REORDER_CUES", 500)
+    count = 3000
+    input_file = tmp_path / "in.srt"
+    input_file.write_text("\n".join(f"{n}\n00:{(n - 1) // 60:02d}:{(n - 1) % 60:02d},000 --> "
+                                     f"00:{(n - 1) // 60:02d}:{(n - 1) % 60:02d},900\nLine {n}\n"
+                                     for n in range(1, count + 1)), encoding="utf-8")
+    log = []
+    # Everything after the first minute goes first, so nearly the whole file finishes out of order
+    result = translate_srt_file(str(input_file), str(tmp_path / "out.srt"), "key", "en", "es", InOrderEngine(),
+                                log_func=log.append, priority_range=(60_000, count * 1000))
+    assert result.errors == 0
+    assert "Reorder buffer peak: 500 cues (2440 more waited in the store)." in log
+    assert read_cues(str(tmp_path / "out.srt")) == [f"LINE {n}" for n in range(1, count + 1)]
@@ -0,0 +1,121 @@
+"""RateController: AIMD concurrency limit, Retry-After pauses and token buckets."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import translator_core
+from translator_core import RateController, TokenBucket
+
+
+def test_concurrency_limit_blocks_until_release():
+    controller = RateController(2)
+    assert controller.try_acquire() == 0
+    assert controller.try_acquire() == 0
+    assert controller.try_acquire() > 0
+    controller.release(200)
+    assert controller.try_acquire() == 0
+
+
+def test_429_halves_limit_once_per_second():
+    controller = RateController(8)
+    for _ in range(3):
+        controller.try_acquire()
+    controller.release(429)
+    controller.release(429) # Same second: not halved again
+    assert controller.limit == 4
+    assert controller.lowest_limit == 4
+    assert controller.rate_limited == 2
+
+
+def test_successes_grow_limit_back_to_max():
+    controller = RateController(4)
+    controller.try_acquire()
+    controller.release(429)
+    assert controller.limit == 2
+    for _ in range(20):
+        controller.try_acquire()
+        controller.release(200)
+    assert controller.limit == 4
+
+
+def test_errors_without_status_leave_limit_alone():
+    controller = RateController(4)
+    controller.try_acquire()
+    controller.release(None)
+    assert controller.limit == 4
+    assert controller.in_flight == 0
+
+
+def test_retry_after_pauses_every_worker():
+    controller = RateController(4)
+    controller.try_acquire()
+    controller.release(429, retry_after=5)
+    assert controller.try_acquire() == pytest.approx(5, abs=0.1)
+
+
+def test_token_bucket_refills_at_rate():
+    bucket = TokenBucket(60) # One per second, holding RATE_BURST_SECONDS worth
+    assert bucket.capacity == translator_core.RATE_BURST_SECONDS
+    now = bucket.updated
+    assert bucket.wait_time(1, now) == 0
+    bucket.take(bucket.capacity)
+    assert bucket.wait_time(1, now) == pytest.approx(1.0)
+    assert bucket.wait_time(1, now + 1.0) == 0
+
+
+def test_requests_per_minute_limit():
+    controller = RateController(10, requests_per_minute=6) # Bucket holds one request
+    assert controller.try_acquire() == 0
+    controller.release(200)
+    assert controller.try_acquire() == pytest.approx(10, abs=0.1)
+
+
+def test_release_wakes_an_async_waiter_at_once():
+    controller = RateController(1)
+    controller.try_acquire()
+
+    async def wait_for_slot():
+        threading.Timer(0.02, controller.release, (200,)).start() # Released from another thread
+        started = time.monotonic()
+        await controller.acquire_async()
+        return time.monotonic() - started
+    assert asyncio.run(wait_for_slot()) < translator_core.CANCEL_POLL_INTERVAL / 2 # Not left to its next poll
+    assert controller.in_flight == 1
+    assert controller._async_waiters == {}
+
+
+def test_release_wakes_one_async_waiter_per_free_slot():
+    controller = RateController(2)
+    controller.try_acquire()
+    controller.try_acquire()
+
+    async def waiters():
+        loop = asyncio.get_running_loop()
+        tasks = [asyncio.ensure_future(controller.acquire_async()) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        await loop.run_in_executor(None, controller.release, 200)
+        await asyncio.sleep(0.01)
+        done = [task.done() for task in tasks]
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        return done
+    assert asyncio.run(waiters()) == [True, False, False] # The oldest waiter gets the slot
+    assert controller._async_waiters == {}
+
+
+@pytest.fixture
+def cancellation():
+    yield translator_core.configure_cancellation()
+    translator_core.configure_cancellation()
+
+
+def test_cancel_stops_an_async_waiter(cancellation):
+    controller = RateController(1)
+    controller.try_acquire()
+    threading.Timer(0.05, translator_core.cancel_run).start()
+    with pytest.raises(translator_core.TranslationCancelled):
+        asyncio.run(controller.acquire_async())
+    assert controller.in_flight == 1 # No slot was taken
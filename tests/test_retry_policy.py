@@ -0,0 +1,153 @@
+"""RetryPolicy: adaptive attempt deadlines, the run deadline, the retry budget and the circuit breaker."""
+import time
+
+import pytest
+
+import translator_core
+from translator_core import (
+    DEADLINE_HEADROOM, DEADLINE_MIN_SAMPLES, MIN_REQUEST_TIMEOUT, REQUEST_TIMEOUT, RETRY_BUDGET_MIN, RETRY_DELAY,
+    RETRY_MAX_DELAY, RateController, RetryPolicy, RunDeadlineExceeded, TranslationCancelled,
+)
+
+
+@pytest.fixture
+def policy():
+    return RetryPolicy(log_func=lambda message: None)
+
+
+@pytest.fixture
+def cancellation():
+    yield translator_core.configure_cancellation()
+    translator_core.configure_cancellation()
+
+
+def record_successes(policy, seconds, max_tokens=1000, count=DEADLINE_MIN_SAMPLES):
+    for _ in range(count):
+        policy.record_attempt(seconds, max_tokens, True)
+
+
+def test_fixed_timeout_until_enough_samples(policy):
+    record_successes(policy, 0.5, count=DEADLINE_MIN_SAMPLES - 1)
+    assert policy.attempt_timeout(1000, 0) == REQUEST_TIMEOUT
+
+
+def test_timeout_follows_p99_latency(policy):
+    record_successes(policy, 2.0)
+    assert policy.attempt_timeout(1000, 0) == pytest.approx(DEADLINE_HEADROOM * 2.0)
+
+
+def test_timeout_clamped_to_limits():
+    fast, slow = RetryPolicy(log_func=lambda message: None), RetryPolicy(log_func=lambda message: None)
+    record_successes(fast, 0.1)
+    record_successes(slow, REQUEST_TIMEOUT)
+    assert fast.attempt_timeout(1000, 0) == MIN_REQUEST_TIMEOUT
+    assert slow.attempt_timeout(1000, 0) == REQUEST_TIMEOUT
+
+
+def test_timeout_scales_with_output_budget_and_doubles_on_retry(policy):
+    record_successes(policy, 2.0, max_tokens=1000)
+    base = DEADLINE_HEADROOM * 2.0
+    assert policy.attempt_timeout(500, 0) == pytest.approx(base) # Smaller requests keep the typical deadline
+    assert policy.attempt_timeout(1500, 0) == pytest.approx(base * 1.5)
+    assert policy.attempt_timeout(1000, 1) == pytest.approx(base * 2)
+    assert policy.attempt_timeout(1000, 5) == REQUEST_TIMEOUT
+
+
+def test_requests_counted_on_first_attempt_only(policy):
+    policy.attempt_timeout(1000, 0)
+    policy.attempt_timeout(1000, 1)
+    policy.attempt_timeout(1000, 0)
+    assert policy.requests == 2
+
+
+def test_run_deadline_caps_timeout():
+    policy = RetryPolicy(run_deadline=2.0, log_func=lambda message: None)
+    timeout = policy.attempt_timeout(1000, 0)
+    assert 1.5 < timeout <= 2.0
+    assert policy.remaining() <= 2.0
+    assert RetryPolicy(log_func=lambda message: None).remaining() is None
+
+
+def test_run_deadline_raises_and_logs_once():
+    messages = []
+    policy = RetryPolicy(run_deadline=0.05, log_func=messages.append)
+    policy.check_time_left()
+    with pytest.raises(RunDeadlineExceeded):
+        policy.check_time_left(1.0) # Less than a second left
+    time.sleep(0.06)
+    assert policy.expired()
+    with pytest.raises(RunDeadlineExceeded):
+        policy.attempt_timeout(1000, 0)
+    assert len(messages) == 1 and messages[0].startswith("Warning")
+
+
+def test_retry_budget_grows_with_requests(policy):
+    assert all(policy.spend_retry() for _ in range(RETRY_BUDGET_MIN))
+    assert not policy.spend_retry()
+    assert policy.retries_refused == 1
+    for _ in range(5):
+        policy.attempt_timeout(1000, 0)
+    assert policy.spend_retry() # 20% of 5 requests
+    assert not policy.spend_retry()
+
+
+def test_backoff_bounds():
+    for attempt in range(8):
+        delay = min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt)
+        for _ in range(20):
+            assert delay / 2 <= RetryPolicy.backoff(attempt) <= delay
+
+
+def test_circuit_opens_on_failures_and_probe_closes_it(monkeypatch):
+    monkeypatch.setattr(translator_core, "CIRCUIT_COOLDOWN", 0.05)
+    messages = []
+    policy = RetryPolicy(log_func=messages.append)
+    for _ in range(translator_core.CIRCUIT_WINDOW // 2):
+        assert policy.try_pass() == 0
+        policy.record_attempt(1.0, 1000, False)
+    assert policy.circuit_opened == 1
+    assert 0 < policy.try_pass() <= 0.05
+    time.sleep(0.06)
+    assert policy.try_pass() == 0 # The probe
+    assert policy.try_pass() > 0 # Others wait for its outcome
+    policy.record_attempt(1.0, 1000, True)
+    assert policy.try_pass() == 0
+    assert messages[0].startswith("Warning") and "resumes" in messages[-1]
+
+
+def test_failed_probe_doubles_cooldown(monkeypatch):
+    monkeypatch.setattr(translator_core, "CIRCUIT_COOLDOWN", 0.05)
+    policy = RetryPolicy(log_func=lambda message: None)
+    for _ in range(translator_core.CIRCUIT_WINDOW // 2):
+        policy.record_attempt(1.0, 1000, False)
+    time.sleep(0.06)
+    assert policy.try_pass() == 0
+    policy.record_attempt(1.0, 1000, False)
+    assert policy.circuit_opened == 2
+    assert 0.05 < policy.try_pass() <= 0.1
+
+
+def test_client_errors_do_not_open_circuit(policy):
+    for _ in range(translator_core.CIRCUIT_WINDOW):
+        policy.record_attempt(1.0, 1000, None)
+    assert policy.circuit_opened == 0
+    assert policy.try_pass() == 0
+
+
+def test_acquire_gives_up_when_cancelled(cancellation):
+    controller = RateController(1)
+    controller.acquire()
+    translator_core.cancel_run()
+    started = time.monotonic()
+    with pytest.raises(TranslationCancelled):
+        controller.acquire()
+    assert time.monotonic() - started < 1.0
+    assert controller.in_flight == 1 # No slot taken
+
+
+def test_acquire_gives_up_at_run_deadline(cancellation):
+    controller = RateController(1)
+    controller.acquire()
+    policy = RetryPolicy(run_deadline=0.1, log_func=lambda message: None)
+    with pytest.raises(RunDeadlineExceeded):
+        controller.acquire(check=policy.check_time_left)
@@ -0,0 +1,111 @@
+"""Submission order: the bounded submission window, the priority range and cancel_run."""
+import asyncio
+import threading
+import time
+
+import pytest
+
+import translator_core
+from translator_core import AsyncioEngine, SubmissionWindow, ThreadPoolEngine, TranslationCancelled, translate_srt_file
+
+quiet = lambda message: None
+
+
+def test_window_releases_in_order_up_to_max_ahead():
+    window = SubmissionWindow(10, max_ahead=3)
+    assert window.release() == [0, 1, 2]
+    assert window.release() == []
+    window.mark_done(1) # Not the oldest: nothing moves
+    assert window.release() == []
+    window.mark_done(0) # 0 and 1 done: the window moves two ahead
+    assert window.release() == [3, 4]
+    for position in (2, 3, 4):
+        window.mark_done(position)
+    assert window.release() == [5, 6, 7]
+    assert SubmissionWindow(4).release() == [0, 1, 2, 3]
+
+
+class RecordingEngine:
+    """Finishes batches in submission order, recording them, without any network."""
+
+    name = "test"
+    concurrency = 2
+
+    def __init__(self):
+        self.batches = []
+
+    def run(self, batches, api_key, source_lang, target_lang, model, on_result, max_ahead=None):
+        for batch in batches:
+            self.batches.append([text for _, text in batch])
+            on_result(batch, [text.upper() for _, text in batch], None)
+
+
+def write_srt(path, count):
+    path.write_text("\n".join(f"{n}\n00:00:{n:02d},000 --> 00:00:{n:02d},900\nLine {n}\n" for n in range(1, count + 1)),
+                    encoding="utf-8")
+
+
+def test_priority_range_goes_first_then_timeline_order(tmp_path):
+    write_srt(tmp_path / "in.srt", 12)
+    engine = RecordingEngine()
+    log = []
+    translate_srt_file(str(tmp_path / "in.srt"), str(tmp_path / "out.srt"), "key", "en", "es", engine, batch_size=3,
+                       log_func=log.append, priority_range=(7_000, 10_000))
+    assert engine.batches == [["Line 7", "Line 8", "Line 9"], ["Line 1", "Line 2", "Line 3"],
+                              ["Line 4", "Line 5", "Line 6"], ["Line 10", "Line 11", "Line 12"]]
+    assert any(message.startswith("Translating 3 unique texts between 00:00:07,000 and 00:00:10,000 first.")
+               for message in log)
+    assert sum(message.startswith("Priority range done") for message in log) == 1
+
+
+def test_without_priority_range_batches_follow_the_timeline(tmp_path):
+    write_srt(tmp_path / "in.srt", 6)
+    engine = RecordingEngine()
+    translate_srt_file(str(tmp_path / "in.srt"), str(tmp_path / "out.srt"), "key", "en", "es", engine, batch_size=4,
+                       log_func=quiet)
+    assert engine.batches == [["Line 1", "Line 2", "Line 3", "Line 4"], ["Line 5", "Line 6"]]
+
+
+@pytest.fixture
+def cancellation():
+    yield translator_core.configure_cancellation()
+    translator_core.configure_cancellation()
+
+
+def test_cancel_stops_the_thread_engine(monkeypatch, cancellation):
+    started = []
+
+    def slow_batch(texts, *args):
+        started.append(texts)
+        time.sleep(0.3)
+        return texts
+    monkeypatch.setattr(translator_core, "translate_batch_deepseek", slow_batch)
+    engine = ThreadPoolEngine(2, log_func=quiet)
+    batches = [[(n, f"Line {n}")] for n in range(50)]
+    finished = []
+    threading.Timer(0.4, translator_core.cancel_run).start()
+    began = time.monotonic()
+    with pytest.raises(TranslationCancelled):
+        engine.run(batches, "key", "en", "es", "m", lambda batch, texts, error: finished.append(batch), max_ahead=10)
+    assert time.monotonic() - began < 1.0
+    engine.close()
+    assert len(started) <= 6 # Queued batches were dropped, not sent
+    assert len(finished) < len(batches)
+
+
+def test_cancel_stops_the_asyncio_engine(monkeypatch, cancellation):
+    pytest.importorskip("aiohttp")
+    started = []
+
+    async def slow_batch(session, texts, *args):
+        started.append(texts)
+        await asyncio.sleep(10)
+        return texts
+    monkeypatch.setattr(translator_core, "translate_batch_deepseek_async", slow_batch)
+    engine = AsyncioEngine(4, log_func=quiet)
+    threading.Timer(0.2, translator_core.cancel_run).start()
+    began = time.monotonic()
+    with pytest.raises(TranslationCancelled):
+        engine.run([[(n, f"Line {n}")] for n in range(50)], "key", "en", "es", "m", lambda *result: None, max_ahead=8)
+    assert time.monotonic() - began < 1.0 # Requests in flight are cancelled too
+    assert len(started) == 4
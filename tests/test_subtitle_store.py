@@ -0,0 +1,100 @@
+"""SubtitleStore and NativeSrtParser.parse_store, checked against the original parse()."""
+import pytest
+
+from translator_core import NativeSrtParser, SubtitleStore, ms_to_timestamp, timestamp_to_ms
+
+quiet = lambda message: None
+
+SAMPLE = (
+    "1\n00:00:01,000 --> 00:00:02,500\nHello there.\n\n"
+    "2\n00:00:03,000 --> 00:00:04,000\n- Two lines\n- of dialogue\n\n"
+    "not a number\n00:00:05,000 --> 00:00:06,000\nSkipped: invalid index\n\n"
+    "4\n00:00:07,000 --> 00:00:08,000\nHello there.\n\n"
+    "5\nbad timestamp\nSkipped: invalid timestamp\n\n"
+    "6\n01:02:03,004 --> 01:02:05,678\n<i>Last cue</i>, café"
+)
+
+
+def write(tmp_path, text, encoding="utf-8", newline="\n", name="sample.srt"):
+    path = tmp_path / name
+    with open(path, "w", encoding=encoding, newline=newline) as f:
+        f.write(text)
+    return str(path)
+
+
+def as_tuples(subtitles):
+    return [(sub.index, sub.start_time, sub.end_time, sub.content) for sub in subtitles]
+
+
+@pytest.mark.parametrize("encoding, newline", [
+    ("utf-8", "\n"),
+    ("utf-8", "\r\n"),
+    ("utf-8-sig", "\n"),
+    ("cp1252", "\r\n"),
+])
+def test_parse_store_matches_parse(tmp_path, encoding, newline):
+    path = write(tmp_path, "\n\n" + SAMPLE + "\n\n\n", encoding, newline)
+    expected = NativeSrtParser.parse(path, quiet)
+    store = NativeSrtParser.parse_store(path, quiet)
+    assert as_tuples(store) == as_tuples(expected)
+    assert [sub.index for sub in store] == [1, 2, 4, 6]
+
+
+def test_parse_store_matches_parse_across_read_chunks(tmp_path, monkeypatch):
+    monkeypatch.setattr(NativeSrtParser, "ENCODING_SAMPLE_SIZE", 7)
+    monkeypatch.setattr(NativeSrtParser, "READ_CHUNK_SIZE", 5) # Splits blocks, CRLF pairs and multi-byte characters
+    path = write(tmp_path, SAMPLE * 3, "utf-8", "\r\n")
+    assert as_tuples(NativeSrtParser.parse_store(path, quiet)) == as_tuples(NativeSrtParser.parse(path, quiet))
+
+
+def test_parse_store_logs_the_same_warnings(tmp_path):
+    path = write(tmp_path, SAMPLE)
+    parse_log, store_log = [], []
+    NativeSrtParser.parse(path, parse_log.append)
+    NativeSrtParser.parse_store(path, store_log.append)
+    warnings = lambda log: [message for message in log if message.startswith("Warning")]
+    assert len(warnings(store_log)) == 2
+    assert warnings(store_log) == warnings(parse_log)
+
+
+def test_identical_texts_are_stored_once(tmp_path):
+    store = NativeSrtParser.parse_store(write(tmp_path, SAMPLE), quiet)
+    assert store.contents[0] == store.contents[2] == "Hello there."
+    assert store.contents[0] is store.contents[2]
+
+
+def test_compose_store_writes_what_compose_writes(tmp_path):
+    path = write(tmp_path, SAMPLE)
+    subtitles = NativeSrtParser.parse(path, quiet)
+    store = NativeSrtParser.parse_store(path, quiet)
+    NativeSrtParser.compose(subtitles, str(tmp_path / "compose.srt"), quiet)
+    NativeSrtParser.compose_store(store, str(tmp_path / "compose_store.srt"), quiet)
+    assert (tmp_path / "compose_store.srt").read_bytes() == (tmp_path / "compose.srt").read_bytes()
+
+
+def test_translation_view_shares_cues_but_not_translations(tmp_path):
+    store = NativeSrtParser.parse_store(write(tmp_path, SAMPLE), quiet)
+    view = store.translation_view()
+    view.translated[0] = "Hola."
+    assert view.contents is store.contents
+    assert store.translated[0] is None
+    assert view.format_cue(0) == "1\n00:00:01,000 --> 00:00:02,500\nHola.\n"
+    assert store.format_cue(0) == "1\n00:00:01,000 --> 00:00:02,500\nHello there.\n"
+
+
+@pytest.mark.parametrize("timestamp, ms", [
+    ("00:00:00,000", 0),
+    ("00:00:01,001", 1001),
+    ("01:02:03,004", 3723004),
+    ("99:59:59,999", 359999999),
+])
+def test_timestamps_round_trip_through_milliseconds(timestamp, ms):
+    assert timestamp_to_ms(timestamp) == ms
+    assert ms_to_timestamp(ms) == timestamp
+
+
+def test_from_subtitles_round_trips(tmp_path):
+    subtitles = NativeSrtParser.parse(write(tmp_path, SAMPLE), quiet)
+    store = SubtitleStore.from_subtitles(subtitles)
+    assert len(store) == len(subtitles)
+    assert as_tuples(store) == as_tuples(subtitles)
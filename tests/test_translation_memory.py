@@ -0,0 +1,125 @@
+"""TranslationMemory: normalization, MinHash/LSH candidates and the fuzzy-match threshold."""
+import pytest
+
+from translator_core import (
+    MEMORY_BANDS, MEMORY_ROWS, TranslationMemory, _jaccard, _trigrams, min_shared_bands, minhash_signature,
+    normalize_memory_text,
+)
+
+MODEL = "deepseek-chat"
+
+
+@pytest.fixture
+def memory(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite3"), threshold=0.8)
+    yield memory
+    memory.close()
+
+
+@pytest.mark.parametrize("text", [
+    "Where are you going?",
+    "WHERE ARE YOU GOING",
+    "  where   are you going...",
+    "<i>Where are you going?</i>",
+    "{\\an8}Where are you going?",
+    "- Where are you going?",
+    "—Where are you going…",
+])
+def test_normalization_ignores_case_punctuation_tags_and_dashes(text):
+    assert normalize_memory_text(text) == "where are you going"
+
+
+def test_normalization_drops_apostrophes():
+    assert normalize_memory_text("I'm here.") == normalize_memory_text("Im here") == "im here"
+    assert normalize_memory_text("I’m here.") == "im here"
+
+
+def test_signature_is_stable_and_full_length():
+    signature = minhash_signature("where are you going")
+    assert len(signature) == MEMORY_BANDS * MEMORY_ROWS
+    assert signature == minhash_signature("where are you going")
+    # Lines shorter than a trigram still get a full signature
+    assert len(minhash_signature("ok")) == MEMORY_BANDS * MEMORY_ROWS
+
+
+def test_band_keys_depend_on_scope():
+    keys = TranslationMemory.band_keys("scope-a", "where are you going")
+    assert len(keys) == MEMORY_BANDS
+    assert keys == TranslationMemory.band_keys("scope-a", "where are you going")
+    assert set(keys).isdisjoint(TranslationMemory.band_keys("scope-b", "where are you going"))
+
+
+def test_min_shared_bands_grows_with_threshold():
+    assert 1 <= min_shared_bands(0.5) <= min_shared_bands(0.8) <= min_shared_bands(0.99) <= MEMORY_BANDS
+
+
+def test_normalized_match_is_exact_hit(memory):
+    memory.put("Where are you going?", "en", "es", MODEL, "¿Adónde vas?")
+    assert memory.get("<i>- where are you going...</i>", "en", "es", MODEL) == ("¿Adónde vas?", 1.0)
+    assert memory.stats()["exact_hits"] == 1
+
+
+def test_fuzzy_match_above_threshold(memory):
+    memory.put("I told you not to come back here tonight.", "en", "es", MODEL, "Te dije que no volvieras esta noche.")
+    query = "I told you not to come back here tonight, okay?"
+    expected = _jaccard(_trigrams(normalize_memory_text(query)),
+                        _trigrams(normalize_memory_text("I told you not to come back here tonight.")))
+    assert expected >= memory.threshold
+    translation, similarity = memory.get(query, "en", "es", MODEL)
+    assert translation == "Te dije que no volvieras esta noche."
+    assert similarity == pytest.approx(expected)
+    assert memory.stats()["fuzzy_hits"] == 1
+
+
+def test_below_threshold_is_miss(memory):
+    memory.put("I told you not to come back here tonight.", "en", "es", MODEL, "Te dije que no volvieras esta noche.")
+    assert memory.get("She never told me she was coming back.", "en", "es", MODEL) is None
+    assert memory.stats()["misses"] == 1
+
+
+def test_numbers_must_match(memory):
+    memory.put("The train leaves at 10 from platform 4.", "en", "es", MODEL, "El tren sale a las 10 del andén 4.")
+    assert memory.get("The train leaves at 10 from platform 5.", "en", "es", MODEL) is None
+
+
+def test_threshold_one_disables_fuzzy_matches(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite3"), threshold=1.0)
+    try:
+        memory.put("I told you not to come back here tonight.", "en", "es", MODEL, "Te dije.")
+        assert memory.get("I told you not to come back here tonight, okay?", "en", "es", MODEL) is None
+        assert memory.get("i told you not to come back here tonight", "en", "es", MODEL) == ("Te dije.", 1.0)
+    finally:
+        memory.close()
+
+
+def test_entries_are_scoped_to_language_pair_and_model(memory):
+    memory.put("Good morning.", "en", "es", MODEL, "Buenos días.")
+    assert memory.get("Good morning.", "en", "fr", MODEL) is None
+    assert memory.get("Good morning.", "en", "es", "other-model") is None
+    assert memory.get("Good morning.", "EN", "ES", MODEL) == ("Buenos días.", 1.0)
+
+
+def test_put_replaces_and_evicts(tmp_path):
+    memory = TranslationMemory(str(tmp_path / "memory.sqlite3"), max_entries=2)
+    try:
+        memory.put("Hello.", "en", "es", MODEL, "Hola.")
+        memory.put("hello", "en", "es", MODEL, "¡Hola!")
+        assert len(memory) == 1
+        assert memory.get("Hello", "en", "es", MODEL) == ("¡Hola!", 1.0)
+        memory.put_many([("One line.", "Una línea."), ("Another line.", "Otra línea."), ("...", "...")], "en", "es", MODEL)
+        assert len(memory) == 2 # Capped; the punctuation-only line is not stored
+    finally:
+        memory.close()
+
+
+def test_entries_persist_across_instances(tmp_path):
+    path = str(tmp_path / "memory.sqlite3")
+    memory = TranslationMemory(path)
+    memory.put("Good night.", "en", "es", MODEL, "Buenas noches.")
+    memory.close()
+    memory = TranslationMemory(path)
+    try:
+        assert len(memory) == 1
+        assert memory.get("good night", "en", "es", MODEL) == ("Buenas noches.", 1.0)
+    finally:
+        memory.close()
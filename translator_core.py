@@ -0,0 +1,3827 @@
+"""
+The translator without its window: native SRT handling, the batched translation
+pipeline with its engines, caches and rate control, and the command-line mode.
+Nothing here imports tkinter, and the HTTP clients (requests, httpx, aiohttp) are
+only imported once the first request is sent, so importing this module is quick.
+"""
+import sys
+import glob
+import argparse
+import threading
+import importlib.util
+import json
+import os
+import time
+import re # Import regular expressions for timestamp parsing
+import math
+import hashlib
+import bisect
+import random
+import codecs
+import sqlite3
+import zlib
+import collections
+import urllib.parse
+from array import array
+from concurrent.futures import ThreadPoolExecutor, wait, as_completed, FIRST_COMPLETED
+
+# --- Constants ---
+DEEPSEEK_API_URL = os.environ.get("DEEPSEEK_API_URL", "https://api.deepseek.com/v1/chat/completions") # Override to use a local mock or proxy
+DEFAULT_MODEL = "deepseek-chat"
+DEFAULT_SOURCE_LANG = "auto"
+DEFAULT_TARGET_LANG = "zh" # Example: Chinese
+DEFAULT_MAX_THREADS = 10
+RETRY_ATTEMPTS = 3
+RETRY_DELAY = 2 # seconds; first retry's backoff, doubled on each later one (with jitter)
+RETRY_MAX_DELAY = 30 # seconds, cap of the retry backoff
+RETRY_BUDGET_RATIO = 0.2 # Retries allowed per request sent, across the whole run
+RETRY_BUDGET_MIN = 10 # Retries allowed however few requests have been sent
+DEFAULT_BATCH_SIZE = 20 # Cues packed into one request (1 = one request per cue)
+DEFAULT_BATCH_TOKEN_BUDGET = 2000 # Rough upper bound of source tokens per batch
+REQUEST_TIMEOUT = 30 # seconds; longest deadline for one attempt, used until enough latencies have been seen
+MIN_REQUEST_TIMEOUT = 5 # seconds; shortest adaptive deadline for one attempt
+DEADLINE_HEADROOM = 3 # An attempt's deadline is this multiple of the recent p99 latency, scaled up for larger requests
+DEADLINE_MIN_SAMPLES = 20 # Successful attempts seen before deadlines adapt to observed latency
+DEADLINE_WINDOW = 200 # Recent successful attempts the deadlines are taken from
+CIRCUIT_WINDOW = 20 # Recent attempts the circuit breaker looks at
+CIRCUIT_FAILURE_RATE = 0.9 # Share of them failing with timeouts, connection or server errors that stops all sending
+CIRCUIT_COOLDOWN = 5 # seconds requests are held before a probe request; doubles while probes fail
+CIRCUIT_MAX_COOLDOWN = 60 # seconds
+CONNECT_TIMEOUT = 10 # seconds
+STREAM_IDLE_TIMEOUT = 15 # seconds a streamed reply may go without sending anything
+MAX_OUTPUT_TOKENS = 8192 # deepseek-chat's output limit
+OUTPUT_TOKENS_PER_SOURCE_TOKEN = 3 # max_tokens per estimated source token; a translation needing more is a runaway
+OUTPUT_TOKEN_ALLOWANCE = 32 # Extra max_tokens per request, and per cue marker in batched requests
+PROMPT_VERSION = 2 # Bump whenever the prompts change so cached translations are not reused
+DEFAULT_CACHE_PATH = os.path.join(os.path.expanduser("~"), ".quicktranslator", "translation_cache.sqlite3")
+DEFAULT_CACHE_MAX_ENTRIES = 500000
+DEFAULT_MEMORY_PATH = os.path.join(os.path.expanduser("~"), ".quicktranslator", "translation_memory.sqlite3")
+DEFAULT_MEMORY_MAX_ENTRIES = 5000000
+DEFAULT_MEMORY_THRESHOLD = 0.9 # Minimum similarity (Jaccard of character trigrams) for reusing a near-duplicate's translation
+MEMORY_BANDS = 8 # MinHash LSH: a stored line becomes a candidate if all rows of any band match
+MEMORY_ROWS = 4 # MinHash values per band
+MEMORY_BAND_SCAN = 64 # Stored lines read per band, so bands shared by very common phrasings stay cheap
+MEMORY_MAX_CANDIDATES = 8 # Stored lines sharing the most bands that are compared per lookup
+DEFAULT_REQUESTS_PER_MINUTE = 0 # 0 = no request-rate limit
+DEFAULT_TOKENS_PER_MINUTE = 0 # 0 = no token-rate limit
+RATE_BURST_SECONDS = 10 # Token buckets hold this many seconds' worth of quota
+RATE_LOG_INTERVAL = 10 # seconds between effective-concurrency log lines
+DEFAULT_MAX_REORDER_CUES = 2000 # Most out-of-order finished cues the writer's reorder buffer holds
+JOURNAL_VERSION = 1
+JOURNAL_FSYNC_INTERVAL = 1.0 # seconds between forced journal syncs to disk
+MANIFEST_VERSION = 1
+LATENCY_BUCKETS = (0.05, 0.1, 0.25, 0.5, 0.75, 1, 1.5, 2, 3, 5, 10, 20, 30, 60) # seconds, histogram upper bounds
+TOKEN_BUCKETS = (32, 64, 128, 256, 512, 1024, 2048, 4096, 8192) # tokens per request, histogram upper bounds
+HEDGE_MIN_SAMPLES = 20 # Successful attempts seen before slow requests are hedged
+HEDGE_WINDOW = 200 # Recent attempt latencies the hedge threshold (their p95) is taken from
+HEDGE_MAX_FRACTION = 0.1 # At most this share of attempts gets a duplicate
+BACKEND_FAILURE_THRESHOLD = 3 # Consecutive failed attempts before a backend is rested
+BACKEND_COOLDOWN = 30 # seconds a rested backend gets no requests while another one is healthy
+AUTH_ERROR_STATUSES = (401, 403) # A backend that answers with these is not used again in the run
+CANCEL_POLL_INTERVAL = 0.2 # seconds between checks for a cancelled run while waiting on requests
+
+# --- Native SRT Handling ---
+class Subtitle:
+    """One cue. Uses __slots__ so large lists of cues don't pay for a __dict__ each."""
+
+    __slots__ = ("index", "start_time", "end_time", "content")
+
+    def __init__(self, index, start_time, end_time, content):
+        self.index = index
+        self.start_time = start_time # String format: HH:MM:SS,ms
+        self.end_time = end_time   # String format: HH:MM:SS,ms
+        self.content = content
+
+    def __str__(self):
+        """String representation for composing the file."""
+        return f"{self.index}\n{self.start_time} --> {self.end_time}\n{self.content}\n"
+
+def timestamp_to_ms(timestamp):
+    """'HH:MM:SS,mmm' -> integer milliseconds."""
+    return int(timestamp[0:2]) * 3600000 + int(timestamp[3:5]) * 60000 + int(timestamp[6:8] + timestamp[9:12])
+
+def ms_to_timestamp(ms):
+    """Integer milliseconds -> 'HH:MM:SS,mmm'."""
+    hours, ms = divmod(ms, 3600000)
+    minutes, ms = divmod(ms, 60000)
+    seconds, ms = divmod(ms, 1000)
+    return f"{hours:02d}:{minutes:02d}:{seconds:02d},{ms:03d}"
+
+class SubtitleStore:
+    """
+    Columnar subtitle list for large files: cue numbers and start/end times (integer
+    milliseconds) live in typed arrays, source texts in one list in which identical
+    texts share a single string, and translations are filled into the `translated`
+    column in place. store[i] and iteration give Subtitle views of the source cues.
+    """
+
+    __slots__ = ("indices", "starts", "ends", "contents", "translated")
+
+    def __init__(self):
+        self.indices = array('q')
+        self.starts = array('q') # ms
+        self.ends = array('q') # ms
+        self.contents = []
+        self.translated = [] # None until the cue is translated
+
+    @classmethod
+    def from_subtitles(cls, subtitles):
+        store = cls()
+        for sub in subtitles:
+            store.append(sub.index, timestamp_to_ms(sub.start_time), timestamp_to_ms(sub.end_time), sub.content)
+        return store
+
+    def translation_view(self):
+        """Another store over the same cues (nothing copied) with its own empty translated column."""
+        view = SubtitleStore.__new__(SubtitleStore)
+        view.indices, view.starts, view.ends, view.contents = self.indices, self.starts, self.ends, self.contents
+        view.translated = [None] * len(self.contents)
+        return view
+
+    def append(self, index, start_ms, end_ms, content):
+        self.indices.append(index)
+        self.starts.append(start_ms)
+        self.ends.append(end_ms)
+        self.contents.append(content)
+        self.translated.append(None)
+
+    def __len__(self):
+        return len(self.contents)
+
+    def __getitem__(self, position):
+        return Subtitle(self.indices[position], ms_to_timestamp(self.starts[position]),
+                        ms_to_timestamp(self.ends[position]), self.contents[position])
+
+    def __iter__(self):
+        for position in range(len(self.contents)):
+            yield self[position]
+
+    def format_cue(self, position):
+        """SRT block for one cue (without the blank separator line), using the translation if there is one."""
+        content = self.translated[position]
+        if content is None:
+            content = self.contents[position]
+        return (f"{self.indices[position]}\n{ms_to_timestamp(self.starts[position])} --> "
+                f"{ms_to_timestamp(self.ends[position])}\n{content}\n")
+
+class NativeSrtParser:
+    """Handles parsing and composing SRT files natively."""
+
+    TIMESTAMP_REGEX = re.compile(r"(\d{2}:\d{2}:\d{2},\d{3})\s*-->\s*(\d{2}:\d{2}:\d{2},\d{3})")
+
+    ENCODINGS_TO_TRY = ['utf-8', 'utf-8-sig', 'cp1252', 'latin-1', 'cp1251']
+    ENCODING_SAMPLE_SIZE = 64 * 1024 # Bytes used by iter_parse to pick an encoding
+    READ_CHUNK_SIZE = 1024 * 1024 # Bytes read at a time by iter_parse
+
+    @staticmethod
+    def _parse_block(block, block_num, log_func):
+        """
+        Parses one blank-line separated block.
+        Returns:
+            Subtitle or None: None for empty blocks and for malformed ones (after logging a warning).
+        """
+        fields = NativeSrtParser._parse_block_fields(block, block_num, log_func)
+        return Subtitle(*fields) if fields is not None else None
+
+    @staticmethod
+    def _parse_block_fields(block, block_num, log_func):
+        """Same as _parse_block, but returns an (index, start_time, end_time, content) tuple."""
+        block = block.strip()
+        if not block:
+            return None
+
+        lines = block.split('\n')
+
+        if len(lines) < 3:
+            log_func(f"Warning: Skipping malformed block #{block_num} (too few lines) near index guess '{lines[0]}...'")
+            return None
+
+        # 1. Parse Index
+        try:
+            # Handle potential BOM character if utf-8-sig was used and BOM wasn't fully stripped
+            index_str = lines[0].lstrip('\ufeff')
+            index = int(index_str)
+        except ValueError:
+            log_func(f"Warning: Skipping block #{block_num} (invalid index '{lines[0]}')")
+            return None
+
+        # 2. Parse Timestamp
+        timestamp_match = NativeSrtParser.TIMESTAMP_REGEX.match(lines[1])
+        if not timestamp_match:
+            log_func(f"Warning: Skipping block #{block_num} with index {index} (invalid timestamp format: '{lines[1]}')")
+            return None
+        start_time = timestamp_match.group(1)
+        end_time = timestamp_match.group(2)
+
+        # 3. Get Content
+        content_lines = lines[2:]
+        content_text = "\n".join(content_lines).strip()
+
+        return index, start_time, end_time, content_text
+
+    @staticmethod
+    def _detect_encoding(sample, is_whole_file, log_func):
+        """Returns the first of ENCODINGS_TO_TRY that decodes the sample, or None."""
+        for enc in NativeSrtParser.ENCODINGS_TO_TRY:
+            try:
+                codecs.getincrementaldecoder(enc)().decode(sample, final=is_whole_file)
+                log_func(f"Successfully read file with encoding: {enc}")
+                return enc
+            except UnicodeDecodeError:
+                log_func(f"Failed to decode file with encoding: {enc}")
+        return None
+
+    @staticmethod
+    def _iter_text(filepath, log_func):
+        """Reads the file once and yields decoded text chunks with Windows line endings normalized."""
+        with open(filepath, 'rb') as f:
+            sample = f.read(NativeSrtParser.ENCODING_SAMPLE_SIZE)
+            encoding = NativeSrtParser._detect_encoding(sample, len(sample) < NativeSrtParser.ENCODING_SAMPLE_SIZE, log_func)
+            if encoding is None:
+                raise ValueError(f"Could not decode file '{filepath}' with any of the attempted encodings: {NativeSrtParser.ENCODINGS_TO_TRY}. Please check the file encoding.")
+
+            decoder = codecs.getincrementaldecoder(encoding)()
+            offset = 0
+            carry_cr = ""
+            chunk = sample
+            while True:
+                final = not chunk
+                try:
+                    text = decoder.decode(chunk, final=final)
+                except UnicodeDecodeError as e:
+                    # The sample decoded but a later chunk does not: decode the rest with the next encoding that works
+                    undecoded = decoder.getstate()[0] + chunk
+                    for fallback in NativeSrtParser.ENCODINGS_TO_TRY[NativeSrtParser.ENCODINGS_TO_TRY.index(encoding) + 1:]:
+                        try:
+                            decoder = codecs.getincrementaldecoder(fallback)()
+                            text = decoder.decode(undecoded, final=final)
+                        except UnicodeDecodeError:
+                            continue
+                        log_func(f"Warning: Encoding {encoding} failed near byte {offset + e.start}; decoding the rest with {fallback}")
+                        encoding = fallback
+                        break
+                    else:
+                        raise ValueError(f"Could not decode file '{filepath}' past byte {offset + e.start} with any of the attempted encodings.")
+                text = carry_cr + text
+                carry_cr = ""
+                if text.endswith('\r') and not final:
+                    text, carry_cr = text[:-1], '\r' # Its '\n' may be in the next chunk
+                if text:
+                    yield text.replace('\r\n', '\n')
+                if final:
+                    return
+                offset += len(chunk)
+                chunk = f.read(NativeSrtParser.READ_CHUNK_SIZE)
+
+    @staticmethod
+    def iter_parse(filepath, log_func=print):
+        """
+        Streaming version of parse: reads the file once and yields Subtitle objects as it goes.
+        The encoding is detected from the first ENCODING_SAMPLE_SIZE bytes. Blocks are split
+        exactly like parse, so malformed blocks produce the same warnings and block numbers.
+        Args:
+            filepath (str): Path to the SRT file.
+            log_func (callable): Function to use for logging messages.
+        Yields:
+            Subtitle: Each well-formed subtitle entry, in file order.
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If no suitable encoding is found.
+        """
+        for fields in NativeSrtParser._iter_block_fields(filepath, log_func):
+            yield Subtitle(*fields)
+
+    @staticmethod
+    def parse_store(filepath, log_func=print):
+        """
+        Parses an SRT file straight into a SubtitleStore, streaming like iter_parse.
+        Identical cue texts are stored once.
+        Returns:
+            SubtitleStore
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If no suitable encoding is found.
+        """
+        store = SubtitleStore()
+        shared_texts = {}
+        for index, start_time, end_time, content in NativeSrtParser._iter_block_fields(filepath, log_func):
+            store.append(index, timestamp_to_ms(start_time), timestamp_to_ms(end_time),
+                         shared_texts.setdefault(content, content))
+        return store
+
+    @staticmethod
+    def _iter_block_fields(filepath, log_func):
+        """Generator behind iter_parse and parse_store, yielding _parse_block_fields tuples."""
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Input file not found: {filepath}")
+
+        buffer = ""
+        block_num = 0
+        at_start = True
+        for text in NativeSrtParser._iter_text(filepath, log_func):
+            if at_start:
+                text = text.lstrip() # parse() strips the whole content before splitting
+                if not text:
+                    continue
+                at_start = False
+            buffer += text
+            start = 0
+            while True:
+                end = buffer.find('\n\n', start)
+                if end == -1:
+                    break
+                block_num += 1
+                fields = NativeSrtParser._parse_block_fields(buffer[start:end], block_num, log_func)
+                if fields is not None:
+                    yield fields
+                start = end + 2
+            buffer = buffer[start:]
+
+        if buffer.strip():
+            block_num += 1
+            fields = NativeSrtParser._parse_block_fields(buffer, block_num, log_func)
+            if fields is not None:
+                yield fields
+
+    @staticmethod
+    def parse(filepath, log_func=print):
+        """
+        Parses an SRT file natively, trying multiple common encodings.
+        Args:
+            filepath (str): Path to the SRT file.
+            log_func (callable): Function to use for logging messages (e.g., app.log_message).
+        Returns:
+            list[Subtitle]: A list of Subtitle objects.
+        Raises:
+            FileNotFoundError: If the file doesn't exist.
+            ValueError: If there's a significant parsing error or no suitable encoding is found.
+            Exception: For other file reading errors.
+        """
+        if not os.path.exists(filepath):
+            raise FileNotFoundError(f"Input file not found: {filepath}")
+
+        # --- Encoding Detection Logic ---
+        # Encodings to try, in order of preference/likelihood
+        # utf-8-sig handles UTF-8 with a BOM (Byte Order Mark)
+        # cp1252 is common for Western European languages on Windows
+        # latin-1 is similar to cp1252
+        # cp1251 for Cyrillic, add others if needed (e.g., 'gbk' for Chinese)
+        encodings_to_try = NativeSrtParser.ENCODINGS_TO_TRY
+        file_content = None
+        detected_encoding = None
+
+        for enc in encodings_to_try:
+            try:
+                with open(filepath, 'r', encoding=enc) as f:
+                    file_content = f.read()
+                detected_encoding = enc
+                log_func(f"Successfully read file with encoding: {enc}")
+                break # Stop trying once successful
+            except UnicodeDecodeError:
+                log_func(f"Failed to decode file with encoding: {enc}")
+                continue # Try the next encoding
+            except FileNotFoundError:
+                 raise # Re-raise specific error immediately
+            except Exception as e:
+                # Catch other potential file reading errors
+                raise IOError(f"Error reading file '{filepath}' with encoding {enc}: {e}")
+
+        if file_content is None or detected_encoding is None:
+            raise ValueError(f"Could not decode file '{filepath}' with any of the attempted encodings: {encodings_to_try}. Please check the file encoding.")
+        # --- End Encoding Detection ---
+
+
+        subtitles = []
+        try:
+            # Process the successfully read file_content
+            # Replace Windows line endings just in case, then split
+            content_normalized = file_content.replace('\r\n', '\n')
+            blocks = content_normalized.strip().split('\n\n')
+
+            block_num = 0
+            for block in blocks:
+                block_num += 1
+                subtitle = NativeSrtParser._parse_block(block, block_num, log_func)
+                if subtitle is not None:
+                    subtitles.append(subtitle)
+
+        except Exception as e:
+            # This catches errors during the parsing *after* the file has been read
+            raise ValueError(f"Error parsing content read from SRT file '{filepath}' (encoding used: {detected_encoding}): {e}")
+
+        return subtitles
+
+    @staticmethod
+    def compose(subtitles, filepath, log_func=print):
+        """
+        Composes a list of Subtitle objects into an SRT file natively, ALWAYS using UTF-8.
+        Args:
+            subtitles (list[Subtitle]): List of Subtitle objects to write.
+            filepath (str): Path to save the output SRT file.
+            log_func (callable): Function to use for logging messages.
+        Raises:
+            Exception: For file writing errors.
+        """
+        try:
+            # Always write output as UTF-8 for maximum compatibility
+            with open(filepath, 'w', encoding='utf-8') as f:
+                for i, sub in enumerate(subtitles):
+                    f.write(str(sub.index))
+                    f.write('\n')
+                    f.write(f"{sub.start_time} --> {sub.end_time}")
+                    f.write('\n')
+                    f.write(sub.content)
+                    f.write('\n')
+                    if i < len(subtitles) - 1:
+                         f.write('\n')
+            log_func(f"Successfully wrote translated file as UTF-8: {filepath}")
+        except Exception as e:
+            raise ValueError(f"Error writing SRT file '{filepath}' (using UTF-8 encoding): {e}")
+
+    @staticmethod
+    def compose_store(store, filepath, log_func=print):
+        """
+        Writes a SubtitleStore as UTF-8 SRT, using each cue's translation where it has one.
+        Same output format as compose.
+        Args:
+            store (SubtitleStore): The cues to write.
+            filepath (str): Path to save the output SRT file.
+            log_func (callable): Function to use for logging messages.
+        """
+        try:
+            with open(filepath, 'w', encoding='utf-8') as f:
+                for position in range(len(store)):
+                    if position:
+                        f.write('\n')
+                    f.write(store.format_cue(position))
+            log_func(f"Successfully wrote translated file as UTF-8: {filepath}")
+        except Exception as e:
+            raise ValueError(f"Error writing SRT file '{filepath}' (using UTF-8 encoding): {e}")
+
+
+# --- Pooled HTTP Sessions ---
+# requests, httpx and aiohttp take longer to import than everything else together,
+# so each is imported where it is first used rather than at the top of the module.
+
+def aiohttp_available():
+    """True if aiohttp (needed by the asyncio engine) is installed; doesn't import it."""
+    return importlib.util.find_spec("aiohttp") is not None
+
+def http_errors():
+    """
+    Exceptions raised by the HTTP clients for network and HTTP status errors.
+    Only clients already imported are included; the others can't have raised anything.
+    """
+    errors = []
+    for module_name, error_name in (("requests", "RequestException"), ("httpx", "HTTPError"), ("aiohttp", "ClientError")):
+        module = sys.modules.get(module_name)
+        if module is not None:
+            errors.append(getattr(module, error_name))
+    return tuple(errors)
+
+class HttpSessionPool:
+    """
+    Keep-alive HTTP client shared by all translation workers.
+    Uses one requests.Session that keeps a connection pool for each of hosts hosts, each
+    holding up to pool_size sockets, or an httpx HTTP/2 client when http2 is requested and
+    httpx[http2] is installed. pool_size should be the most requests the run can have in
+    flight (see BackendPool.max_in_flight). Safe to use from several threads.
+    """
+
+    def __init__(self, pool_size=DEFAULT_MAX_THREADS, http2=False, log_func=print, hosts=1):
+        self.pool_size = pool_size
+        self.http2 = http2
+        self.log_func = log_func
+        self.hosts = max(1, hosts)
+        self._lock = threading.Lock()
+        self._client = None
+        self._adapter = None
+        self._using_http2 = False
+        self._requests_sent = 0
+        self._connections_opened = 0 # Only tracked for the HTTP/2 client
+
+    def _get_client(self):
+        with self._lock:
+            if self._client is None:
+                if self.http2:
+                    try:
+                        import httpx
+                        self._client = httpx.Client(
+                            http2=True,
+                            limits=httpx.Limits(max_connections=self.pool_size,
+                                                max_keepalive_connections=self.pool_size)
+                        )
+                        self._using_http2 = True
+                    except ImportError as e:
+                        self.log_func(f"Warning: HTTP/2 unavailable ({e}); install 'httpx[http2]'. Using HTTP/1.1.")
+                if self._client is None:
+                    import requests
+                    from requests.adapters import HTTPAdapter
+                    session = requests.Session()
+                    self._adapter = HTTPAdapter(pool_connections=self.hosts, pool_maxsize=self.pool_size, pool_block=True)
+                    session.mount("https://", self._adapter)
+                    session.mount("http://", self._adapter)
+                    self._client = session
+            return self._client
+
+    def _trace(self, event_name, info):
+        """httpcore trace hook used to count new HTTP/2 connections."""
+        if event_name == "connection.connect_tcp.complete":
+            with self._lock:
+                self._connections_opened += 1
+
+    def post(self, url, headers=None, json=None, timeout=30):
+        """Sends a POST request over a pooled connection."""
+        client = self._get_client()
+        with self._lock:
+            self._requests_sent += 1
+        if self._using_http2:
+            return client.post(url, headers=headers, json=json, timeout=timeout,
+                               extensions={"trace": self._trace})
+        return client.post(url, headers=headers, json=json, timeout=timeout)
+
+    def post_stream(self, url, headers=None, json=None, connect_timeout=CONNECT_TIMEOUT, read_timeout=STREAM_IDLE_TIMEOUT):
+        """
+        Sends a POST request whose body is read as it arrives (response.iter_lines()).
+        read_timeout bounds each wait for more data, not the whole reply. The caller must
+        close() the response; closing it before the end drops the connection.
+        """
+        client = self._get_client()
+        with self._lock:
+            self._requests_sent += 1
+        if self._using_http2:
+            import httpx
+            request = client.build_request("POST", url, headers=headers, json=json,
+                                           timeout=httpx.Timeout(read_timeout, connect=connect_timeout),
+                                           extensions={"trace": self._trace})
+            return client.send(request, stream=True)
+        return client.post(url, headers=headers, json=json, timeout=(connect_timeout, read_timeout), stream=True)
+
+    def connection_stats(self):
+        """
+        Returns:
+            tuple[int, int]: (requests sent, connections opened).
+        """
+        with self._lock:
+            if self._using_http2 or self._adapter is None:
+                return self._requests_sent, self._connections_opened
+            pools = self._adapter.poolmanager.pools
+            opened = sum(pools[key].num_connections for key in list(pools.keys()) if key in pools)
+            return self._requests_sent, opened
+
+    def summary(self):
+        """One-line connection reuse summary for the log."""
+        sent, opened = self.connection_stats()
+        reused = max(0, sent - opened)
+        protocol = "HTTP/2" if self._using_http2 else "HTTP/1.1"
+        return f"Connections ({protocol}): {sent} requests over {opened} connections ({reused} reused)."
+
+    def close(self):
+        with self._lock:
+            if self._client is not None:
+                self._client.close()
+            self._client = None
+            self._adapter = None
+
+http_sessions = HttpSessionPool()
+
+def configure_http_sessions(pool_size, http2=False, log_func=print, hosts=1):
+    """Replaces the shared session pool, e.g. when Max Threads changes. Returns the new pool."""
+    global http_sessions
+    http_sessions.close()
+    http_sessions = HttpSessionPool(pool_size, http2, log_func, hosts)
+    return http_sessions
+
+
+# --- Rate Control ---
+
+def parse_retry_after(value):
+    """Parses a Retry-After header (seconds or HTTP date). Returns seconds, or None."""
+    if not value:
+        return None
+    try:
+        return max(0.0, float(value))
+    except ValueError:
+        pass
+    import email.utils # Only needed for the rare Retry-After given as a date
+    try:
+        retry_at = email.utils.parsedate_to_datetime(value)
+        return max(0.0, retry_at.timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class TokenBucket:
+    """Refills at rate_per_minute, holding at most RATE_BURST_SECONDS worth of quota. Not locked."""
+
+    def __init__(self, rate_per_minute):
+        self.rate = rate_per_minute / 60.0
+        self.capacity = max(1.0, self.rate * RATE_BURST_SECONDS)
+        self.level = self.capacity
+        self.updated = time.monotonic()
+
+    def wait_time(self, amount, now):
+        """Seconds until amount can be taken (0 if available now)."""
+        self.level = min(self.capacity, self.level + (now - self.updated) * self.rate)
+        self.updated = now
+        needed = min(amount, self.capacity) # Oversized requests wait for a full bucket, then overdraw
+        return 0.0 if self.level >= needed else (needed - self.level) / self.rate
+
+    def take(self, amount):
+        self.level -= amount
+
+class RateController:
+    """
+    Request gate shared by every translation worker.
+    Combines optional requests/tokens-per-minute token buckets with an AIMD concurrency
+    limit: the limit is halved on a 429 (at most once per second), grows by about one
+    slot per round of successful requests, and all workers pause for any Retry-After.
+    Waiting threads are woken by release(), and so are as many waiting coroutines (on any
+    event loop, oldest first) as there are free slots.
+    """
+
+    def __init__(self, max_concurrency, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                 tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, log_func=print):
+        self.max_concurrency = max_concurrency
+        self.limit = float(max_concurrency)
+        self.log_func = log_func
+        self.in_flight = 0
+        self.rate_limited = 0 # 429 responses seen
+        self.lowest_limit = max_concurrency
+        self.waited = 0.0 # Total seconds workers spent waiting for the gate
+        self._request_bucket = TokenBucket(requests_per_minute) if requests_per_minute > 0 else None
+        self._token_bucket = TokenBucket(tokens_per_minute) if tokens_per_minute > 0 else None
+        self._paused_until = 0.0
+        self._last_decrease = 0.0
+        self._started = time.monotonic()
+        self._last_log = self._started
+        self._cond = threading.Condition()
+        self._async_waiters = {} # Future of each coroutine waiting in acquire_async -> its event loop, oldest first
+
+    def try_acquire(self, tokens=1):
+        """Takes a slot if possible. Returns 0 on success, else the seconds to wait before trying again."""
+        with self._cond:
+            now = time.monotonic()
+            if now < self._paused_until:
+                return self._paused_until - now
+            if self.in_flight >= int(self.limit):
+                return CANCEL_POLL_INTERVAL # Woken early by release()
+            wait = 0.0
+            if self._request_bucket:
+                wait = max(wait, self._request_bucket.wait_time(1, now))
+            if self._token_bucket:
+                wait = max(wait, self._token_bucket.wait_time(tokens, now))
+            if wait > 0:
+                return wait
+            if self._request_bucket:
+                self._request_bucket.take(1)
+            if self._token_bucket:
+                self._token_bucket.take(tokens)
+            self.in_flight += 1
+            return 0.0
+
+    def acquire(self, tokens=1, check=None):
+        """
+        Blocks the calling thread until a request may be sent.
+        Args:
+            check (callable): Called between waits; raising from it gives up waiting (e.g. RetryPolicy.check_time_left).
+        Raises:
+            TranslationCancelled: If the run is cancelled while waiting (no slot is taken).
+        """
+        cancelled = run_cancelled
+        start = time.monotonic()
+        while True:
+            if cancelled.is_set():
+                raise TranslationCancelled()
+            if check is not None:
+                check()
+            wait = self.try_acquire(tokens)
+            if wait == 0:
+                break
+            with self._cond:
+                self._cond.wait(min(wait, CANCEL_POLL_INTERVAL))
+        self._add_wait(time.monotonic() - start)
+
+    async def acquire_async(self, tokens=1, check=None):
+        """Waits on the event loop until a request may be sent; same arguments and exceptions as acquire."""
+        import asyncio
+        loop = asyncio.get_running_loop()
+        cancelled = run_cancelled
+        start = time.monotonic()
+        while True:
+            if cancelled.is_set():
+                raise TranslationCancelled()
+            if check is not None:
+                check()
+            # Registered before trying, so a release() in between still wakes this coroutine
+            woken = loop.create_future()
+            with self._cond:
+                self._async_waiters[woken] = loop
+            try:
+                wait = self.try_acquire(tokens)
+                if wait == 0:
+                    break
+                try:
+                    await asyncio.wait_for(woken, min(wait, CANCEL_POLL_INTERVAL))
+                except asyncio.TimeoutError:
+                    pass
+            finally:
+                with self._cond:
+                    self._async_waiters.pop(woken, None)
+        self._add_wait(time.monotonic() - start)
+
+    @staticmethod
+    def _wake(futures):
+        for future in futures:
+            if not future.done():
+                future.set_result(None)
+
+    def _add_wait(self, seconds):
+        if seconds > 0.001:
+            with self._cond:
+                self.waited += seconds
+
+    def release(self, status_code=None, retry_after=None):
+        """
+        Frees the slot taken by acquire and adapts the concurrency limit.
+        Args:
+            status_code (int): HTTP status of the response, or None if none arrived.
+            retry_after (float): Seconds from a Retry-After header, if any.
+        """
+        with self._cond:
+            now = time.monotonic()
+            self.in_flight -= 1
+            if retry_after:
+                self._paused_until = max(self._paused_until, now + retry_after)
+            if status_code == 429:
+                self.rate_limited += 1
+                if now - self._last_decrease >= 1.0:
+                    self.limit = max(1.0, self.limit / 2)
+                    self._last_decrease = now
+                    self.lowest_limit = min(self.lowest_limit, int(self.limit))
+            elif status_code is not None and status_code < 400:
+                self.limit = min(float(self.max_concurrency), self.limit + 1.0 / self.limit)
+            self._cond.notify_all()
+            woken = {}
+            for _ in range(min(len(self._async_waiters), int(self.limit) - self.in_flight)):
+                future = next(iter(self._async_waiters))
+                woken.setdefault(self._async_waiters.pop(future), []).append(future)
+            log_now = now - self._last_log >= RATE_LOG_INTERVAL
+            if log_now:
+                self._last_log = now
+                message = (f"Rate control at {now - self._started:.0f}s: concurrency limit {int(self.limit)}"
+                           f"/{self.max_concurrency}, {self.in_flight} in flight, {self.rate_limited} rate-limit responses so far.")
+        for loop, futures in woken.items():
+            try:
+                loop.call_soon_threadsafe(self._wake, futures) # One wake-up per event loop
+            except RuntimeError:
+                pass # The loop has finished
+        if log_now:
+            self.log_func(message)
+
+    def summary(self):
+        """One-line summary for the end of a run."""
+        return (f"Rate control: concurrency limit ended at {int(self.limit)}/{self.max_concurrency} "
+                f"(lowest {self.lowest_limit}), {self.rate_limited} rate-limit responses, "
+                f"{self.waited:.1f} worker-seconds spent waiting for quota.")
+
+rate_controller = RateController(DEFAULT_MAX_THREADS)
+
+def configure_rate_controller(max_concurrency, requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE,
+                              tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, log_func=print):
+    """Replaces the shared rate controller for a new run. Returns the new controller."""
+    global rate_controller
+    rate_controller = RateController(max_concurrency, requests_per_minute, tokens_per_minute, log_func)
+    return rate_controller
+
+def _payload_tokens(payload):
+    """Estimated prompt plus completion tokens of a request, for the token bucket."""
+    return 2 * sum(estimate_tokens(message["content"]) for message in payload["messages"])
+
+
+# --- Request Metrics ---
+
+class Histogram:
+    """
+    Fixed-bucket histogram with Prometheus-style upper bounds plus an overflow bucket.
+    Not locked; RequestMetrics guards it.
+    """
+
+    def __init__(self, bounds):
+        self.bounds = tuple(bounds)
+        self.counts = [0] * (len(self.bounds) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.bounds, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q):
+        """Estimates the q-quantile by interpolating inside its bucket (0 if empty)."""
+        if self.count == 0:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, bucket_count in enumerate(self.counts):
+            if bucket_count and seen + bucket_count >= rank:
+                if i == len(self.bounds):
+                    return self.max # Overflow bucket has no upper bound
+                lower = self.bounds[i - 1] if i > 0 else 0.0
+                upper = min(self.bounds[i], self.max)
+                return lower + (upper - lower) * (rank - seen) / bucket_count
+            seen += bucket_count
+        return self.max
+
+    def as_dict(self):
+        cumulative = 0
+        buckets = {}
+        for bound, bucket_count in zip(self.bounds + ("+Inf",), self.counts):
+            cumulative += bucket_count
+            buckets[str(bound)] = cumulative
+        return {"count": self.count, "sum": round(self.sum, 6), "max": round(self.max, 6),
+                "p50": round(self.quantile(0.50), 6), "p95": round(self.quantile(0.95), 6),
+                "p99": round(self.quantile(0.99), 6), "buckets": buckets}
+
+class RequestMetrics:
+    """
+    Latency, retry, status-code and token-usage statistics for one run, shared by every worker.
+    A request is one logical chat completion; each of its HTTP tries is an attempt.
+    Safe to use from several threads.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._started = time.monotonic()
+        self.requests = 0 # Finished requests, successful or not
+        self.failed = 0 # Requests that gave up after all retries
+        self.truncated = 0 # Replies cut off by their output budget (finish_reason "length" or stopped early)
+        self.aborted = 0 # Streamed replies abandoned early as runaways
+        self.attempts = 0
+        self.hedged = 0 # Attempts that duplicated a slow attempt on another backend
+        self.status_codes = {} # "200", "429", ... or "error" when no response arrived
+        self.prompt_tokens = 0
+        self.completion_tokens = 0
+        self.cache_hit_tokens = 0 # DeepSeek prompt_cache_hit_tokens
+        self.cache_miss_tokens = 0 # DeepSeek prompt_cache_miss_tokens
+        self.request_latency = Histogram(LATENCY_BUCKETS) # Includes retries and their delays
+        self.attempt_latency = Histogram(LATENCY_BUCKETS) # One HTTP round trip each
+        self.first_token_latency = Histogram(LATENCY_BUCKETS) # Streamed replies only
+        self.attempts_per_request = Histogram(range(1, RETRY_ATTEMPTS + 1))
+        self.request_prompt_tokens = Histogram(TOKEN_BUCKETS)
+        self.request_completion_tokens = Histogram(TOKEN_BUCKETS)
+
+    def record_attempt(self, seconds, status_code, hedge=False):
+        """
+        Args:
+            seconds (float): Time from sending the request to the response (or failure).
+            status_code (int): HTTP status, or None if no response arrived.
+            hedge (bool): The attempt duplicated a slow one on another backend.
+        """
+        key = str(status_code) if status_code is not None else "error"
+        with self._lock:
+            self.attempts += 1
+            self.hedged += hedge
+            self.status_codes[key] = self.status_codes.get(key, 0) + 1
+            self.attempt_latency.observe(seconds)
+
+    def record_request(self, seconds, attempts, reply=None, ok=True):
+        """
+        Args:
+            seconds (float): Time from the first attempt to the final outcome.
+            attempts (int): Number of attempts made.
+            reply (CompletionReply): The successful reply, if any.
+            ok (bool): False if the request gave up.
+        """
+        usage = {}
+        if reply is not None:
+            usage = reply.usage or {}
+            if not usage and reply.aborted:
+                usage = {"completion_tokens": estimate_tokens(reply.content)} # No usage chunk after hanging up
+        with self._lock:
+            self.requests += 1
+            if not ok:
+                self.failed += 1
+            if reply is not None:
+                self.truncated += reply.truncated
+                self.aborted += reply.aborted is not None
+                if reply.first_token_seconds is not None:
+                    self.first_token_latency.observe(reply.first_token_seconds)
+            self.request_latency.observe(seconds)
+            self.attempts_per_request.observe(attempts)
+            if usage:
+                prompt = usage.get("prompt_tokens") or 0
+                completion = usage.get("completion_tokens") or 0
+                self.prompt_tokens += prompt
+                self.completion_tokens += completion
+                self.cache_hit_tokens += usage.get("prompt_cache_hit_tokens") or 0
+                self.cache_miss_tokens += usage.get("prompt_cache_miss_tokens") or 0
+                if prompt:
+                    self.request_prompt_tokens.observe(prompt)
+                self.request_completion_tokens.observe(completion)
+
+    def snapshot(self):
+        """Returns all counters and histograms as a JSON-ready dict."""
+        with self._lock:
+            elapsed = time.monotonic() - self._started
+            return {
+                "elapsed_seconds": round(elapsed, 3),
+                "requests": self.requests,
+                "failed_requests": self.failed,
+                "truncated_replies": self.truncated,
+                "aborted_replies": self.aborted,
+                "attempts": self.attempts,
+                "retries": max(0, self.attempts - self.hedged - self.requests),
+                "hedged_attempts": self.hedged,
+                "requests_per_second": round(self.requests / elapsed, 3) if elapsed > 0 else 0.0,
+                "status_codes": dict(self.status_codes),
+                "prompt_cache_hit_rate": (round(self.cache_hit_tokens / (self.cache_hit_tokens + self.cache_miss_tokens), 4)
+                                          if self.cache_hit_tokens + self.cache_miss_tokens else None),
+                "tokens": {
+                    "prompt": self.prompt_tokens,
+                    "completion": self.completion_tokens,
+                    "prompt_cache_hit": self.cache_hit_tokens,
+                    "prompt_cache_miss": self.cache_miss_tokens,
+                },
+                "request_latency_seconds": self.request_latency.as_dict(),
+                "attempt_latency_seconds": self.attempt_latency.as_dict(),
+                "first_token_seconds": self.first_token_latency.as_dict(),
+                "attempts_per_request": self.attempts_per_request.as_dict(),
+                "prompt_tokens_per_request": self.request_prompt_tokens.as_dict(),
+                "completion_tokens_per_request": self.request_completion_tokens.as_dict(),
+            }
+
+    def summary(self):
+        """One-line summary for the log."""
+        stats = self.snapshot()
+        latency = stats["attempt_latency_seconds"]
+        tokens = stats["tokens"]
+        first_token = stats["first_token_seconds"]
+        streamed = (f"time to first token p50/p95 {first_token['p50']:.2f}/{first_token['p95']:.2f}s, "
+                    if first_token["count"] else "")
+        hedged = f"{stats['hedged_attempts']} hedged, " if stats["hedged_attempts"] else ""
+        return (f"Requests: {stats['requests']} ({stats['failed_requests']} failed, {stats['retries']} retries, {hedged}"
+                f"{stats['truncated_replies']} over output budget, {stats['aborted_replies']} stopped early), "
+                f"latency p50/p95/p99 {latency['p50']:.2f}/{latency['p95']:.2f}/{latency['p99']:.2f}s, {streamed}"
+                f"tokens {tokens['prompt']} prompt ({hit_rate_text(stats)}) + {tokens['completion']} completion.")
+
+    def write_report(self, path, run_info=None):
+        """Writes the snapshot as JSON, with run_info (settings, per-file results) under "run"."""
+        report = {"run": run_info or {}, "metrics": self.snapshot()}
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+
+    def prometheus_text(self):
+        """Renders the counters and histograms in the Prometheus text exposition format."""
+        stats = self.snapshot()
+        lines = []
+
+        def counter(name, help_text, samples):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} counter")
+            for labels, value in samples:
+                lines.append(f"{name}{labels} {value}")
+
+        def histogram(name, help_text, data):
+            lines.append(f"# HELP {name} {help_text}")
+            lines.append(f"# TYPE {name} histogram")
+            for bound, cumulative in data["buckets"].items():
+                lines.append(f'{name}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f"{name}_sum {data['sum']}")
+            lines.append(f"{name}_count {data['count']}")
+
+        counter("quicktranslator_requests_total", "Chat-completion requests finished.", [("", stats["requests"])])
+        counter("quicktranslator_failed_requests_total", "Requests that gave up after all retries.", [("", stats["failed_requests"])])
+        counter("quicktranslator_truncated_replies_total", "Replies cut off by their output budget.", [("", stats["truncated_replies"])])
+        counter("quicktranslator_aborted_replies_total", "Streamed replies stopped early as runaways.", [("", stats["aborted_replies"])])
+        counter("quicktranslator_hedged_attempts_total", "Attempts that duplicated a slow one on another backend.", [("", stats["hedged_attempts"])])
+        counter("quicktranslator_attempts_total", "HTTP attempts by status code.",
+                [(f'{{code="{code}"}}', count) for code, count in sorted(stats["status_codes"].items())])
+        counter("quicktranslator_tokens_total", "Tokens reported by the API.",
+                [(f'{{kind="{kind}"}}', count) for kind, count in stats["tokens"].items()])
+        if stats["prompt_cache_hit_rate"] is not None:
+            lines.append("# HELP quicktranslator_prompt_cache_hit_ratio Share of prompt tokens served from the provider's context cache.")
+            lines.append("# TYPE quicktranslator_prompt_cache_hit_ratio gauge")
+            lines.append(f"quicktranslator_prompt_cache_hit_ratio {stats['prompt_cache_hit_rate']}")
+        histogram("quicktranslator_request_latency_seconds", "Request time including retries.", stats["request_latency_seconds"])
+        histogram("quicktranslator_attempt_latency_seconds", "Time of one HTTP attempt.", stats["attempt_latency_seconds"])
+        histogram("quicktranslator_first_token_seconds", "Time to the first streamed token.", stats["first_token_seconds"])
+        histogram("quicktranslator_attempts_per_request", "Attempts made per request.", stats["attempts_per_request"])
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.prometheus_text())
+
+def hit_rate_text(stats):
+    """Prompt-cache hits of a RequestMetrics.snapshot() for the log and the GUI's Statistics panel."""
+    hit_rate = stats["prompt_cache_hit_rate"]
+    if hit_rate is None:
+        return "no prompt-cache data"
+    return f"{stats['tokens']['prompt_cache_hit']} from the prompt cache, {hit_rate:.0%} hit rate"
+
+request_metrics = RequestMetrics()
+
+def configure_request_metrics():
+    """Starts fresh metrics for a new run. Returns the new RequestMetrics."""
+    global request_metrics
+    request_metrics = RequestMetrics()
+    return request_metrics
+
+
+# --- Ordered Streaming Output ---
+
+class OrderedSrtWriter:
+    """
+    Writes the translated cues of a SubtitleStore to disk in file order while a run
+    is in progress. Cues that finish out of order wait in a reorder buffer (of
+    positions; the text stays in the store) of at most max_buffered entries, and every
+    add() flushes the longest contiguous run of finished cues. Cues finishing while the
+    buffer is full (a priority range, cache hits or duplicates far ahead) aren't held:
+    the writer picks them up from the store's translated column when it reaches them.
+    Output goes to a '.partial' file next to the target (which can be previewed during
+    the run) and is atomically renamed over the target by close(). Output is always
+    UTF-8, as in compose().
+    """
+
+    def __init__(self, filepath, store, log_func=print, max_buffered=DEFAULT_MAX_REORDER_CUES):
+        base, ext = os.path.splitext(filepath)
+        self.filepath = filepath
+        self.partial_path = f"{base}.partial{ext or '.srt'}"
+        self.store = store
+        self.total = len(store)
+        self.log_func = log_func
+        self.max_buffered = max_buffered
+        self.written = 0
+        self.peak_buffered = 0
+        self.overflowed = 0 # Cues that finished while the buffer was full
+        self._next_position = 0
+        self._buffer = set()
+        self._unbuffered = 0 # ...of which are not written yet
+        try:
+            self._file = open(self.partial_path, 'w', encoding='utf-8')
+        except OSError as e:
+            raise ValueError(f"Error writing SRT file '{self.partial_path}' (using UTF-8 encoding): {e}")
+
+    def add(self, position):
+        """
+        Marks the cue at a 0-based position as translated (its text already in the store)
+        and writes whatever is now contiguous.
+        """
+        if position != self._next_position:
+            if len(self._buffer) < self.max_buffered:
+                self._buffer.add(position)
+                self.peak_buffered = max(self.peak_buffered, len(self._buffer))
+            else:
+                self.overflowed += 1
+                self._unbuffered += 1
+            return
+        self._buffer.add(position)
+        translated = self.store.translated
+        try:
+            while self._next_position < self.total:
+                if self._next_position in self._buffer:
+                    self._buffer.remove(self._next_position)
+                elif self._unbuffered and translated[self._next_position] is not None:
+                    self._unbuffered -= 1
+                else:
+                    break
+                if self.written:
+                    self._file.write('\n')
+                self._file.write(self.store.format_cue(self._next_position))
+                self.written += 1
+                self._next_position += 1
+            self._file.flush()
+        except OSError as e:
+            raise ValueError(f"Error writing SRT file '{self.partial_path}' (using UTF-8 encoding): {e}")
+
+    def close(self):
+        """Finishes the file and moves it into place. Raises ValueError if cues are missing."""
+        if self.written != self.total:
+            raise ValueError(f"Output incomplete: {self.written} of {self.total} subtitles were written "
+                             f"(partial output kept at '{self.partial_path}').")
+        try:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+            os.replace(self.partial_path, self.filepath)
+        except OSError as e:
+            raise ValueError(f"Error writing SRT file '{self.filepath}' (using UTF-8 encoding): {e}")
+        self.log_func(f"Successfully wrote translated file as UTF-8: {self.filepath}")
+
+    def abort(self):
+        """Closes the partial file after a failure, keeping what was written so far."""
+        if not self._file.closed:
+            self._file.close()
+        if self.written:
+            self.log_func(f"Partial output ({self.written} of {self.total} subtitles) kept at: {self.partial_path}")
+        else:
+            os.remove(self.partial_path)
+
+
+# --- Checkpoint Journal ---
+
+def _text_hash(text):
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()[:16]
+
+class TranslationJournal:
+    """
+    Append-only JSON-lines record of finished cues, kept next to the output file.
+    The first line holds a fingerprint of the input cues and translation settings;
+    every following line is {"i": position, "h": source hash, "t": translation}.
+    A later run with the same fingerprint resumes from it. Lines are flushed as they
+    are written and synced to disk every JOURNAL_FSYNC_INTERVAL seconds, and a torn
+    last line (from a crash mid-write) is ignored. Used from one thread only.
+    """
+
+    def __init__(self, output_file, subtitles, source_lang, target_lang, model, log_func=print):
+        self.path = output_file + ".journal"
+        self.log_func = log_func
+        self.fingerprint = self.make_fingerprint(subtitles, source_lang, target_lang, model)
+        self._file = None
+        self._last_sync = 0.0
+
+    @staticmethod
+    def make_fingerprint(subtitles, source_lang, target_lang, model):
+        """Hashes the input cues together with everything that affects their translation."""
+        digest = hashlib.sha256()
+        digest.update(f"{JOURNAL_VERSION}\x1f{prompt_layout.version}\x1f{model}\x1f{source_lang}\x1f{target_lang}".encode('utf-8'))
+        for position in range(len(subtitles)):
+            digest.update(f"\x1e{subtitles.indices[position]}\x1f{ms_to_timestamp(subtitles.starts[position])}"
+                          f"\x1f{ms_to_timestamp(subtitles.ends[position])}\x1f{subtitles.contents[position]}".encode('utf-8'))
+        return digest.hexdigest()
+
+    def resume(self, subtitles):
+        """
+        Loads a matching journal and opens it for appending (starting a new one otherwise).
+        Returns:
+            dict[int, str]: position -> translation for cues that can be skipped.
+        """
+        resumed = {}
+        if os.path.exists(self.path):
+            with open(self.path, 'r', encoding='utf-8') as f:
+                lines = f.read().split('\n')
+            try:
+                header = json.loads(lines[0])
+            except ValueError:
+                header = {}
+            if header.get("fingerprint") == self.fingerprint:
+                for line in lines[1:]:
+                    try:
+                        entry = json.loads(line)
+                        position = entry["i"]
+                    except (ValueError, KeyError, TypeError):
+                        continue # Torn or damaged line
+                    if 0 <= position < len(subtitles) and entry.get("h") == _text_hash(subtitles.contents[position]):
+                        resumed[position] = entry["t"]
+                self._file = open(self.path, 'a', encoding='utf-8')
+                if lines[-1]:
+                    self._file.write('\n') # Terminate a torn last line
+            else:
+                self.log_func("Found a journal from a different input file or settings; starting a new one.")
+
+        if self._file is None:
+            self._file = open(self.path, 'w', encoding='utf-8')
+            self._file.write(json.dumps({"version": JOURNAL_VERSION, "fingerprint": self.fingerprint}) + '\n')
+            self._file.flush()
+        return resumed
+
+    def record(self, position, source_text, translation):
+        """Appends one finished cue."""
+        self._file.write(json.dumps({"i": position, "h": _text_hash(source_text), "t": translation},
+                                    ensure_ascii=False) + '\n')
+        self._file.flush()
+        now = time.monotonic()
+        if now - self._last_sync >= JOURNAL_FSYNC_INTERVAL:
+            os.fsync(self._file.fileno())
+            self._last_sync = now
+
+    def close(self):
+        if self._file is not None and not self._file.closed:
+            self._file.flush()
+            os.fsync(self._file.fileno())
+            self._file.close()
+
+    def discard(self):
+        """Removes the journal once the output file is complete."""
+        self.close()
+        if os.path.exists(self.path):
+            os.remove(self.path)
+
+
+# --- Incremental Manifest ---
+
+class TranslationManifest:
+    """
+    Sidecar record of a finished translation, kept next to the output file as
+    '<output>.manifest.json': the settings it was made with and, per cue, a hash of
+    the normalized source text with its translation. When the source file is revised,
+    an incremental run reuses the translations of cues whose text is unchanged (under
+    the new cue numbers and timings) and sends only new or edited cues to the API.
+    """
+
+    def __init__(self, output_file, source_lang, target_lang, model, log_func=print):
+        self.path = output_file + ".manifest.json"
+        self.log_func = log_func
+        self.settings = hashlib.sha256(f"{MANIFEST_VERSION}\x1f{prompt_layout.version}\x1f{model}\x1f"
+                                       f"{(source_lang or 'auto').lower()}\x1f{target_lang.lower()}".encode('utf-8')).hexdigest()
+
+    @staticmethod
+    def cue_hash(text):
+        return _text_hash(normalize_cue_text(text))
+
+    def load(self):
+        """
+        Reads the manifest of the previous run.
+        Returns:
+            dict[str, str]: source hash -> translation; empty if there is no usable manifest.
+        """
+        if not os.path.exists(self.path):
+            self.log_func(f"No manifest from a previous run ({self.path}); translating every cue.")
+            return {}
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get("settings") != self.settings:
+                self.log_func("The manifest was made with different languages, model or prompt; translating every cue.")
+                return {}
+            return {cue["h"]: cue["t"] for cue in manifest["cues"]}
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            self.log_func(f"Warning: Ignoring unreadable manifest {self.path}: {e}")
+            return {}
+
+    def save(self, subtitles, skip=()):
+        """
+        Records every translated cue of the finished run, except the positions in skip
+        (failed cues) and cues left in the source language (SourceFallback), replacing the
+        previous manifest atomically.
+        """
+        cues = [{"i": subtitles.indices[position], "h": self.cue_hash(subtitles.contents[position]),
+                 "t": subtitles.translated[position]}
+                for position in range(len(subtitles))
+                if subtitles.contents[position] and position not in skip and subtitles.translated[position] is not None
+                and not isinstance(subtitles.translated[position], SourceFallback)]
+        temp_path = self.path + ".tmp"
+        try:
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump({"version": MANIFEST_VERSION, "settings": self.settings, "cues": cues}, f, ensure_ascii=False)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            self.log_func(f"Warning: Could not write manifest {self.path}: {e}")
+            return
+        self.log_func(f"Manifest of {len(cues)} cues saved for the next incremental run: {self.path}")
+
+
+# --- Prompt Layout ---
+
+def load_glossary(path):
+    """
+    Reads a glossary file: one 'term = translation' (or tab-separated) pair per line,
+    blank lines and lines starting with '#' ignored.
+    Returns:
+        list[tuple[str, str]]: The pairs in file order.
+    Raises:
+        ValueError: On a line that isn't a pair.
+    """
+    entries = []
+    with open(path, 'r', encoding='utf-8-sig') as f:
+        for line_number, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line or line.startswith('#'):
+                continue
+            term, separator, translation = line.partition('\t') if '\t' in line else line.partition('=')
+            if not separator or not term.strip() or not translation.strip():
+                raise ValueError(f"Glossary '{path}' line {line_number}: expected 'term = translation', got '{line}'")
+            entries.append((term.strip(), translation.strip()))
+    return entries
+
+class PromptLayout:
+    """
+    Builds request bodies so every request in a run starts with the same bytes.
+    Everything that doesn't depend on the cue (role, language pair, reply format,
+    glossary, style guide) goes into one system message that is identical for
+    single and batched requests, and the user message holds only the cue text.
+    That long shared prefix is what the provider's context cache can reuse.
+    """
+
+    def __init__(self, glossary=None, style_guide=None):
+        self.glossary = list(glossary or [])
+        self.style_guide = (style_guide or "").strip()
+        self._system_prompts = {}
+
+    @property
+    def version(self):
+        """Identifies the prompts for cache keys and journals: PROMPT_VERSION plus a hash of the glossary and style guide."""
+        if not self.glossary and not self.style_guide:
+            return str(PROMPT_VERSION)
+        extras = json.dumps([self.glossary, self.style_guide], ensure_ascii=False)
+        return f"{PROMPT_VERSION}:{hashlib.sha256(extras.encode('utf-8')).hexdigest()[:12]}"
+
+    def system_prompt(self, source_lang, target_lang):
+        """target_lang may be a tuple of languages, for replies holding every language (see translate_multi_deepseek)."""
+        key = ((source_lang or "auto").lower(), target_lang)
+        prompt = self._system_prompts.get(key)
+        if prompt is None:
+            if isinstance(target_lang, tuple):
+                languages = ", ".join(target_lang)
+                task = (f"Translate subtitles from {source_lang} into each of these languages: {languages}." if key[0] != 'auto'
+                        else f"Translate subtitles into each of these languages: {languages}, detecting the source language yourself.")
+                layout_rule = ("- The message holds numbered subtitles, each under a [[n]] marker on its own line. For every"
+                               " subtitle, in order, reply with one block per language in the order listed: a [[n:LANGUAGE]]"
+                               " marker on its own line, with n and the language name exactly as given, followed by the"
+                               " translation of that subtitle into that language only. Do not merge, split or skip subtitles.")
+            else:
+                task = (f"Translate subtitles from {source_lang} to {target_lang}." if key[0] != 'auto'
+                        else f"Translate subtitles to {target_lang}, detecting the source language yourself.")
+                layout_rule = ("- If the message holds numbered subtitles, each under a [[n]] marker on its own line, reply with"
+                               " every [[n]] marker on its own line, exactly as given and in the same order, followed by the"
+                               " translation of that subtitle only. Do not merge, split or skip subtitles.")
+            sections = [
+                "You are a professional subtitle translator. " + task,
+                "Rules:\n"
+                "- Reply with the translation only: no notes, explanations, quotes or the original text.\n"
+                "- Keep the meaning, tone and register of each subtitle, and keep it short enough to read on screen.\n"
+                "- Keep line breaks inside a subtitle where the translation allows it.\n"
+                + layout_rule,
+            ]
+            if self.glossary:
+                sections.append("Glossary (always translate these terms this way):\n"
+                                + "\n".join(f"{term} = {translation}" for term, translation in self.glossary))
+            if self.style_guide:
+                sections.append("Style guide:\n" + self.style_guide)
+            prompt = self._system_prompts[key] = "\n\n".join(sections)
+        return prompt
+
+    def payload(self, user_content, source_lang, target_lang, model, max_tokens):
+        return {
+            "model": model,
+            "messages": [
+                {"role": "system", "content": self.system_prompt(source_lang, target_lang)},
+                {"role": "user", "content": user_content}
+            ],
+            "temperature": 0.7,
+            "max_tokens": max_tokens,
+        }
+
+    def summary(self, source_lang, target_lang):
+        extras = []
+        if self.glossary:
+            extras.append(f"{len(self.glossary)} glossary terms")
+        if self.style_guide:
+            extras.append("a style guide")
+        return (f"Shared prompt prefix: ~{estimate_tokens(self.system_prompt(source_lang, target_lang))} tokens"
+                f"{' with ' + ' and '.join(extras) if extras else ''}.")
+
+prompt_layout = PromptLayout()
+
+def configure_prompt_layout(glossary=None, style_guide=None):
+    """Sets the glossary and style guide for a new run. Returns the new PromptLayout."""
+    global prompt_layout
+    prompt_layout = PromptLayout(glossary, style_guide)
+    return prompt_layout
+
+
+# --- Backends ---
+
+class Backend:
+    """
+    One OpenAI-compatible chat-completions endpoint with its own statistics.
+    url, model and api_key fall back to DEEPSEEK_API_URL, the run's model and the run's
+    API key. A backend without its own controller shares the run's rate controller.
+    """
+
+    def __init__(self, name, url=None, model=None, api_key=None, weight=1.0, controller=None):
+        self.name = name
+        self.url = url
+        self.model = model
+        self.api_key = api_key
+        self.weight = weight
+        self._controller = controller
+        self._lock = threading.Lock()
+        self.attempts = 0
+        self.failures = 0
+        self.wins = 0 # Replies used
+        self.hedges = 0 # Duplicates sent here because another backend was slow
+        self.hedge_wins = 0 # ...that answered first
+        self.latency = Histogram(LATENCY_BUCKETS) # Successful attempts
+        self.resting_until = 0.0
+        self._consecutive_failures = 0
+
+    @property
+    def endpoint(self):
+        return self.url or DEEPSEEK_API_URL
+
+    @property
+    def controller(self):
+        return self._controller or rate_controller
+
+    def healthy(self, now):
+        return now >= self.resting_until
+
+    def record_attempt(self, seconds, ok):
+        """
+        Args:
+            ok (bool): Whether the attempt succeeded; None for a hedge leg abandoned after the other one won.
+        Returns:
+            bool: True if this failure put the backend to rest.
+        """
+        with self._lock:
+            self.attempts += 1
+            if ok:
+                self.latency.observe(seconds)
+                self._consecutive_failures = 0
+            elif ok is not None:
+                self.failures += 1
+                if time.monotonic() < self.resting_until:
+                    return False # Attempts sent before the backend was rested
+                self._consecutive_failures += 1
+                if self._consecutive_failures >= BACKEND_FAILURE_THRESHOLD:
+                    self._consecutive_failures = 0
+                    self.resting_until = time.monotonic() + BACKEND_COOLDOWN
+                    return True
+        return False
+
+    def reject(self):
+        """Takes the backend out of the run for good (it refused the credentials). Returns False if it already was."""
+        with self._lock:
+            if self.resting_until == math.inf:
+                return False
+            self.resting_until = math.inf
+            return True
+
+    def snapshot(self):
+        with self._lock:
+            return {"url": self.endpoint, "model": self.model, "weight": self.weight, "attempts": self.attempts,
+                    "failures": self.failures, "wins": self.wins, "hedges": self.hedges, "hedge_wins": self.hedge_wins,
+                    "latency_seconds": self.latency.as_dict()}
+
+class BackendPool:
+    """
+    Spreads requests over one or more backends by weight.
+    A backend that fails BACKEND_FAILURE_THRESHOLD attempts in a row is rested for
+    BACKEND_COOLDOWN seconds, and a failed attempt is retried at once on another
+    healthy backend. With hedging on, an attempt still running after the p95 latency
+    of recent attempts gets a duplicate on another backend and the first reply wins.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, backends, hedge=False, concurrency=DEFAULT_MAX_THREADS, log_func=print):
+        if not backends:
+            raise ValueError("At least one backend is required.")
+        self.backends = list(backends)
+        self.hedge = hedge and len(self.backends) > 1
+        self.concurrency = concurrency
+        self.log_func = log_func
+        self._lock = threading.Lock()
+        self._random = random.Random()
+        self._recent = collections.deque(maxlen=HEDGE_WINDOW)
+        self._threshold = None
+        self._new_samples = 0
+        self._attempts = 0
+        self._hedges = 0
+        self._executor = None # Runs both legs of hedged attempts for the thread engine
+
+    @classmethod
+    def from_file(cls, path, hedge=None, concurrency=DEFAULT_MAX_THREADS, log_func=print):
+        """
+        Reads a JSON backends file:
+            {"hedge": true, "backends": [{"name": "deepseek", "url": "...", "model": "deepseek-chat",
+              "api_key_env": "DEEPSEEK_API_KEY", "weight": 2, "max_concurrency": 20,
+              "requests_per_minute": 0, "tokens_per_minute": 0}, ...]}
+        Only name is required. A backend with any of the limits gets its own rate controller.
+        Args:
+            hedge (bool): Overrides the file's "hedge" setting when not None.
+        Raises:
+            ValueError: If the file is malformed.
+        """
+        with open(path, 'r', encoding='utf-8') as f:
+            try:
+                config = json.load(f)
+            except json.JSONDecodeError as e:
+                raise ValueError(f"Backends file '{path}' is not valid JSON: {e}") from e
+        entries = config.get("backends") if isinstance(config, dict) else None
+        if not entries or not isinstance(entries, list):
+            raise ValueError(f"Backends file '{path}' has no \"backends\" list.")
+        backends = []
+        for entry in entries:
+            if not isinstance(entry, dict) or not entry.get("name"):
+                raise ValueError(f"Backends file '{path}': every backend needs a \"name\".")
+            api_key = entry.get("api_key")
+            if not api_key and entry.get("api_key_env"):
+                api_key = os.environ.get(entry["api_key_env"])
+                if not api_key:
+                    raise ValueError(f"Backend '{entry['name']}': environment variable {entry['api_key_env']} is not set.")
+            limits = [entry.get(key) or 0 for key in ("max_concurrency", "requests_per_minute", "tokens_per_minute")]
+            controller = None
+            if any(limits):
+                controller = RateController(limits[0] or concurrency, limits[1], limits[2], log_func)
+            weight = float(entry.get("weight", 1))
+            if weight <= 0:
+                raise ValueError(f"Backend '{entry['name']}': weight must be greater than 0.")
+            backends.append(Backend(entry["name"], entry.get("url"), entry.get("model"), api_key, weight, controller))
+        if hedge is None:
+            hedge = bool(config.get("hedge", False))
+        return cls(backends, hedge, concurrency, log_func)
+
+    @property
+    def executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_in_flight(self.concurrency)) # Both legs of every worker's attempt
+            return self._executor
+
+    def _candidates(self, avoid):
+        now = time.monotonic()
+        return [backend for backend in self.backends if backend not in avoid and backend.healthy(now)]
+
+    def choose(self, avoid=()):
+        """Picks a healthy backend not in avoid, by weight; failing that, the one back from rest soonest."""
+        candidates = self._candidates(avoid)
+        if not candidates:
+            return min(self.backends, key=lambda backend: (backend in avoid, backend.resting_until))
+        if len(candidates) == 1:
+            return candidates[0]
+        with self._lock:
+            return self._random.choices(candidates, weights=[backend.weight for backend in candidates])[0]
+
+    def has_alternative(self, avoid):
+        return bool(self._candidates(avoid))
+
+    def max_in_flight(self, concurrency):
+        """Most requests concurrency workers can have in flight: twice as many when both legs of each may be hedged."""
+        return 2 * concurrency if self.hedge else concurrency
+
+    @property
+    def hosts(self):
+        """Number of distinct hosts the backends send to."""
+        return len({urllib.parse.urlsplit(backend.endpoint)[:2] for backend in self.backends})
+
+    def hedge_delay(self):
+        """Seconds after which an attempt gets a duplicate, or None if it shouldn't."""
+        if not self.hedge:
+            return None
+        with self._lock:
+            self._attempts += 1
+            if len(self._recent) < HEDGE_MIN_SAMPLES or self._hedges >= HEDGE_MAX_FRACTION * self._attempts:
+                return None
+            if self._threshold is None or self._new_samples >= HEDGE_MIN_SAMPLES:
+                ordered = sorted(self._recent)
+                self._threshold = ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))]
+                self._new_samples = 0
+            return self._threshold
+
+    def choose_hedge(self, avoid):
+        """Picks the backend for a duplicate attempt, or None if no other backend is healthy."""
+        candidates = self._candidates(avoid)
+        if not candidates:
+            return None
+        backend = self.choose(avoid)
+        with self._lock:
+            self._hedges += 1
+        with backend._lock:
+            backend.hedges += 1
+        return backend
+
+    def record_attempt(self, backend, seconds, ok):
+        if ok:
+            with self._lock:
+                self._recent.append(seconds)
+                self._new_samples += 1
+        if backend.record_attempt(seconds, ok):
+            self.log_func(f"Warning: Backend '{backend.name}' failed {BACKEND_FAILURE_THRESHOLD} times in a row; "
+                          f"sending its requests elsewhere for {BACKEND_COOLDOWN}s.")
+
+    def reject(self, backend, status_code):
+        """Stops sending requests to a backend that refused its credentials; the others may have valid ones."""
+        if backend.reject() and len(self.backends) > 1:
+            self.log_func(f"Warning: Backend '{backend.name}' refused the API key (HTTP {status_code}); "
+                          f"sending its requests to the other backends for the rest of the run.")
+
+    def record_win(self, backend, hedged=False):
+        with backend._lock:
+            backend.wins += 1
+            if hedged:
+                backend.hedge_wins += 1
+
+    @property
+    def configured(self):
+        """False for the default single DeepSeek backend."""
+        return len(self.backends) > 1 or self.backends[0].url is not None
+
+    def describe(self):
+        return (f"{', '.join(f'{backend.name} (weight {backend.weight:g})' for backend in self.backends)}"
+                f"{', hedging slow requests' if self.hedge else ''}")
+
+    def snapshot(self):
+        return {"hedge": self.hedge, "backends": {backend.name: backend.snapshot() for backend in self.backends}}
+
+    def summary(self):
+        """One line per backend for the log (empty for the default single backend)."""
+        if not self.configured:
+            return ""
+        lines = []
+        for backend in self.backends:
+            stats = backend.snapshot()
+            latency = stats["latency_seconds"]
+            line = (f"Backend {backend.name}: {stats['wins']} replies used from {stats['attempts']} attempts "
+                    f"({stats['failures']} failed), latency p50/p95 {latency['p50']:.2f}/{latency['p95']:.2f}s")
+            if self.hedge:
+                line += f", {stats['hedge_wins']} of {stats['hedges']} hedges won"
+            if backend._controller:
+                line += f"; {backend._controller.summary()[:-1]}"
+            lines.append(line + ".")
+        return "\n".join(lines)
+
+    def close(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor:
+            executor.shutdown(wait=False)
+
+backend_pool = BackendPool([Backend("deepseek")])
+
+def configure_backends(path=None, hedge=None, concurrency=DEFAULT_MAX_THREADS, log_func=print):
+    """
+    Sets up the backends for a new run: those in a JSON backends file, or the single
+    DeepSeek endpoint. Returns the new BackendPool.
+    Raises:
+        OSError, ValueError: If the backends file can't be read.
+    """
+    global backend_pool
+    if path:
+        pool = BackendPool.from_file(path, hedge, concurrency, log_func)
+    else:
+        pool = BackendPool([Backend("deepseek")], False, concurrency, log_func)
+    backend_pool.close()
+    backend_pool = pool
+    return backend_pool
+
+
+# --- Cancellation ---
+
+class TranslationCancelled(Exception):
+    """Raised when a run is cancelled. Cues finished so far stay in the journal and the partial output."""
+
+    def __init__(self, message="Translation cancelled."):
+        super().__init__(message)
+
+run_cancelled = threading.Event() # Set by cancel_run(); engines and retries check it
+
+def configure_cancellation():
+    """Clears the cancel flag for a new run."""
+    global run_cancelled
+    run_cancelled = threading.Event()
+    return run_cancelled
+
+def cancel_run():
+    """
+    Stops the current run: engines submit nothing more, drop queued batches and
+    return within CANCEL_POLL_INTERVAL; requests in flight are discarded when they finish.
+    """
+    run_cancelled.set()
+
+
+# --- Deadlines and Retry Budget ---
+
+class RunDeadlineExceeded(Exception):
+    """Raised for requests the run deadline leaves no time for; their cues are marked [TRANSLATION_ERROR]."""
+
+    def __init__(self, message="Run deadline reached before this request could be translated."):
+        super().__init__(message)
+
+class RetryPolicy:
+    """
+    Run-wide limits on how long requests may take and how often they are retried.
+    Each attempt's deadline is DEADLINE_HEADROOM times the p99 latency of recent successful
+    attempts, scaled up for requests with a larger output budget than usual, kept between
+    MIN_REQUEST_TIMEOUT and REQUEST_TIMEOUT and doubled on each retry. Retries back off
+    exponentially with jitter and draw on a budget of RETRY_BUDGET_MIN plus RETRY_BUDGET_RATIO
+    per request sent. When CIRCUIT_FAILURE_RATE of the last CIRCUIT_WINDOW attempts failed with
+    a timeout, connection or server error, the circuit opens: requests are held, then a single
+    probe is sent, and the first success closes the circuit again. With a run deadline, attempts are
+    cut short to end by then and requests left after it fail with RunDeadlineExceeded.
+    Safe to use from several threads.
+    """
+
+    def __init__(self, run_deadline=None, log_func=print):
+        self.log_func = log_func
+        self.run_deadline = run_deadline # Seconds from now, or None
+        self._deadline_at = time.monotonic() + run_deadline if run_deadline else None
+        self._lock = threading.Lock()
+        self._recent = collections.deque(maxlen=DEADLINE_WINDOW) # (seconds, max_tokens) of successful attempts
+        self._new_samples = 0
+        self._p99 = None
+        self._typical_tokens = None
+        self.requests = 0
+        self.retries = 0
+        self.retries_refused = 0 # Failures not retried because the budget was spent
+        self.circuit_opened = 0
+        self.held = 0.0 # Total seconds requests waited for the circuit to close
+        self._outcomes = collections.deque(maxlen=CIRCUIT_WINDOW) # True for each failed attempt
+        self._open_until = None # None while the circuit is closed
+        self._cooldown = CIRCUIT_COOLDOWN
+        self._probe_until = 0.0
+        self._deadline_logged = False
+
+    def remaining(self):
+        """Seconds left before the run deadline, or None without one."""
+        if self._deadline_at is None:
+            return None
+        return self._deadline_at - time.monotonic()
+
+    def expired(self):
+        remaining = self.remaining()
+        return remaining is not None and remaining <= 0
+
+    def check_time_left(self, seconds=0.0):
+        """Raises RunDeadlineExceeded if the run deadline passes within seconds."""
+        remaining = self.remaining()
+        if remaining is None or remaining > seconds:
+            return
+        with self._lock:
+            log_now = not self._deadline_logged
+            self._deadline_logged = True
+        if log_now:
+            self.log_func(f"Warning: Run deadline of {self.run_deadline:g}s reached; the remaining cues are marked as errors.")
+        raise RunDeadlineExceeded()
+
+    def attempt_timeout(self, max_tokens, attempt):
+        """
+        Deadline in seconds for one attempt at a request with this output budget.
+        Raises:
+            RunDeadlineExceeded: If the run deadline has passed.
+        """
+        self.check_time_left()
+        with self._lock:
+            if attempt == 0:
+                self.requests += 1
+            if len(self._recent) >= DEADLINE_MIN_SAMPLES and (self._p99 is None or self._new_samples >= DEADLINE_MIN_SAMPLES):
+                latencies = sorted(seconds for seconds, _ in self._recent)
+                tokens = sorted(tokens for _, tokens in self._recent)
+                self._p99 = latencies[min(len(latencies) - 1, int(0.99 * len(latencies)))]
+                self._typical_tokens = tokens[len(tokens) // 2]
+                self._new_samples = 0
+            p99, typical_tokens = self._p99, self._typical_tokens
+        if p99 is None:
+            timeout = REQUEST_TIMEOUT
+        else:
+            scale = max(1.0, max_tokens / max(1, typical_tokens))
+            timeout = min(REQUEST_TIMEOUT, max(MIN_REQUEST_TIMEOUT, DEADLINE_HEADROOM * p99 * scale))
+        timeout = min(REQUEST_TIMEOUT, timeout * 2 ** attempt)
+        remaining = self.remaining()
+        return timeout if remaining is None else min(timeout, remaining)
+
+    def current_timeout(self):
+        """Deadline of a first attempt at a typical request, for the log."""
+        with self._lock:
+            p99 = self._p99
+        return REQUEST_TIMEOUT if p99 is None else min(REQUEST_TIMEOUT, max(MIN_REQUEST_TIMEOUT, DEADLINE_HEADROOM * p99))
+
+    def spend_retry(self):
+        """Takes one retry from the run's budget. Returns False if it is spent."""
+        with self._lock:
+            if self.retries < RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * self.requests:
+                self.retries += 1
+                return True
+            self.retries_refused += 1
+            log_now = self.retries_refused == 1
+        if log_now:
+            self.log_func(f"Warning: Retry budget spent ({self.retries} retries for {self.requests} requests); "
+                          f"failing requests are no longer retried until more succeed.")
+        return False
+
+    @staticmethod
+    def backoff(attempt):
+        """Seconds to wait before retry number attempt + 1: exponential, with the upper half jittered."""
+        delay = min(RETRY_MAX_DELAY, RETRY_DELAY * 2 ** attempt)
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    def try_pass(self):
+        """Returns 0 if an attempt may be sent now, else the seconds to wait before asking again."""
+        with self._lock:
+            if self._open_until is None:
+                return 0.0
+            now = time.monotonic()
+            if now < self._open_until:
+                return self._open_until - now
+            if now < self._probe_until:
+                return self._probe_until - now # A probe is out; its outcome closes or reopens the circuit
+            self._probe_until = now + REQUEST_TIMEOUT # Another probe goes out if this one never reports back
+            return 0.0
+
+    def wait_for_circuit(self):
+        """
+        Blocks the calling thread while the circuit is open.
+        Raises:
+            TranslationCancelled: If the run is cancelled while waiting.
+            RunDeadlineExceeded: If the run deadline passes while waiting.
+        """
+        cancelled = run_cancelled
+        start = time.monotonic()
+        while True:
+            wait = self.try_pass()
+            if wait == 0:
+                break
+            self.check_time_left()
+            if cancelled.wait(min(wait, CANCEL_POLL_INTERVAL)):
+                raise TranslationCancelled()
+        self._add_held(time.monotonic() - start)
+
+    async def wait_for_circuit_async(self):
+        """Waits on the event loop while the circuit is open; raises like wait_for_circuit."""
+        import asyncio
+        start = time.monotonic()
+        while True:
+            wait = self.try_pass()
+            if wait == 0:
+                break
+            self.check_time_left()
+            if run_cancelled.is_set():
+                raise TranslationCancelled()
+            await asyncio.sleep(min(wait, CANCEL_POLL_INTERVAL))
+        self._add_held(time.monotonic() - start)
+
+    def _add_held(self, seconds):
+        if seconds > 0.001:
+            with self._lock:
+                self.held += seconds
+
+    def record_attempt(self, seconds, max_tokens, ok):
+        """
+        Args:
+            ok (bool): True for a success, False for a timeout, connection or server error,
+                None for anything else (client errors, malformed replies, abandoned attempts).
+        """
+        message = None
+        with self._lock:
+            now = time.monotonic()
+            if ok:
+                self._recent.append((seconds, max_tokens))
+                self._new_samples += 1
+                self._outcomes.append(False)
+                if self._open_until is not None:
+                    self._open_until = None
+                    self._cooldown = CIRCUIT_COOLDOWN
+                    message = "Requests are succeeding again; sending resumes."
+            elif ok is False:
+                if self._open_until is None:
+                    self._outcomes.append(True)
+                    failures = sum(self._outcomes)
+                    if len(self._outcomes) >= CIRCUIT_WINDOW // 2 and failures >= CIRCUIT_FAILURE_RATE * len(self._outcomes):
+                        message = (f"Warning: {failures} of the last {len(self._outcomes)} requests failed; "
+                                   f"holding requests for {self._cooldown:g}s before trying one again.")
+                        self._open(now)
+                elif now >= self._open_until: # The probe failed (earlier failures were sent before the circuit opened)
+                    self._cooldown = min(CIRCUIT_MAX_COOLDOWN, self._cooldown * 2)
+                    self._open(now)
+                    message = f"Warning: Probe request failed; holding requests for {self._cooldown:g}s."
+        if message:
+            self.log_func(message)
+
+    def _open(self, now):
+        self._open_until = now + self._cooldown
+        self._probe_until = 0.0
+        self._outcomes.clear()
+        self.circuit_opened += 1
+
+    def snapshot(self):
+        with self._lock:
+            return {"run_deadline_seconds": self.run_deadline, "requests": self.requests, "retries": self.retries,
+                    "retry_budget": int(RETRY_BUDGET_MIN + RETRY_BUDGET_RATIO * self.requests),
+                    "retries_refused": self.retries_refused, "circuit_opened": self.circuit_opened,
+                    "circuit_held_seconds": round(self.held, 3),
+                    "p99_latency_seconds": self._p99, "typical_max_tokens": self._typical_tokens}
+
+    def summary(self):
+        """One-line summary for the end of a run."""
+        stats = self.snapshot()
+        return (f"Retry policy: attempt deadline {self.current_timeout():.1f}s for a typical request, "
+                f"{stats['retries']} of {stats['retry_budget']} budgeted retries used ({stats['retries_refused']} refused), "
+                f"circuit opened {stats['circuit_opened']} times ({stats['circuit_held_seconds']:.1f} request-seconds held).")
+
+retry_policy = RetryPolicy()
+
+def configure_retry_policy(run_deadline=None, log_func=print):
+    """
+    Replaces the shared retry policy for a new run. Returns the new policy.
+    Args:
+        run_deadline (float): Seconds from now after which no more requests are sent, or None.
+    """
+    global retry_policy
+    retry_policy = RetryPolicy(run_deadline, log_func)
+    return retry_policy
+
+
+# --- Core Translation Logic ---
+
+def _build_headers(api_key):
+    return {
+        "Content-Type": "application/json",
+        "Authorization": f"Bearer {api_key}"
+    }
+
+def _completion_content(result):
+    """Extracts the stripped first-choice content from a chat-completion response."""
+    if "choices" in result and len(result["choices"]) > 0:
+        return (result["choices"][0].get("message", {}).get("content") or "").strip()
+    raise ValueError(f"API Error: Unexpected response format. Response: {result}")
+
+def output_token_budget(texts):
+    """max_tokens for translating texts: a multiple of their estimated size plus an allowance per cue."""
+    source_tokens = sum(estimate_tokens(text) for text in texts)
+    return min(MAX_OUTPUT_TOKENS, OUTPUT_TOKENS_PER_SOURCE_TOKEN * source_tokens + OUTPUT_TOKEN_ALLOWANCE * len(texts))
+
+class CompletionReply:
+    """
+    The parts of a chat completion the translator uses.
+    Built from a whole JSON response with from_json, or line by line from a streamed
+    (server-sent events) response with feed(), which also spots runaway replies.
+    """
+
+    MARKER_REGEX = re.compile(r"\[\[(\d+)\]\]")
+
+    def __init__(self, max_tokens=MAX_OUTPUT_TOKENS, expected_cues=1, started=None):
+        self.max_tokens = max_tokens
+        self.expected_cues = expected_cues
+        self.started = started if started is not None else time.monotonic()
+        self.finish_reason = None
+        self.usage = None
+        self.first_token_seconds = None # Streamed replies only
+        self.aborted = None # Why reading stopped early, if it did
+        self.done = False
+        self._parts = []
+        self._chars = 0
+        self._tail = "" # End of the output so far, for spotting markers split across chunks
+
+    @classmethod
+    def from_json(cls, result):
+        reply = cls()
+        reply._parts.append(_completion_content(result))
+        reply.finish_reason = result["choices"][0].get("finish_reason")
+        reply.usage = result.get("usage")
+        reply.done = True
+        return reply
+
+    @property
+    def content(self):
+        return "".join(self._parts).strip()
+
+    @property
+    def truncated(self):
+        """True if the reply was cut off by its output budget, so its end may be missing."""
+        return self.finish_reason == "length" or self.aborted == "output budget"
+
+    def feed(self, line):
+        """
+        Takes one line of a streamed body (str or bytes).
+        Returns:
+            bool: True if the caller should stop reading and drop the connection.
+        Raises:
+            ValueError: On a malformed event.
+        """
+        if isinstance(line, bytes):
+            line = line.decode('utf-8')
+        line = line.strip()
+        if not line.startswith("data:"):
+            return False # Blank separators and ": keep-alive" comments
+        data = line[5:].strip()
+        if data == "[DONE]":
+            self.done = True
+            return False # Keep reading to the end of the body so the connection can be reused
+        chunk = json.loads(data)
+        if chunk.get("usage"):
+            self.usage = chunk["usage"]
+        for choice in chunk.get("choices") or []:
+            text = (choice.get("delta") or {}).get("content")
+            if text:
+                if self.first_token_seconds is None:
+                    self.first_token_seconds = time.monotonic() - self.started
+                self._parts.append(text)
+                self._chars += len(text)
+                self._tail = (self._tail + text)[-64:]
+            if choice.get("finish_reason"):
+                self.finish_reason = choice["finish_reason"]
+
+        if self.finish_reason is None:
+            if (self._chars + 3) // 4 > self.max_tokens: # Same estimate as estimate_tokens
+                self.aborted = "output budget" # The server should have stopped it already
+            elif self.expected_cues > 1 and any(int(number) > self.expected_cues
+                                                for number in self.MARKER_REGEX.findall(self._tail)):
+                self.aborted = "extra cues" # Everything before the extra marker is complete
+        return self.aborted is not None
+
+    def check_complete(self):
+        """Raises ValueError if the stream ended before the reply did."""
+        if not self.done and self.finish_reason is None and self.aborted is None:
+            raise ValueError("API Error: The reply stream ended before the reply was complete.")
+
+def _retry_delay_after(error, status_code, attempt, retry_after=None, failover=False, log_func=print):
+    """
+    Retry policy shared by the thread and asyncio engines.
+    Args:
+        error (Exception): The error raised by this attempt.
+        status_code (int): HTTP status of this attempt's response, or None.
+        attempt (int): Zero-based attempt number.
+        retry_after (float): Seconds requested by a Retry-After header, if any.
+        failover (bool): The next attempt goes to another healthy backend, so it needn't wait.
+        log_func (callable): Function to use for logging retries.
+    Returns:
+        float: Seconds to wait before the next attempt.
+    Raises:
+        ValueError: On authentication errors when no other backend is left to try.
+        ConnectionError: If network/API errors (including attempts past their deadline) persist after all
+            retries, or the run's retry budget is spent.
+        RuntimeError: For other errors (including malformed responses) that persist after all retries.
+    """
+    if isinstance(error, http_errors() + (TimeoutError,)):
+        error_message = f"Network/API Error: {error}"
+        if status_code is not None:
+             if status_code in AUTH_ERROR_STATUSES:
+                 if not failover:
+                     raise ValueError(f"Authentication Error: Invalid API Key (HTTP {status_code}).")
+                 error_message += " (Authentication failed)"
+             elif status_code == 429:
+                 error_message += " (Rate limit likely exceeded)"
+             elif status_code >= 500:
+                 error_message += " (Server error)"
+        failure = ConnectionError
+    else:
+        error_message = f"An unexpected error occurred during translation: {error}"
+        failure = RuntimeError
+
+    if attempt >= RETRY_ATTEMPTS - 1:
+        raise failure(f"{error_message}. Max retries reached.")
+    # Moving past a backend that refused the key isn't a retry against a struggling endpoint
+    if status_code not in AUTH_ERROR_STATUSES and not retry_policy.spend_retry():
+        raise failure(f"{error_message}. Not retried: the run's retry budget is spent.")
+    if failover:
+        log_func(f"{error_message}. Retrying on another backend...")
+        return 0
+    delay = max(retry_policy.backoff(attempt), retry_after or 0)
+    log_func(f"{error_message}. Retrying in {delay:.1f}s...")
+    return delay
+
+def _stream_payload(payload, stream):
+    if not stream:
+        return payload
+    return dict(payload, stream=True, stream_options={"include_usage": True})
+
+def _server_trouble(error, status_code):
+    """True if a failed attempt points at an overloaded or unreachable endpoint (for the circuit breaker)."""
+    return status_code is None or status_code >= 500 or isinstance(error, TimeoutError)
+
+def _timeout_after_wait(controller, policy, timeout):
+    """
+    The attempt's timeout, cut to the time the run deadline still leaves after waiting for a slot.
+    Raises:
+        RunDeadlineExceeded: If no time is left; the slot is given back unused.
+    """
+    try:
+        policy.check_time_left()
+    except RunDeadlineExceeded:
+        controller.release()
+        raise
+    remaining = policy.remaining()
+    return timeout if remaining is None else min(timeout, remaining)
+
+def _send_attempt(backend, payload, api_key, tokens, stream=False, expected_cues=1, cancel=None, hedge=False,
+                  timeout=REQUEST_TIMEOUT):
+    """
+    Makes one HTTP attempt at a chat completion on backend, gated by the retry policy's
+    circuit breaker and the backend's rate controller.
+    Args:
+        cancel (threading.Event): Set when the other leg of a hedged attempt won; a streamed reply then hangs up
+            (as it does when the run is cancelled).
+        hedge (bool): This is the duplicate leg of a hedged attempt.
+        timeout (float): Seconds the attempt may take once sent (see RetryPolicy.attempt_timeout); shortened
+            if the wait for the circuit breaker and a rate-limit slot brought the run deadline closer.
+    Returns:
+        tuple: (CompletionReply or None, the error or None, HTTP status or None, Retry-After seconds or None).
+    Raises:
+        TranslationCancelled: If the run is cancelled before the request is sent.
+        RunDeadlineExceeded: If the run deadline passes before the request is sent.
+    """
+    if backend.model:
+        payload = dict(payload, model=backend.model)
+    headers = _build_headers(backend.api_key or api_key)
+    controller = backend.controller
+    policy = retry_policy
+    status_code = None
+    retry_after = None
+    error = None
+    ok = False
+    policy.wait_for_circuit()
+    controller.acquire(tokens, policy.check_time_left)
+    if run_cancelled.is_set(): # Cancelled while this worker waited for its slot
+        controller.release()
+        raise TranslationCancelled()
+    timeout = _timeout_after_wait(controller, policy, timeout)
+    attempt_start = time.monotonic()
+    try:
+        if stream:
+            response = http_sessions.post_stream(backend.endpoint, headers=headers, json=payload,
+                                                 read_timeout=min(STREAM_IDLE_TIMEOUT, timeout))
+            try:
+                status_code = response.status_code
+                retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                response.raise_for_status()
+                reply = CompletionReply(payload["max_tokens"], expected_cues, attempt_start)
+                for line in response.iter_lines():
+                    if reply.feed(line):
+                        break
+                    if (cancel is not None and cancel.is_set()) or run_cancelled.is_set():
+                        ok = None
+                        return reply, None, status_code, retry_after # Discarded by the caller
+                    if time.monotonic() - attempt_start > timeout:
+                        raise TimeoutError(f"The reply took longer than its {timeout:.1f}s deadline")
+                reply.check_complete()
+            finally:
+                response.close()
+        else:
+            response = http_sessions.post(backend.endpoint, headers=headers, json=payload, timeout=timeout)
+            status_code = response.status_code
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.raise_for_status()
+            reply = CompletionReply.from_json(response.json())
+        ok = True
+        return reply, None, status_code, retry_after
+    except Exception as e:
+        error = e
+        return None, e, status_code, retry_after
+    finally:
+        elapsed = time.monotonic() - attempt_start
+        request_metrics.record_attempt(elapsed, status_code, hedge)
+        controller.release(status_code, retry_after)
+        if run_cancelled.is_set() or policy.expired():
+            ok = error = None # Discarded after a cancel; cut short by the run deadline rather than the backend
+        backend_pool.record_attempt(backend, elapsed, ok)
+        policy.record_attempt(elapsed, payload["max_tokens"], ok if error is None else (
+            False if _server_trouble(error, status_code) else None))
+
+def _hedged_attempt(pool, payload, api_key, tokens, stream, expected_cues, avoid, timeout=REQUEST_TIMEOUT):
+    """
+    One attempt on a backend chosen from pool, duplicated on a second backend if it
+    runs past the pool's hedge delay. Returns (backend, outcome of _send_attempt): the
+    first success, or the first backend's failure if every leg failed.
+    """
+    primary = pool.choose(avoid)
+    hedge_after = pool.hedge_delay()
+    if hedge_after is None:
+        outcome = _send_attempt(primary, payload, api_key, tokens, stream, expected_cues, timeout=timeout)
+        if outcome[1] is None:
+            pool.record_win(primary)
+        return primary, outcome
+
+    cancel = threading.Event()
+    legs = {pool.executor.submit(_send_attempt, primary, payload, api_key, tokens, stream, expected_cues, cancel,
+                                 timeout=timeout): primary}
+    done, _ = wait(legs, timeout=hedge_after)
+    if not done:
+        secondary = pool.choose_hedge(set(avoid) | {primary})
+        if secondary is not None:
+            legs[pool.executor.submit(_send_attempt, secondary, payload, api_key, tokens, stream, expected_cues, cancel, True,
+                                      timeout)] = secondary
+    failure = None
+    for future in as_completed(legs):
+        backend = legs[future]
+        outcome = future.result()
+        if outcome[1] is None:
+            cancel.set() # The other leg, if any, stops reading its stream
+            pool.record_win(backend, hedged=backend is not primary)
+            return backend, outcome
+        if failure is None or backend is primary:
+            failure = (backend, outcome)
+    return failure
+
+def _post_chat_completion(payload, api_key, stream=False, expected_cues=1, log_func=print):
+    """
+    Sends a chat-completion request to the configured backends with retries, failover and hedging.
+    Args:
+        payload (dict): The JSON request body, including max_tokens.
+        api_key (str): API key for backends without their own.
+        stream (bool): Read the reply as it is generated and hang up on runaway output.
+        expected_cues (int): Number of [[n]] cues in a batched payload.
+        log_func (callable): Function to use for logging retries.
+    Returns:
+        tuple[str, bool]: The stripped content of the first choice ('' if the model returned
+        nothing), and whether it was cut off by the output budget.
+    Raises:
+        See _retry_delay_after.
+        RunDeadlineExceeded: If the run deadline leaves no time for the request or its next retry.
+    """
+    pool = backend_pool
+    policy = retry_policy
+    tokens = _payload_tokens(payload)
+    payload = _stream_payload(payload, stream)
+    request_start = time.monotonic()
+    failed = set() # Backends that failed this request, avoided while another one is healthy
+
+    cancelled = run_cancelled
+    for attempt in range(RETRY_ATTEMPTS):
+        if cancelled.is_set():
+            raise TranslationCancelled()
+        timeout = policy.attempt_timeout(payload["max_tokens"], attempt)
+        backend, (reply, error, status_code, retry_after) = _hedged_attempt(
+            pool, payload, api_key, tokens, stream, expected_cues, failed, timeout)
+        if cancelled.is_set():
+            raise TranslationCancelled() # A stream may have hung up early; don't use its reply
+        if error is None:
+            request_metrics.record_request(time.monotonic() - request_start, attempt + 1, reply)
+            return reply.content, reply.truncated
+        failed.add(backend)
+        if status_code in AUTH_ERROR_STATUSES:
+            pool.reject(backend, status_code)
+        try:
+            policy.check_time_left() # An attempt cut short by the run deadline isn't retried
+            delay = _retry_delay_after(error, status_code, attempt, retry_after, pool.has_alternative(failed), log_func)
+            policy.check_time_left(delay)
+        except Exception:
+            request_metrics.record_request(time.monotonic() - request_start, attempt + 1, ok=False)
+            raise
+        if cancelled.wait(delay):
+            raise TranslationCancelled()
+
+
+def _single_payload(text, source_lang, target_lang, model):
+    """Builds the request body for translating one cue."""
+    return prompt_layout.payload(text, source_lang, target_lang, model, output_token_budget([text]))
+
+class SourceFallback(str):
+    """
+    The source text, returned in place of a translation that came back empty or cut off.
+    It is written to the output like a translation, but the run counts it as an error and
+    keeps it out of the journal, cache, memory and manifest, so the next run sends it again.
+    """
+
+def _single_result(text, translated_text, truncated=False, log_func=print):
+    if truncated:
+        log_func(f"Warning: Translation ran past its output budget and was dropped for text: '{text[:50]}...'")
+        return SourceFallback(text) # A cut-off translation is worse than the original
+    if translated_text:
+        return translated_text
+    log_func(f"Warning: Empty translation received for text: '{text[:50]}...'")
+    return SourceFallback(text) # Return original on empty translation
+
+def translate_text_deepseek(text, api_key, source_lang, target_lang, model, stream=False, log_func=print):
+    """Translates a single text string using DeepSeek API with retries."""
+    payload = _single_payload(text, source_lang, target_lang, model)
+    return _single_result(text, *_post_chat_completion(payload, api_key, stream, log_func=log_func), log_func=log_func)
+
+
+# --- Batched Translation ---
+
+BATCH_MARKER_REGEX = re.compile(r"^[ \t]*\[\[(\d+)\]\][ \t]*$", re.MULTILINE)
+
+def estimate_tokens(text):
+    """Cheap token estimate (~4 characters per token) used for batch budgeting."""
+    return max(1, (len(text) + 3) // 4)
+
+def make_batches(items, max_cues=DEFAULT_BATCH_SIZE, max_tokens=DEFAULT_BATCH_TOKEN_BUDGET):
+    """
+    Groups (key, text) pairs into batches limited by cue count and estimated tokens.
+    Args:
+        items (iterable[tuple]): (key, text) pairs, in the order they should be sent.
+        max_cues (int): Maximum number of cues per batch.
+        max_tokens (int): Approximate source-token budget per batch.
+    Returns:
+        list[list[tuple]]: The batches. A single cue larger than the budget gets its own batch.
+    """
+    batches = []
+    current = []
+    current_tokens = 0
+    for key, text in items:
+        tokens = estimate_tokens(text)
+        if current and (len(current) >= max_cues or current_tokens + tokens > max_tokens):
+            batches.append(current)
+            current = []
+            current_tokens = 0
+        current.append((key, text))
+        current_tokens += tokens
+    if current:
+        batches.append(current)
+    return batches
+
+def split_batch_reply(reply, expected_count):
+    """
+    Splits a batched reply on its [[n]] markers.
+    Args:
+        reply (str): The model output.
+        expected_count (int): Number of cues that were sent.
+    Returns:
+        dict[int, str]: 1-based marker number -> translation, only for markers that
+        appear exactly once and carry non-empty text.
+    """
+    matches = list(BATCH_MARKER_REGEX.finditer(reply))
+    seen = {}
+    duplicates = set()
+    for pos, match in enumerate(matches):
+        number = int(match.group(1))
+        end = matches[pos + 1].start() if pos + 1 < len(matches) else len(reply)
+        text = reply[match.end():end].strip()
+        if number in seen:
+            duplicates.add(number)
+        seen[number] = text
+    return {number: text for number, text in seen.items()
+            if 1 <= number <= expected_count and number not in duplicates and text}
+
+def _batch_payload(texts, source_lang, target_lang, model):
+    """Builds the request body for translating several cues under [[n]] markers."""
+    numbered = "\n".join(f"[[{n}]]\n{text}" for n, text in enumerate(texts, start=1))
+    return prompt_layout.payload(numbered, source_lang, target_lang, model, output_token_budget(texts))
+
+def _split_batch_result(reply, truncated, expected_count):
+    """
+    split_batch_reply, minus the last cue of a reply that was cut off (it may be incomplete),
+    unless the model had already gone on to invent cues past the last one requested.
+    """
+    parts = split_batch_reply(reply, expected_count)
+    if truncated and parts and not any(int(match.group(1)) > expected_count
+                                       for match in BATCH_MARKER_REGEX.finditer(reply)):
+        del parts[max(parts)]
+    return parts
+
+def _warn_missing_cues(missing, total, log_func):
+    if missing:
+        log_func(f"Warning: Batch reply was missing {missing} of {total} cues; translated them individually.")
+
+def translate_batch_deepseek(texts, api_key, source_lang, target_lang, model, stream=False, log_func=print):
+    """
+    Translates several subtitle texts with one chat-completion request.
+    Each cue is sent under a stable [[n]] marker and the reply is split back on the
+    same markers. Cues the model merged, dropped or left empty are translated one
+    at a time with translate_text_deepseek.
+    Args:
+        texts (list[str]): Source texts, in order.
+        target_lang (str or tuple[str]): A tuple asks for every language in the same
+            completion (see translate_multi_deepseek).
+        log_func (callable): Function to use for logging warnings.
+    Returns:
+        list[str]: Translations in the same order as texts (dicts of language -> translation
+        for a tuple of languages). A cue whose one-at-a-time request failed holds the
+        exception instead.
+    """
+    if isinstance(target_lang, tuple):
+        return translate_multi_deepseek(texts, api_key, source_lang, target_lang, model, stream, log_func)
+    if len(texts) == 1:
+        return [translate_text_deepseek(texts[0], api_key, source_lang, target_lang, model, stream, log_func)]
+
+    payload = _batch_payload(texts, source_lang, target_lang, model)
+    parts = _split_batch_result(*_post_chat_completion(payload, api_key, stream, len(texts), log_func), len(texts))
+
+    results = []
+    for n, text in enumerate(texts, start=1):
+        if n in parts:
+            results.append(parts[n])
+            continue
+        try:
+            results.append(translate_text_deepseek(text, api_key, source_lang, target_lang, model, stream, log_func))
+        except TranslationCancelled:
+            raise
+        except Exception as e: # Only this cue fails; the rest of the batch is kept
+            results.append(e)
+    _warn_missing_cues(len(texts) - len(parts), len(texts), log_func)
+    return results
+
+
+# --- Multi-Language Replies ---
+
+MULTI_MARKER_REGEX = re.compile(r"^[ \t]*\[\[(\d+):[ \t]*([^\]\n]+?)[ \t]*\]\][ \t]*$", re.MULTILINE)
+
+def _multi_payload(texts, source_lang, target_langs, model):
+    """Builds the request body for translating cues under [[n]] markers into several languages at once."""
+    numbered = "\n".join(f"[[{n}]]\n{text}" for n, text in enumerate(texts, start=1))
+    max_tokens = min(MAX_OUTPUT_TOKENS, len(target_langs) * output_token_budget(texts))
+    return prompt_layout.payload(numbered, source_lang, target_langs, model, max_tokens)
+
+def split_multi_reply(reply, expected_count, target_langs, truncated=False):
+    """
+    Splits a multi-language reply on its [[n:LANGUAGE]] markers.
+    Returns:
+        dict[tuple[int, str], str]: (1-based cue number, language as given in target_langs) -> translation,
+        only for blocks that appear exactly once and carry non-empty text. The last block of a
+        truncated reply is left out, as it may be incomplete.
+    """
+    languages = {language.lower(): language for language in target_langs}
+    matches = list(MULTI_MARKER_REGEX.finditer(reply))
+    if truncated and matches:
+        reply = reply[:matches[-1].start()]
+        matches.pop()
+    seen = {}
+    duplicates = set()
+    for pos, match in enumerate(matches):
+        key = (int(match.group(1)), languages.get(match.group(2).lower()))
+        end = matches[pos + 1].start() if pos + 1 < len(matches) else len(reply)
+        if key in seen:
+            duplicates.add(key)
+        seen[key] = reply[match.end():end].strip()
+    return {key: text for key, text in seen.items()
+            if 1 <= key[0] <= expected_count and key[1] is not None and key not in duplicates and text}
+
+def _multi_results(texts, target_langs, parts):
+    """Per-text dicts of the translations in parts; missing ones are None."""
+    return [{language: parts.get((n, language)) for language in target_langs} for n in range(1, len(texts) + 1)]
+
+def translate_multi_deepseek(texts, api_key, source_lang, target_langs, model, stream=False, log_func=print):
+    """
+    Translates subtitle texts into several languages with one chat-completion request.
+    The reply holds a [[n:LANGUAGE]] block per cue and language; blocks the model
+    dropped or left empty are translated one at a time with translate_text_deepseek.
+    Returns:
+        list[dict[str, str]]: Per text, language -> translation (or the exception, as in
+        translate_batch_deepseek).
+    """
+    payload = _multi_payload(texts, source_lang, target_langs, model)
+    reply, truncated = _post_chat_completion(payload, api_key, stream, log_func=log_func)
+    results = _multi_results(texts, target_langs, split_multi_reply(reply, len(texts), target_langs, truncated))
+    missing = 0
+    for text, translations in zip(texts, results):
+        for language, translation in translations.items():
+            if translation is None:
+                missing += 1
+                try:
+                    translations[language] = translate_text_deepseek(text, api_key, source_lang, language, model, stream, log_func)
+                except TranslationCancelled:
+                    raise
+                except Exception as e:
+                    translations[language] = e
+    _warn_missing_cues(missing, len(texts) * len(target_langs), log_func)
+    return results
+
+
+# --- Asyncio Translation (same payloads and retry policy, aiohttp transport) ---
+
+async def _send_attempt_async(session, backend, payload, api_key, tokens, stream=False, expected_cues=1, hedge=False,
+                              timeout=REQUEST_TIMEOUT):
+    """Async counterpart of _send_attempt, using an aiohttp.ClientSession. Cancelling it drops the connection."""
+    import asyncio
+    import aiohttp
+    if backend.model:
+        payload = dict(payload, model=backend.model)
+    headers = _build_headers(backend.api_key or api_key)
+    controller = backend.controller
+    policy = retry_policy
+    status_code = None
+    retry_after = None
+    error = None
+    ok = None # Stays None if cancelled because a hedged duplicate won
+    await policy.wait_for_circuit_async()
+    await controller.acquire_async(tokens, policy.check_time_left)
+    if run_cancelled.is_set(): # Cancelled while this request waited for its slot
+        controller.release()
+        raise TranslationCancelled()
+    timeout = _timeout_after_wait(controller, policy, timeout)
+    if stream:
+        client_timeout = aiohttp.ClientTimeout(total=timeout, sock_connect=CONNECT_TIMEOUT,
+                                               sock_read=min(STREAM_IDLE_TIMEOUT, timeout))
+    else:
+        client_timeout = aiohttp.ClientTimeout(total=timeout)
+    attempt_start = time.monotonic()
+    try:
+        async with session.post(backend.endpoint, headers=headers, json=payload, timeout=client_timeout) as response:
+            status_code = response.status
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.raise_for_status()
+            if stream:
+                reply = CompletionReply(payload["max_tokens"], expected_cues, attempt_start)
+                async for line in response.content:
+                    if reply.feed(line):
+                        response.close() # Drop the connection so the server stops generating
+                        break
+                reply.check_complete()
+            else:
+                reply = CompletionReply.from_json(await response.json(content_type=None))
+        ok = True
+        return reply, None, status_code, retry_after
+    except Exception as e:
+        if isinstance(e, asyncio.TimeoutError) and not str(e):
+            e = TimeoutError(f"The reply took longer than its {timeout:.1f}s deadline")
+        ok = False
+        error = e
+        return None, e, status_code, retry_after
+    finally:
+        elapsed = time.monotonic() - attempt_start
+        request_metrics.record_attempt(elapsed, status_code, hedge)
+        controller.release(status_code, retry_after)
+        if run_cancelled.is_set() or policy.expired():
+            ok = error = None # Discarded after a cancel; cut short by the run deadline rather than the backend
+        backend_pool.record_attempt(backend, elapsed, ok)
+        policy.record_attempt(elapsed, payload["max_tokens"], ok if error is None else (
+            False if _server_trouble(error, status_code) else None))
+
+async def _hedged_attempt_async(session, pool, payload, api_key, tokens, stream, expected_cues, avoid, timeout=REQUEST_TIMEOUT):
+    """Async counterpart of _hedged_attempt; the losing leg is cancelled."""
+    import asyncio
+    primary = pool.choose(avoid)
+    hedge_after = pool.hedge_delay()
+    if hedge_after is None:
+        outcome = await _send_attempt_async(session, primary, payload, api_key, tokens, stream, expected_cues, timeout=timeout)
+        if outcome[1] is None:
+            pool.record_win(primary)
+        return primary, outcome
+
+    legs = {asyncio.ensure_future(_send_attempt_async(session, primary, payload, api_key, tokens, stream, expected_cues,
+                                                      timeout=timeout)): primary}
+    done, pending = await asyncio.wait(legs, timeout=hedge_after)
+    if not done:
+        secondary = pool.choose_hedge(set(avoid) | {primary})
+        if secondary is not None:
+            pending.add(asyncio.ensure_future(_send_attempt_async(session, secondary, payload, api_key, tokens, stream,
+                                                                  expected_cues, True, timeout)))
+            legs.update((task, secondary) for task in pending if task not in legs)
+    failure = None
+    while True:
+        for task in done:
+            backend = legs[task]
+            outcome = task.result()
+            if outcome[1] is None:
+                for other in pending:
+                    other.cancel()
+                await asyncio.gather(*pending, return_exceptions=True)
+                pool.record_win(backend, hedged=backend is not primary)
+                return backend, outcome
+            if failure is None or backend is primary:
+                failure = (backend, outcome)
+        if not pending:
+            return failure
+        done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+
+async def _post_chat_completion_async(session, payload, api_key, stream=False, expected_cues=1, log_func=print):
+    """Async counterpart of _post_chat_completion."""
+    import asyncio
+    pool = backend_pool
+    policy = retry_policy
+    tokens = _payload_tokens(payload)
+    payload = _stream_payload(payload, stream)
+    request_start = time.monotonic()
+    failed = set()
+
+    cancelled = run_cancelled
+    for attempt in range(RETRY_ATTEMPTS):
+        if cancelled.is_set():
+            raise TranslationCancelled()
+        timeout = policy.attempt_timeout(payload["max_tokens"], attempt)
+        backend, (reply, error, status_code, retry_after) = await _hedged_attempt_async(
+            session, pool, payload, api_key, tokens, stream, expected_cues, failed, timeout)
+        if cancelled.is_set():
+            raise TranslationCancelled() # Don't use a reply that finished after the cancel
+        if error is None:
+            request_metrics.record_request(time.monotonic() - request_start, attempt + 1, reply)
+            return reply.content, reply.truncated
+        failed.add(backend)
+        if status_code in AUTH_ERROR_STATUSES:
+            pool.reject(backend, status_code)
+        try:
+            policy.check_time_left() # An attempt cut short by the run deadline isn't retried
+            delay = _retry_delay_after(error, status_code, attempt, retry_after, pool.has_alternative(failed), log_func)
+            policy.check_time_left(delay)
+        except Exception:
+            request_metrics.record_request(time.monotonic() - request_start, attempt + 1, ok=False)
+            raise
+        await asyncio.sleep(delay)
+
+async def translate_text_deepseek_async(session, text, api_key, source_lang, target_lang, model, stream=False, log_func=print):
+    """Async counterpart of translate_text_deepseek."""
+    payload = _single_payload(text, source_lang, target_lang, model)
+    return _single_result(text, *await _post_chat_completion_async(session, payload, api_key, stream, log_func=log_func),
+                          log_func=log_func)
+
+async def translate_batch_deepseek_async(session, texts, api_key, source_lang, target_lang, model, stream=False, log_func=print):
+    """Async counterpart of translate_batch_deepseek."""
+    if isinstance(target_lang, tuple):
+        return await translate_multi_deepseek_async(session, texts, api_key, source_lang, target_lang, model, stream, log_func)
+    if len(texts) == 1:
+        return [await translate_text_deepseek_async(session, texts[0], api_key, source_lang, target_lang, model, stream, log_func)]
+
+    payload = _batch_payload(texts, source_lang, target_lang, model)
+    reply = await _post_chat_completion_async(session, payload, api_key, stream, len(texts), log_func)
+    parts = _split_batch_result(*reply, len(texts))
+
+    results = []
+    for n, text in enumerate(texts, start=1):
+        if n in parts:
+            results.append(parts[n])
+            continue
+        try:
+            results.append(await translate_text_deepseek_async(session, text, api_key, source_lang, target_lang, model, stream, log_func))
+        except TranslationCancelled:
+            raise
+        except Exception as e: # Only this cue fails; the rest of the batch is kept
+            results.append(e)
+    _warn_missing_cues(len(texts) - len(parts), len(texts), log_func)
+    return results
+
+async def translate_multi_deepseek_async(session, texts, api_key, source_lang, target_langs, model, stream=False, log_func=print):
+    """Async counterpart of translate_multi_deepseek."""
+    payload = _multi_payload(texts, source_lang, target_langs, model)
+    reply, truncated = await _post_chat_completion_async(session, payload, api_key, stream, log_func=log_func)
+    results = _multi_results(texts, target_langs, split_multi_reply(reply, len(texts), target_langs, truncated))
+    missing = 0
+    for text, translations in zip(texts, results):
+        for language, translation in translations.items():
+            if translation is None:
+                missing += 1
+                try:
+                    translations[language] = await translate_text_deepseek_async(session, text, api_key, source_lang, language,
+                                                                                 model, stream, log_func)
+                except TranslationCancelled:
+                    raise
+                except Exception as e:
+                    translations[language] = e
+    _warn_missing_cues(missing, len(texts) * len(target_langs), log_func)
+    return results
+
+
+# --- Translation Engines ---
+
+class SubmissionWindow:
+    """
+    Decides which batches an engine may submit next.
+    Batches are released in order, and batch k is only released while
+    k < (oldest unfinished batch) + max_ahead, which bounds how many finished
+    results can pile up behind a slow batch. max_ahead=None releases everything.
+    """
+
+    def __init__(self, batch_count, max_ahead=None):
+        self.batch_count = batch_count
+        self.max_ahead = max_ahead
+        self._next = 0
+        self._oldest = 0
+        self._done = [False] * batch_count
+
+    def release(self):
+        """Returns the positions of the batches that may be submitted now."""
+        limit = self.batch_count if self.max_ahead is None else min(self.batch_count, self._oldest + self.max_ahead)
+        released = list(range(self._next, limit))
+        self._next = max(self._next, limit)
+        return released
+
+    def mark_done(self, position):
+        self._done[position] = True
+        while self._oldest < self.batch_count and self._done[self._oldest]:
+            self._oldest += 1
+
+
+class ThreadPoolEngine:
+    """
+    Runs one request per worker thread (the classic engine). Create it after
+    configure_backends: the connection pool is sized for the backends' hosts and for
+    hedged attempts' second legs.
+    """
+
+    name = "threads"
+
+    def __init__(self, concurrency, http2=False, log_func=print, stream=False):
+        self.concurrency = concurrency
+        self.stream = stream
+        self.log_func = log_func
+        pool = backend_pool
+        self.sessions = configure_http_sessions(pool.max_in_flight(concurrency), http2, log_func, pool.hosts)
+        # One executor for every run() call, so files translated at the same time share the workers
+        self._executor = ThreadPoolExecutor(max_workers=concurrency)
+
+    def run(self, batches, api_key, source_lang, target_lang, model, on_result, max_ahead=None):
+        """
+        Translates the batches and calls on_result(batch, translations, error) in the
+        calling thread as each one finishes (translations is None when error is set).
+        max_ahead limits submission as described in SubmissionWindow.
+        Safe to call from several threads at once.
+        Raises:
+            TranslationCancelled: Once cancel_run() is called; batches not yet started are dropped.
+        """
+        cancelled = run_cancelled
+        window = SubmissionWindow(len(batches), max_ahead)
+        futures_map = {}
+        while True:
+            if cancelled.is_set():
+                for future in futures_map:
+                    future.cancel() # Requests already in flight finish in the background and are discarded
+                raise TranslationCancelled()
+            for position in window.release():
+                future = self._executor.submit(translate_batch_deepseek,
+                                               [text for _, text in batches[position]],
+                                               api_key,
+                                               source_lang,
+                                               target_lang,
+                                               model,
+                                               self.stream,
+                                               self.log_func)
+                futures_map[future] = position # Map future to its batch
+            if not futures_map:
+                break
+
+            finished, _ = wait(futures_map, timeout=CANCEL_POLL_INTERVAL, return_when=FIRST_COMPLETED)
+            for future in finished:
+                position = futures_map.pop(future)
+                window.mark_done(position)
+                try:
+                    translated_texts = future.result()
+                except TranslationCancelled:
+                    continue
+                except Exception as e:
+                    on_result(batches[position], None, e)
+                else:
+                    on_result(batches[position], translated_texts, None)
+
+    def summary(self):
+        return self.sessions.summary()
+
+    def close(self):
+        # After a cancel, don't wait for the requests still in flight; queued ones never start,
+        # and workers still waiting for a rate-limit slot give up without sending
+        self._executor.shutdown(wait=not run_cancelled.is_set(), cancel_futures=True)
+
+
+class AsyncioEngine:
+    """
+    Runs all requests on one asyncio event loop in the calling thread.
+    A semaphore bounds the number of requests in flight, so hundreds of concurrent
+    requests cost coroutines rather than OS threads. Requires aiohttp.
+    """
+
+    name = "asyncio"
+
+    def __init__(self, concurrency, http2=False, log_func=print, stream=False):
+        if not aiohttp_available():
+            raise RuntimeError("The asyncio engine requires the 'aiohttp' package (pip install aiohttp).")
+        if http2:
+            log_func("Note: The asyncio engine uses HTTP/1.1 keep-alive connections; the HTTP/2 option is ignored.")
+        self.concurrency = concurrency
+        self.stream = stream
+        self.log_func = log_func
+        self._requests_sent = 0
+        self._connections_opened = 0
+
+    def run(self, batches, api_key, source_lang, target_lang, model, on_result, max_ahead=None):
+        """
+        Same contract as ThreadPoolEngine.run; on_result is called on the event loop thread.
+        Concurrent calls each get their own loop; the shared rate controller keeps the overall budget.
+        A cancelled run cancels its requests in flight too.
+        """
+        import asyncio
+        asyncio.run(self._run(batches, api_key, source_lang, target_lang, model, on_result, max_ahead, run_cancelled))
+
+    async def _on_request_start(self, session, context, params):
+        self._requests_sent += 1
+
+    async def _on_connection_create_end(self, session, context, params):
+        self._connections_opened += 1
+
+    async def _run(self, batches, api_key, source_lang, target_lang, model, on_result, max_ahead, cancelled):
+        import asyncio
+        import aiohttp
+        semaphore = asyncio.Semaphore(self.concurrency)
+        trace_config = aiohttp.TraceConfig()
+        trace_config.on_request_start.append(self._on_request_start)
+        trace_config.on_connection_create_end.append(self._on_connection_create_end)
+        connector = aiohttp.TCPConnector(limit=backend_pool.max_in_flight(self.concurrency)) # Room for hedged second legs
+
+        async with aiohttp.ClientSession(connector=connector, trace_configs=[trace_config]) as session:
+            async def run_batch(position):
+                async with semaphore:
+                    try:
+                        translated_texts = await translate_batch_deepseek_async(
+                            session, [text for _, text in batches[position]], api_key, source_lang, target_lang, model,
+                            self.stream, self.log_func)
+                    except Exception as e:
+                        return position, None, e
+                    return position, translated_texts, None
+
+            window = SubmissionWindow(len(batches), max_ahead)
+            tasks = set()
+            while True:
+                if cancelled.is_set():
+                    for task in tasks:
+                        task.cancel()
+                    await asyncio.gather(*tasks, return_exceptions=True)
+                    raise TranslationCancelled()
+                tasks.update(asyncio.ensure_future(run_batch(position)) for position in window.release())
+                if not tasks:
+                    break
+                finished, tasks = await asyncio.wait(tasks, timeout=CANCEL_POLL_INTERVAL, return_when=asyncio.FIRST_COMPLETED)
+                for task in finished:
+                    position, translated_texts, error = task.result()
+                    window.mark_done(position)
+                    on_result(batches[position], translated_texts, error)
+
+    def summary(self):
+        reused = max(0, self._requests_sent - self._connections_opened)
+        return f"Connections (asyncio): {self._requests_sent} requests over {self._connections_opened} connections ({reused} reused)."
+
+    def close(self):
+        pass # Each run() owns its event loop and client session
+
+TRANSLATION_ENGINES = {engine.name: engine for engine in (ThreadPoolEngine, AsyncioEngine)}
+DEFAULT_ENGINE = ThreadPoolEngine.name
+
+
+# --- Cue Deduplication ---
+
+def normalize_cue_text(text):
+    """Normalizes cue text for lookups: unified line endings, trimmed lines, collapsed spaces."""
+    lines = text.replace('\r\n', '\n').replace('\r', '\n').split('\n')
+    return "\n".join(re.sub(r"[ \t]+", " ", line).strip() for line in lines).strip()
+
+def group_duplicate_cues(subtitles, skip=()):
+    """
+    Groups non-empty cues by their normalized content.
+    Args:
+        subtitles (SubtitleStore): Parsed subtitles.
+        skip (container[int]): Positions that are already done (e.g. resumed from a journal).
+    Returns:
+        dict[str, list[int]]: normalized text -> positions in subtitles, in first-seen order.
+    """
+    groups = {}
+    for i, content in enumerate(subtitles.contents):
+        if content and i not in skip:
+            groups.setdefault(normalize_cue_text(content), []).append(i)
+    return groups
+
+
+# --- Persistent Translation Cache ---
+
+class TranslationCache:
+    """
+    SQLite-backed translation cache shared by all runs.
+    Entries are keyed by normalized source text, language pair, model and prompt version
+    (PROMPT_VERSION plus the run's glossary and style guide).
+    The least recently used entries are evicted once max_entries is exceeded.
+    All methods are safe to call from several threads.
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, max_entries=DEFAULT_CACHE_MAX_ENTRIES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS translations ("
+            " key TEXT PRIMARY KEY, source TEXT NOT NULL, translation TEXT NOT NULL, last_used REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_translations_last_used ON translations(last_used)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+
+    @staticmethod
+    def make_key(text, source_lang, target_lang, model):
+        """Builds the cache key for a source text and translation settings."""
+        raw = "\x1f".join([prompt_layout.version, model, (source_lang or "auto").lower(),
+                           target_lang.lower(), normalize_cue_text(text)])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()
+
+    def get(self, text, source_lang, target_lang, model):
+        """Returns the cached translation or None, and marks the entry as recently used."""
+        key = self.make_key(text, source_lang, target_lang, model)
+        with self._lock:
+            row = self._conn.execute("SELECT translation FROM translations WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self._conn.execute("UPDATE translations SET last_used = ? WHERE key = ?", (time.time(), key))
+            self._conn.commit()
+            return row[0]
+
+    def put(self, text, source_lang, target_lang, model, translation):
+        """Stores a translation, evicting the least recently used entries if over the size cap."""
+        key = self.make_key(text, source_lang, target_lang, model)
+        with self._lock:
+            existed = self._conn.execute("SELECT 1 FROM translations WHERE key = ?", (key,)).fetchone() is not None
+            self._conn.execute(
+                "INSERT OR REPLACE INTO translations (key, source, translation, last_used) VALUES (?, ?, ?, ?)",
+                (key, normalize_cue_text(text), translation, time.time())
+            )
+            if not existed:
+                self._count += 1
+            excess = self._count - self.max_entries
+            if excess > 0:
+                self._conn.execute(
+                    "DELETE FROM translations WHERE key IN "
+                    "(SELECT key FROM translations ORDER BY last_used ASC LIMIT ?)", (excess,)
+                )
+                self._count -= excess
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def summary(self):
+        """One-line hit/miss summary for the log."""
+        lookups = self.hits + self.misses
+        rate = (self.hits / lookups * 100) if lookups else 0.0
+        return f"Cache: {self.hits} hits, {self.misses} misses ({rate:.1f}% hit rate), {len(self)} entries stored."
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Translation Memory ---
+
+MEMORY_TAG_REGEX = re.compile(r"<[^>]*>|\{\\[^}]*\}") # HTML-style and ASS override tags
+MEMORY_DASH_REGEX = re.compile(r"^[-\u2010-\u2015]+\s*", re.MULTILINE) # Speaker dashes
+MEMORY_APOSTROPHE_REGEX = re.compile(r"['\u2019\u02bc]") # Dropped, so "I'm" and "Im" match
+MEMORY_PUNCTUATION_REGEX = re.compile(r"[^\w\s]+")
+
+def normalize_memory_text(text):
+    """
+    Reduces a line to what the translation memory compares: no formatting tags, speaker
+    dashes, punctuation (including ellipses) or case, and single spaces between words.
+    """
+    text = MEMORY_TAG_REGEX.sub("", normalize_cue_text(text))
+    text = MEMORY_APOSTROPHE_REGEX.sub("", MEMORY_DASH_REGEX.sub("", text).casefold())
+    return " ".join(MEMORY_PUNCTUATION_REGEX.sub(" ", text).split())
+
+def _trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)} or {text}
+
+def _jaccard(a, b):
+    return len(a & b) / len(a | b)
+
+def min_shared_bands(threshold, miss_rate=0.01):
+    """
+    Fewest bands a stored line at exactly the threshold similarity shares with the query
+    in all but miss_rate of cases (each band matches with probability similarity ** MEMORY_ROWS).
+    Candidates sharing fewer bands are not compared.
+    """
+    p = threshold ** MEMORY_ROWS
+    below = 0.0
+    for shared in range(MEMORY_BANDS + 1):
+        below += math.comb(MEMORY_BANDS, shared) * p ** shared * (1 - p) ** (MEMORY_BANDS - shared)
+        if below > miss_rate:
+            return max(shared, 1)
+    return MEMORY_BANDS
+
+def minhash_signature(normalized):
+    """
+    MinHash signature of a line's trigrams with one hash per trigram (one-permutation
+    hashing): each trigram's CRC-32 picks a bin (modulo the bin count) and the bin keeps
+    the smallest of the remaining bits. Empty bins borrow the next filled bin's value, offset by the
+    distance, so short lines still get a full signature. CRC-32 keeps signatures the
+    same across processes, unlike hash().
+    """
+    size = MEMORY_BANDS * MEMORY_ROWS
+    bins = [None] * size
+    for trigram in _trigrams(normalized):
+        crc = zlib.crc32(trigram.encode('utf-8'))
+        position, value = crc % size, crc // size
+        if bins[position] is None or value < bins[position]:
+            bins[position] = value
+    signature = []
+    for position in range(size):
+        distance = 0
+        while bins[(position + distance) % size] is None:
+            distance += 1
+        signature.append(bins[(position + distance) % size] + (distance << 32))
+    return signature
+
+class TranslationMemory:
+    """
+    SQLite-backed fuzzy translation memory shared by all runs. Lines are stored under
+    normalize_memory_text(), so lines differing only in case, punctuation, whitespace,
+    ellipses, tags or speaker dashes are the same entry. Other near-duplicates are found
+    with MinHash signatures of character trigrams split into MEMORY_BANDS bands
+    (locality-sensitive hashing): a lookup compares the few stored lines sharing the most
+    bands with it and reuses the most similar one's translation if its trigram Jaccard similarity reaches
+    the threshold and it has the same numbers. Entries are scoped to the language pair,
+    model and prompt version, like the cache, and the least recently used are evicted
+    past max_entries. All methods are safe to call from several threads.
+    """
+
+    def __init__(self, path=DEFAULT_MEMORY_PATH, threshold=DEFAULT_MEMORY_THRESHOLD, max_entries=DEFAULT_MEMORY_MAX_ENTRIES):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.threshold = threshold
+        self.max_entries = max_entries
+        self.min_shared = min_shared_bands(threshold)
+        self.exact_hits = 0
+        self.fuzzy_hits = 0
+        self.misses = 0
+        self.lookup_seconds = 0.0
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, timeout=30, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS segments ("
+            " id INTEGER PRIMARY KEY, scope TEXT NOT NULL, normalized TEXT NOT NULL, translation TEXT NOT NULL,"
+            " last_used REAL NOT NULL, UNIQUE (scope, normalized))"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_segments_last_used ON segments(last_used)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS bands (band INTEGER NOT NULL, segment INTEGER NOT NULL,"
+            " PRIMARY KEY (band, segment)) WITHOUT ROWID"
+        )
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM segments").fetchone()[0]
+
+    @staticmethod
+    def make_scope(source_lang, target_lang, model):
+        """Identifies the translation settings an entry is valid for."""
+        raw = "\x1f".join([prompt_layout.version, model, (source_lang or "auto").lower(), target_lang.lower()])
+        return hashlib.sha256(raw.encode('utf-8')).hexdigest()[:16]
+
+    @staticmethod
+    def band_keys(scope, normalized):
+        """The line's MinHash signature, hashed band by band into 64-bit index keys."""
+        signature = minhash_signature(normalized)
+        keys = []
+        for band in range(MEMORY_BANDS):
+            rows = signature[band * MEMORY_ROWS:(band + 1) * MEMORY_ROWS]
+            digest = hashlib.blake2b(f"{scope}\x1f{band}\x1f{rows}".encode('ascii'), digest_size=8).digest()
+            keys.append(int.from_bytes(digest, 'big', signed=True))
+        return keys
+
+    def get(self, text, source_lang, target_lang, model):
+        """
+        Looks up a line.
+        Returns:
+            tuple(str, float) | None: The stored translation and its similarity (1.0 for a
+            normalized exact match), or None if nothing reaches the threshold.
+        """
+        started = time.perf_counter()
+        normalized = normalize_memory_text(text)
+        scope = self.make_scope(source_lang, target_lang, model)
+        match = None
+        with self._lock:
+            row = self._conn.execute("SELECT id, translation FROM segments WHERE scope = ? AND normalized = ?",
+                                     (scope, normalized)).fetchone()
+            if row is not None:
+                match = (row[0], row[1], 1.0)
+            elif self.threshold < 1.0 and normalized:
+                keys = self.band_keys(scope, normalized)
+                scans = " UNION ALL ".join([f"SELECT segment FROM (SELECT segment FROM bands WHERE band = ? LIMIT {MEMORY_BAND_SCAN})"] * len(keys))
+                candidates = self._conn.execute(
+                    f"SELECT s.id, s.normalized, s.translation FROM segments s JOIN "
+                    f"(SELECT segment, COUNT(*) AS shared FROM ({scans}) "
+                    f"GROUP BY segment HAVING shared >= ? ORDER BY shared DESC LIMIT {MEMORY_MAX_CANDIDATES}) c ON s.id = c.segment",
+                    keys + [self.min_shared]).fetchall()
+                trigrams = _trigrams(normalized)
+                numbers = re.findall(r"\d+", normalized)
+                for segment_id, candidate, translation in candidates:
+                    similarity = _jaccard(trigrams, _trigrams(candidate))
+                    if similarity >= self.threshold and (match is None or similarity > match[2]) \
+                            and re.findall(r"\d+", candidate) == numbers:
+                        match = (segment_id, translation, similarity)
+            if match is None:
+                self.misses += 1
+            else:
+                if match[2] == 1.0:
+                    self.exact_hits += 1
+                else:
+                    self.fuzzy_hits += 1
+                self._conn.execute("UPDATE segments SET last_used = ? WHERE id = ?", (time.time(), match[0]))
+                self._conn.commit()
+            self.lookup_seconds += time.perf_counter() - started
+        return None if match is None else (match[1], match[2])
+
+    def put(self, text, source_lang, target_lang, model, translation):
+        """Stores a translation (replacing the one for the same normalized line)."""
+        self.put_many([(text, translation)], source_lang, target_lang, model)
+
+    def put_many(self, entries, source_lang, target_lang, model):
+        """
+        Stores (source text, translation) pairs in one transaction, evicting the least
+        recently used entries if over the size cap.
+        """
+        scope = self.make_scope(source_lang, target_lang, model)
+        rows = []
+        for text, translation in entries:
+            normalized = normalize_memory_text(text)
+            if normalized:
+                rows.append((normalized, translation, self.band_keys(scope, normalized)))
+        now = time.time()
+        with self._lock:
+            for normalized, translation, keys in rows:
+                existing = self._conn.execute("SELECT id FROM segments WHERE scope = ? AND normalized = ?",
+                                              (scope, normalized)).fetchone()
+                if existing is not None:
+                    self._conn.execute("UPDATE segments SET translation = ?, last_used = ? WHERE id = ?",
+                                       (translation, now, existing[0]))
+                    continue
+                segment_id = self._conn.execute(
+                    "INSERT INTO segments (scope, normalized, translation, last_used) VALUES (?, ?, ?, ?)",
+                    (scope, normalized, translation, now)).lastrowid
+                self._conn.executemany("INSERT OR IGNORE INTO bands (band, segment) VALUES (?, ?)",
+                                       [(key, segment_id) for key in keys])
+                self._count += 1
+            excess = self._count - self.max_entries
+            if excess > 0:
+                evicted = self._conn.execute(
+                    "SELECT id, scope, normalized FROM segments ORDER BY last_used ASC LIMIT ?", (excess,)).fetchall()
+                for segment_id, segment_scope, normalized in evicted:
+                    self._conn.execute("DELETE FROM segments WHERE id = ?", (segment_id,))
+                    self._conn.executemany("DELETE FROM bands WHERE band = ? AND segment = ?",
+                                           [(key, segment_id) for key in self.band_keys(segment_scope, normalized)])
+                self._count -= len(evicted)
+            self._conn.commit()
+
+    def __len__(self):
+        with self._lock:
+            return self._count
+
+    def stats(self):
+        """Lookup counters for the log and the metrics report."""
+        lookups = self.exact_hits + self.fuzzy_hits + self.misses
+        return {"exact_hits": self.exact_hits, "fuzzy_hits": self.fuzzy_hits, "misses": self.misses,
+                "hit_rate": (self.exact_hits + self.fuzzy_hits) / lookups if lookups else None,
+                "mean_lookup_ms": self.lookup_seconds / lookups * 1000 if lookups else None,
+                "entries": len(self), "threshold": self.threshold}
+
+    def summary(self):
+        """One-line hit/miss summary for the log."""
+        stats = self.stats()
+        rate = (stats["hit_rate"] or 0.0) * 100
+        return (f"Translation memory: {stats['exact_hits']} normalized and {stats['fuzzy_hits']} fuzzy hits, "
+                f"{stats['misses']} misses ({rate:.1f}% hit rate, {stats['mean_lookup_ms'] or 0.0:.2f} ms per lookup), "
+                f"{stats['entries']} entries stored.")
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+# --- Translation Pipeline ---
+
+class FileTranslationResult:
+    """Outcome of translate_srt_file for one input file (and, with several targets, one language)."""
+
+    def __init__(self, input_file, output_file, target_lang=None):
+        self.input_file = input_file
+        self.output_file = output_file
+        self.target_lang = target_lang
+        self.total = 0 # Parsed cues
+        self.errors = 0 # Cues marked [TRANSLATION_ERROR] or left in the source language
+        self.unsent = 0 # ...of which the run deadline left no time to translate
+        self.untranslated = 0 # ...of which kept their source text after an empty or cut-off reply
+        self.resumed = 0 # Cues taken from the checkpoint journal
+        self.reused = 0 # Cues with unchanged text taken from the previous run's manifest (incremental mode)
+        self.cached = 0 # Cues answered by the translation cache
+        self.remembered = 0 # Cues answered by the translation memory (normalized or fuzzy matches)
+        self.requests = 0 # Batches sent to the engine (a batch for several languages counts for the first)
+        self.duration = 0.0 # Seconds
+
+class LanguageRun:
+    """
+    One target language of translate_srt_targets: its translated column, ordered
+    writer, journal, manifest (in incremental mode), duplicate groups still to
+    translate, and result.
+    """
+
+    def __init__(self, subtitles, input_file, output_file, target_lang, log_func=print, incremental=False):
+        self.subtitles = subtitles
+        self.target_lang = target_lang
+        self.log_func = log_func
+        self.incremental = incremental
+        self.result = FileTranslationResult(input_file, output_file, target_lang)
+        self.result.total = len(subtitles)
+        self.writer = None
+        self.journal = None
+        self.manifest = None
+        self.failed = set() # Positions marked [TRANSLATION_ERROR] or left in the source language, left out of the manifest
+        self.groups = {}
+        self.pending = {} # Group key -> source text, for groups not answered by the journal or the cache
+        self.processed = 0
+
+    def start(self, source_lang, model):
+        """
+        Opens the writer, resumes from the journal, reuses unchanged cues from the manifest
+        (in incremental mode) and fills in empty cues.
+        Returns:
+            set[int]: Positions already translated by the journal or the manifest.
+        """
+        subtitles = self.subtitles
+        self.writer = OrderedSrtWriter(self.result.output_file, subtitles, self.log_func, DEFAULT_MAX_REORDER_CUES)
+        self.log_func(f"Writing finished cues in order to: {self.writer.partial_path}")
+
+        # Resume cues finished by an interrupted run with the same input and settings
+        self.journal = TranslationJournal(self.result.output_file, subtitles, source_lang, self.target_lang, model, self.log_func)
+        resumed = self.journal.resume(subtitles)
+        for index, content in resumed.items():
+            self.store_result(index, content, checkpoint=False)
+        self.processed += len(resumed)
+        self.result.resumed = len(resumed)
+        if resumed:
+            self.log_func(f"Resumed {len(resumed)} of {len(subtitles)} cues from journal: {self.journal.path}")
+        done = set(resumed)
+
+        # Carry translations of unchanged texts over from the previous run, under the new numbers and timings
+        if self.incremental:
+            self.manifest = TranslationManifest(self.result.output_file, source_lang, self.target_lang, model, self.log_func)
+            previous = self.manifest.load()
+            changed = 0
+            for i, content in enumerate(subtitles.contents):
+                if not content or i in done:
+                    continue
+                translation = previous.get(TranslationManifest.cue_hash(content))
+                if translation is None:
+                    changed += 1
+                    continue
+                self.store_result(i, translation, checkpoint=False)
+                done.add(i)
+                self.result.reused += 1
+            self.processed += self.result.reused
+            if previous:
+                self.log_func(f"Incremental: {self.result.reused} cues reused from the previous run, "
+                              f"{changed} new or changed cues to re-translate.")
+
+        for i, content in enumerate(subtitles.contents):
+            if not content and i not in done: # Check if content is empty string
+                self.log_func(f"Skipping empty subtitle #{subtitles.indices[i]}")
+                self.store_result(i, "", checkpoint=False) # Keep it empty
+                self.processed += 1
+        return done
+
+    def store_result(self, index, content, checkpoint=True):
+        """Fills in a cue's translation, hands it to the ordered writer and records it in the journal."""
+        self.subtitles.translated[index] = content
+        self.writer.add(index)
+        if checkpoint:
+            self.journal.record(index, self.subtitles.contents[index], content)
+
+    def look_up_cache(self, cache, source_lang, model, memory=None):
+        """Answers groups from the translation cache, then the translation memory; the rest become pending."""
+        cache_hits = 0
+        memory_hits = 0
+        fuzzy_hits = 0
+        for key, indices in self.groups.items():
+            text = self.subtitles.contents[indices[0]]
+            cached_text = cache.get(text, source_lang, self.target_lang, model) if cache is not None else None
+            if cached_text is not None:
+                for index in indices:
+                    self.store_result(index, cached_text)
+                self.processed += len(indices)
+                self.result.cached += len(indices)
+                cache_hits += 1
+                continue
+            match = memory.get(text, source_lang, self.target_lang, model) if memory is not None else None
+            if match is not None:
+                for index in indices:
+                    self.store_result(index, match[0])
+                self.processed += len(indices)
+                self.result.remembered += len(indices)
+                memory_hits += 1
+                fuzzy_hits += match[1] < 1.0
+                continue
+            self.pending[key] = text
+        if cache is not None:
+            self.log_func(f"{cache_hits} of {len(self.groups)} unique texts found in the translation cache.")
+        if memory is not None:
+            self.log_func(f"{memory_hits} of {len(self.groups) - cache_hits} remaining unique texts found in the translation memory "
+                          f"({fuzzy_hits} near-duplicates at {memory.threshold:.0%} similarity or more).")
+
+    def finish_group(self, key, text, content, error, cache, source_lang, model, memory=None):
+        """
+        Fans one finished text out to every duplicate cue. A SourceFallback is written out
+        but, like an error, left out of the journal, cache and memory for the next run to retry.
+        """
+        indices = self.groups[key]
+        if isinstance(content, SourceFallback):
+            self.result.untranslated += len(indices)
+            self.result.errors += len(indices)
+            self.failed.update(indices)
+        elif error is None:
+            if cache is not None:
+                cache.put(text, source_lang, self.target_lang, model, content)
+            if memory is not None:
+                memory.put(text, source_lang, self.target_lang, model, content)
+        else:
+            if isinstance(error, RunDeadlineExceeded):
+                self.result.unsent += len(indices) # Counted rather than logged, as there may be thousands
+            else:
+                self.log_func(f"Error translating subtitle #{self.subtitles.indices[indices[0]]}"
+                              f"{f' (and {len(indices) - 1} duplicates)' if len(indices) > 1 else ''}: {error}")
+            self.result.errors += len(indices)
+            self.failed.update(indices)
+        for index in indices:
+            if error is None:
+                self.store_result(index, content, checkpoint=not isinstance(content, SourceFallback))
+            else:
+                self.store_result(index, f"[TRANSLATION_ERROR] {self.subtitles.contents[index]}", checkpoint=False) # Mark error
+        self.processed += len(indices)
+
+    def finish(self):
+        """Checks the output, moves it into place and removes the journal if nothing failed."""
+        total_subs = len(self.subtitles)
+        writer = self.writer
+        if writer.written == 0 and total_subs > 0:
+             raise RuntimeError("Translation failed: No subtitles were successfully processed.")
+        if writer.written != total_subs:
+             self.log_func(f"Warning: Processed count ({writer.written}) doesn't match initial count ({total_subs}). Check logs.")
+
+        if self.result.errors > 0:
+            self.log_func(f"Warning: {self.result.errors} subtitles encountered translation errors.")
+        if self.result.unsent > 0:
+            self.log_func(f"Warning: {self.result.unsent} subtitles were not translated before the run deadline; "
+                          f"they are marked [TRANSLATION_ERROR] and the next run with the same settings translates them.")
+        if self.result.untranslated > 0:
+            self.log_func(f"Warning: {self.result.untranslated} subtitles kept their source text after an empty or cut-off reply; "
+                          f"the next run with the same settings translates them again.")
+        self.log_func(f"Reorder buffer peak: {writer.peak_buffered} cues"
+                      f"{f' ({writer.overflowed} more waited in the store)' if writer.overflowed else ''}.")
+
+        # Move the streamed SRT file into place
+        self.log_func("Finalizing translated SRT file...")
+        writer.close()
+        self.writer = None
+        if self.manifest:
+            self.manifest.save(self.subtitles, self.failed)
+        if self.result.errors == 0:
+            self.journal.discard()
+            self.journal = None
+
+    def close(self):
+        """Keeps what an unfinished run wrote, for the next run to resume."""
+        if self.writer:
+            self.writer.abort()
+        if self.journal:
+            self.journal.close()
+            self.log_func(f"Progress saved; run again with the same settings to translate only the remaining cues ({self.journal.path}).")
+
+def parse_target_langs(value):
+    """Splits a comma-separated list of target languages, dropping blanks and repeats."""
+    return list(dict.fromkeys(language.strip() for language in value.split(",") if language.strip()))
+
+def time_to_ms(text):
+    """'[[H:]MM:]SS[.mmm]' (a comma also works before the milliseconds) to milliseconds."""
+    parts = text.strip().replace(',', '.').split(':')
+    if not 1 <= len(parts) <= 3:
+        raise ValueError(f"Invalid time: '{text}'")
+    try:
+        seconds = float(parts[-1]) + sum(int(part) * 60 ** power for power, part in enumerate(reversed(parts[:-1]), start=1))
+    except ValueError:
+        raise ValueError(f"Invalid time: '{text}'")
+    return int(round(seconds * 1000))
+
+def parse_time_range(value):
+    """
+    Parses a playback range such as '40:00-45:00' or '0:40:00,000-0:45:00,000'.
+    Returns:
+        tuple[int, int]: Start and end in milliseconds.
+    Raises:
+        ValueError: If the range can't be parsed or ends before it starts.
+    """
+    start, separator, end = value.partition('-')
+    if not separator:
+        raise ValueError(f"Invalid time range '{value}': expected START-END, e.g. 40:00-45:00")
+    start_ms, end_ms = time_to_ms(start), time_to_ms(end)
+    if end_ms <= start_ms:
+        raise ValueError(f"Invalid time range '{value}': the end must be after the start")
+    return start_ms, end_ms
+
+def _language_log(log_func, target_lang):
+    return lambda message: log_func(f"[{target_lang}] {message}")
+
+def translate_srt_file(input_file, output_file, api_key, source_lang, target_lang, engine,
+                       batch_size=DEFAULT_BATCH_SIZE, cache=None, log_func=print, progress_func=None,
+                       model=DEFAULT_MODEL, incremental=False, memory=None, priority_range=None):
+    """
+    Translates one SRT file: parse, resume from the journal, deduplicate, look up the
+    cache, translate the rest in batches on the engine and stream the result to disk.
+    With incremental=True, cues whose text is unchanged since the previous run (per its
+    manifest) keep their old translation and only new or edited cues are translated.
+    Several files may be translated at once from different threads with the same
+    engine, cache and rate controller, which then act as one shared budget.
+    Args:
+        engine: A ThreadPoolEngine or AsyncioEngine.
+        cache (TranslationCache): Optional persistent cache.
+        memory (TranslationMemory): Optional fuzzy translation memory, consulted after the cache.
+        priority_range (tuple[int, int]): Playback range (ms) whose cues are sent first; the
+            rest follow in timeline order, as everything does without it.
+        log_func (callable): Receives log lines.
+        progress_func (callable): Receives (completed percentage, processed cues, total cues), if given.
+    Returns:
+        FileTranslationResult
+    Raises:
+        FileNotFoundError: If the input file doesn't exist.
+        ValueError: For parsing/writing errors.
+        RuntimeError: If no subtitle could be processed.
+        TranslationCancelled: If cancel_run() was called; finished cues are kept for the next run.
+    """
+    return translate_srt_targets(input_file, {target_lang: output_file}, api_key, source_lang, engine,
+                                 batch_size, cache, log_func, progress_func, model, incremental=incremental,
+                                 memory=memory, priority_range=priority_range)[target_lang]
+
+def translate_srt_targets(input_file, output_files, api_key, source_lang, engine, batch_size=DEFAULT_BATCH_SIZE,
+                          cache=None, log_func=print, progress_func=None, model=DEFAULT_MODEL, combined=False,
+                          incremental=False, memory=None, priority_range=None):
+    """
+    Translates one SRT file into one or more languages. The file is parsed and
+    deduplicated once, and every language's batches run on the same engine at the
+    same time, so the whole language set shares one concurrency budget. Each language
+    keeps its own journal, cache entries and output file.
+    Args:
+        output_files (dict[str, str]): Target language -> output path.
+        combined (bool): Ask for every language still missing a text in one completion,
+            instead of one completion per language.
+        incremental (bool): Reuse translations of unchanged cues from each output's
+            manifest and write a new manifest when a language finishes.
+        priority_range (tuple[int, int]): See translate_srt_file.
+        progress_func (callable): Receives (completed percentage, processed cues, total cues)
+            summed over all languages.
+    Returns:
+        dict[str, FileTranslationResult]: Per target language, in the order given.
+    Raises:
+        As translate_srt_file; a failure or cancel in any language stops the whole run
+        (finished cues stay in the journals for the next run).
+    """
+    start_time = time.time()
+    targets = list(output_files)
+    multi = len(targets) > 1
+    runs = {}
+    try:
+        # 1. Parse SRT using Native Parser
+        log_func("Parsing input SRT file...")
+        subtitles = NativeSrtParser.parse_store(input_file, log_func)
+        for target in targets:
+            runs[target] = LanguageRun(subtitles.translation_view() if multi else subtitles, input_file,
+                                       output_files[target], target, _language_log(log_func, target) if multi else log_func,
+                                       incremental)
+        total_subs = len(subtitles)
+        if total_subs == 0:
+             log_func("Input file parsed successfully, but contains no subtitle entries.")
+             return {target: run.result for target, run in runs.items()}
+
+        log_func(f"Parsed {total_subs} subtitle entries.")
+        if multi:
+            log_func(f"Translating into {len(targets)} languages: {', '.join(targets)}"
+                     f"{' (all languages in each request)' if combined else ''}.")
+
+        def report_progress():
+            if progress_func:
+                processed = sum(run.processed for run in runs.values())
+                progress_func((processed / (total_subs * len(runs))) * 100, processed, total_subs * len(runs))
+
+        done = {target: run.start(source_lang, model) for target, run in runs.items()}
+
+        # 2. Deduplicate identical cues so each unique text is translated once (per language)
+        all_groups = None
+        for target, run in runs.items():
+            if done[target] or all_groups is None:
+                groups = group_duplicate_cues(subtitles, skip=done[target])
+                if not done[target]:
+                    all_groups = groups # Shared by every language with nothing resumed or reused
+            else:
+                groups = all_groups
+            run.groups = groups
+            non_empty = total_subs - run.processed
+            if non_empty:
+                saved = non_empty - len(groups)
+                saved_tokens = sum(estimate_tokens(subtitles.contents[indices[0]]) * (len(indices) - 1)
+                                   for indices in groups.values())
+                run.log_func(f"Deduplication: {non_empty} cues -> {len(groups)} unique texts "
+                             f"({saved / non_empty * 100:.1f}% fewer translations, ~{saved_tokens} source tokens saved).")
+
+        # 3. Look up the translation cache and memory before submitting anything
+        for run in runs.values():
+            run.look_up_cache(cache, source_lang, model, memory)
+        report_progress()
+
+        # 4. Translate several cues per request on the engine: one job per language, or with
+        # combined requests one job per set of languages that still need the same texts
+        jobs = {}
+        if combined and multi:
+            for key in dict.fromkeys(key for run in runs.values() for key in run.pending):
+                languages = tuple(target for target, run in runs.items() if key in run.pending)
+                jobs.setdefault(languages if len(languages) > 1 else languages[0], []).append(key)
+        else:
+            for target, run in runs.items():
+                jobs[target] = list(run.pending)
+        lock = threading.Lock() # Languages finish batches in their own threads
+
+        def run_job(job, keys):
+            languages = job if isinstance(job, tuple) else (job,)
+            first = runs[languages[0]]
+            # Groups come in timeline order (of their first cue); a priority range goes first
+            priority_keys = set()
+            if priority_range:
+                range_start, range_end = priority_range
+                priority_keys = {key for key in keys
+                                 if any(subtitles.starts[i] < range_end and subtitles.ends[i] > range_start
+                                        for i in first.groups[key])}
+                keys = sorted(keys, key=lambda key: key not in priority_keys)
+                first.log_func(f"Translating {len(priority_keys)} unique texts between {ms_to_timestamp(range_start)} "
+                               f"and {ms_to_timestamp(range_end)} first.")
+            items = [(key, first.pending[key]) for key in keys]
+            # A reply holds every language, so keep batches' total output within budget
+            batches = make_batches(items, max_cues=batch_size, max_tokens=DEFAULT_BATCH_TOKEN_BUDGET // len(languages))
+            first.result.requests += len(batches)
+            if batches:
+                first.log_func(prompt_layout.summary(source_lang, job))
+            first.log_func(f"Translating {len(items)} unique texts{' into ' + ', '.join(languages) if len(languages) > 1 else ''} "
+                           f"in {len(batches)} requests using the {engine.name} engine with up to {engine.concurrency} concurrent requests...")
+
+            def on_batch_done(batch, translated_texts, batch_error):
+                """Fans each finished batch out to every language and duplicate cue (runs in the job's thread)."""
+                with lock:
+                    if priority_keys:
+                        priority_keys.difference_update(key for key, _ in batch)
+                        if not priority_keys:
+                            first.log_func(f"Priority range done after {time.time() - start_time:.1f}s; "
+                                           f"continuing in timeline order.")
+                    for pos, (key, text) in enumerate(batch):
+                        for language in languages:
+                            content = None
+                            error = batch_error
+                            if batch_error is None:
+                                content = translated_texts[pos] if len(languages) == 1 else translated_texts[pos][language]
+                                if isinstance(content, Exception): # This cue's own request failed
+                                    content, error = None, content
+                            runs[language].finish_group(key, text, content, error, cache, source_lang, model, memory)
+                    report_progress()
+
+            # Submit at most this many batches past the oldest unfinished one, bounding the reorder buffer
+            max_ahead = max(2 * engine.concurrency, DEFAULT_MAX_REORDER_CUES // batch_size)
+            engine.run(batches, api_key, source_lang, job, model, on_batch_done, max_ahead)
+
+        if len(jobs) == 1:
+            run_job(*next(iter(jobs.items())))
+        elif jobs:
+            with ThreadPoolExecutor(max_workers=len(jobs)) as job_pool:
+                for future in [job_pool.submit(run_job, job, keys) for job, keys in jobs.items()]:
+                    future.result()
+
+        # 5. Move the streamed SRT files into place
+        for run in runs.values():
+            run.finish()
+        return {target: run.result for target, run in runs.items()}
+    finally:
+        for run in runs.values():
+            run.result.duration = time.time() - start_time
+            run.close()
+
+
+# --- Command-Line Batch Mode ---
+
+def expand_input_paths(inputs, target_lang):
+    """
+    Expands files, glob patterns and directories (searched recursively) into SRT file paths.
+    Previous outputs for target_lang (a language or a list of them) and partial files are
+    skipped when expanding patterns and directories, so re-running over a folder doesn't
+    translate its own results.
+    """
+    target_langs = [target_lang] if isinstance(target_lang, str) else target_lang
+    output_suffixes = tuple(f"_{language}.srt".lower() for language in target_langs) + (".partial.srt",)
+
+    def is_source(path):
+        name = path.lower()
+        return name.endswith(".srt") and not name.endswith(output_suffixes)
+
+    paths = []
+    for item in inputs:
+        if os.path.isdir(item):
+            for directory, _, filenames in os.walk(item):
+                paths.extend(os.path.join(directory, name) for name in sorted(filenames) if is_source(name))
+        elif os.path.isfile(item):
+            paths.append(item) # Explicitly named files are always taken
+        else:
+            paths.extend(path for path in sorted(glob.glob(item, recursive=True)) if os.path.isfile(path) and is_source(path))
+
+    seen = set()
+    unique_paths = []
+    for path in paths:
+        key = os.path.abspath(path)
+        if key not in seen:
+            seen.add(key)
+            unique_paths.append(path)
+    return unique_paths
+
+def output_path_for(input_file, target_lang, output_dir=None):
+    """Same naming as the GUI suggestion: <name>_<target_lang>.srt, optionally in output_dir."""
+    base, ext = os.path.splitext(input_file)
+    if output_dir:
+        base = os.path.join(output_dir, os.path.basename(base))
+    return f"{base}_{target_lang}{ext}"
+
+def run_cli(argv):
+    """
+    Headless batch translation. Several files are translated at once, all sharing one
+    engine (worker pool), one rate controller and one cache.
+    Returns:
+        int: Process exit code (0 if every file was translated without errors).
+    """
+    parser = argparse.ArgumentParser(
+        prog="code.py",
+        description="Translate SRT files with the DeepSeek API without the GUI. "
+                    "Run without arguments to open the GUI instead.")
+    parser.add_argument("inputs", nargs="+", help="SRT files, glob patterns or directories (searched recursively)")
+    parser.add_argument("-t", "--target-lang", default=DEFAULT_TARGET_LANG,
+                        help="Target language, or several separated by commas (one output file each)")
+    parser.add_argument("-s", "--source-lang", default=DEFAULT_SOURCE_LANG)
+    parser.add_argument("--api-key", default=os.environ.get("DEEPSEEK_API_KEY"),
+                        help="DeepSeek API key (default: $DEEPSEEK_API_KEY)")
+    parser.add_argument("-o", "--output-dir", help="Write translations here instead of next to each input")
+    parser.add_argument("-j", "--max-concurrency", type=int, default=DEFAULT_MAX_THREADS,
+                        help="Requests in flight across all files")
+    parser.add_argument("--parallel-files", type=int, default=4, help="Files translated at the same time")
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE, help="Cues per request")
+    parser.add_argument("--engine", choices=list(TRANSLATION_ENGINES), default=DEFAULT_ENGINE)
+    parser.add_argument("--rpm", type=int, default=DEFAULT_REQUESTS_PER_MINUTE, help="Requests per minute (0 = unlimited)")
+    parser.add_argument("--tpm", type=int, default=DEFAULT_TOKENS_PER_MINUTE, help="Tokens per minute (0 = unlimited)")
+    parser.add_argument("--http2", action="store_true", help="Use HTTP/2 (requires httpx[http2])")
+    parser.add_argument("--stream", action="store_true", help="Stream replies and hang up on runaway output")
+    parser.add_argument("--combined", action="store_true",
+                        help="With several target languages, ask for all of them in one request per batch")
+    parser.add_argument("--incremental", action="store_true",
+                        help="Reuse translations of cues unchanged since the last --incremental run (<output>.manifest.json) "
+                             "and translate only new or edited cues")
+    parser.add_argument("--priority-range", metavar="START-END",
+                        help="Translate the cues in this playback range first, e.g. 40:00-45:00 (the rest follow in timeline order)")
+    parser.add_argument("--deadline", metavar="[H:]MM:SS",
+                        help="Stop sending requests after this long; cues not translated by then are marked as errors "
+                             "and the next run translates them")
+    parser.add_argument("--api-url", help="Chat-completions endpoint (default: $DEEPSEEK_API_URL or the DeepSeek API)")
+    parser.add_argument("--no-cache", action="store_true", help="Don't read or write the translation cache")
+    parser.add_argument("--memory", action="store_true",
+                        help="Reuse translations of near-identical lines (case, punctuation, dashes) from the translation memory")
+    parser.add_argument("--memory-threshold", type=float, default=DEFAULT_MEMORY_THRESHOLD,
+                        help="Minimum similarity (0-1) for reusing a near-identical line's translation")
+    parser.add_argument("--glossary", metavar="PATH", help="'term = translation' lines added to the shared prompt prefix")
+    parser.add_argument("--style-guide", metavar="PATH", help="Text file of style instructions added to the shared prompt prefix")
+    parser.add_argument("--backends", metavar="PATH", help="JSON file of OpenAI-compatible endpoints with weights and limits (see README)")
+    parser.add_argument("--hedge", action="store_true", default=None,
+                        help="Duplicate requests slower than the recent p95 on another backend (overrides the backends file)")
+    parser.add_argument("--metrics-report", metavar="PATH", help="Write request metrics and per-file results as JSON")
+    parser.add_argument("--prometheus", metavar="PATH", help="Write request metrics in Prometheus text format")
+    parser.add_argument("-q", "--quiet", action="store_true", help="Only print warnings, errors and the summary")
+    args = parser.parse_args(argv)
+
+    if not args.api_key and not args.backends:
+        parser.error("no API key given (use --api-key or set DEEPSEEK_API_KEY)")
+    if args.api_url:
+        global DEEPSEEK_API_URL
+        DEEPSEEK_API_URL = args.api_url
+    if args.max_concurrency <= 0 or args.parallel_files <= 0 or args.batch_size <= 0:
+        parser.error("--max-concurrency, --parallel-files and --batch-size must be greater than 0")
+    target_langs = parse_target_langs(args.target_lang)
+    if not target_langs:
+        parser.error("no target language given")
+    input_files = expand_input_paths(args.inputs, target_langs)
+    if not input_files:
+        parser.error("no SRT files found")
+    if not 0 < args.memory_threshold <= 1:
+        parser.error("--memory-threshold must be greater than 0 and at most 1")
+    try:
+        priority_range = parse_time_range(args.priority_range) if args.priority_range else None
+        run_deadline = time_to_ms(args.deadline) / 1000 if args.deadline else None
+    except ValueError as e:
+        parser.error(str(e))
+    if run_deadline is not None and run_deadline <= 0:
+        parser.error("--deadline must be greater than 0")
+    if args.output_dir:
+        os.makedirs(args.output_dir, exist_ok=True)
+    try:
+        glossary = load_glossary(args.glossary) if args.glossary else None
+        if args.style_guide:
+            with open(args.style_guide, 'r', encoding='utf-8-sig') as f:
+                style_guide = f.read()
+        else:
+            style_guide = None
+    except (OSError, ValueError) as e:
+        parser.error(f"could not read the glossary or style guide: {e}")
+
+    print_lock = threading.Lock()
+
+    def make_log_func(label):
+        def log_func(message):
+            if args.quiet and not message.startswith(("Warning", "Error")):
+                return
+            with print_lock:
+                print(f"[{label}] {message}", flush=True)
+        return log_func
+
+    main_log = make_log_func("main")
+    try:
+        backends = configure_backends(args.backends, args.hedge, args.max_concurrency, main_log)
+    except (OSError, ValueError) as e:
+        parser.error(f"could not read the backends file: {e}")
+    if not args.api_key and any(backend.api_key is None for backend in backends.backends):
+        parser.error("no API key given for every backend (use --api-key, set DEEPSEEK_API_KEY or give each backend a key)")
+    cache = None
+    if not args.no_cache:
+        try:
+            cache = TranslationCache()
+        except (sqlite3.Error, OSError) as e:
+            main_log(f"Warning: Translation cache unavailable, continuing without it: {e}")
+    memory = None
+    if args.memory:
+        try:
+            memory = TranslationMemory(threshold=args.memory_threshold)
+        except (sqlite3.Error, OSError) as e:
+            main_log(f"Warning: Translation memory unavailable, continuing without it: {e}")
+    engine = TRANSLATION_ENGINES[args.engine](args.max_concurrency, args.http2, main_log, args.stream)
+    controller = configure_rate_controller(args.max_concurrency, args.rpm, args.tpm, main_log)
+    metrics = configure_request_metrics()
+    layout = configure_prompt_layout(glossary, style_guide)
+    if backends.configured:
+        main_log(f"Backends: {backends.describe()}.")
+    main_log(f"Translating {len(input_files)} files to {', '.join(target_langs)} with the {engine.name} engine, "
+             f"{args.max_concurrency} concurrent requests shared by up to {args.parallel_files} files at a time.")
+
+    def translate_one(input_file):
+        output_files = {language: output_path_for(input_file, language, args.output_dir) for language in target_langs}
+        log_func = make_log_func(os.path.basename(input_file))
+        try:
+            return list(translate_srt_targets(input_file, output_files, args.api_key, args.source_lang, engine,
+                                              args.batch_size, cache, log_func, combined=args.combined,
+                                              incremental=args.incremental, memory=memory,
+                                              priority_range=priority_range).values())
+        except Exception as e:
+            log_func(f"Error: {e}")
+            return e
+
+    configure_cancellation()
+    policy = configure_retry_policy(run_deadline, main_log)
+    start_time = time.time()
+    try:
+        with ThreadPoolExecutor(max_workers=args.parallel_files) as file_pool:
+            futures = [file_pool.submit(translate_one, input_file) for input_file in input_files]
+            try:
+                wait(futures)
+            except KeyboardInterrupt:
+                main_log("Warning: Cancelling; finished cues are kept and the next run continues from them "
+                         "(press Ctrl+C again to quit at once).")
+                cancel_run()
+                for future in futures:
+                    future.cancel() # Files not started yet
+            outcomes = [TranslationCancelled() if future.cancelled() else future.result() for future in futures]
+    finally:
+        engine.close()
+        backends.close()
+    wall_time = time.time() - start_time
+
+    # Summary
+    print("-" * 20)
+    print(f"{'File':<40}{'Cues':>8}{'Reused':>8}{'Errors':>8}{'Requests':>10}{'Seconds':>10}{'Cues/s':>9}")
+    total_cues = 0
+    total_requests = 0
+    failed_files = 0
+    cue_errors = 0
+    for input_file, outcome in zip(input_files, outcomes):
+        name = os.path.basename(input_file)
+        if isinstance(outcome, Exception):
+            failed_files += 1
+            name = name if len(name) <= 38 else name[:35] + "..."
+            print(f"{name:<40}  FAILED: {outcome}")
+            continue
+        for result in outcome:
+            label = f"{name} [{result.target_lang}]" if len(target_langs) > 1 else name
+            label = label if len(label) <= 38 else label[:35] + "..."
+            total_cues += result.total
+            total_requests += result.requests
+            cue_errors += result.errors
+            rate = result.total / result.duration if result.duration > 0 else 0.0
+            print(f"{label:<40}{result.total:>8}{result.reused:>8}{result.errors:>8}{result.requests:>10}{result.duration:>10.1f}{rate:>9.1f}")
+    print("-" * 20)
+    overall_rate = total_cues / wall_time if wall_time > 0 else 0.0
+    print(f"{len(input_files) - failed_files} of {len(input_files)} files translated, {total_cues} cues "
+          f"({cue_errors} errors) in {wall_time:.1f}s: {overall_rate:.1f} cues/s, {total_requests} requests.")
+    if cache is not None:
+        print(cache.summary())
+        cache.close()
+    if memory is not None:
+        print(memory.summary())
+        memory.close()
+    print(engine.summary())
+    print(controller.summary())
+    print(policy.summary())
+    if backends.summary():
+        print(backends.summary())
+    print(metrics.summary())
+
+    files = []
+    for input_file, outcome in zip(input_files, outcomes):
+        if isinstance(outcome, Exception):
+            files.append({"input_file": input_file, "error": str(outcome)})
+            continue
+        for result in outcome:
+            files.append({"input_file": input_file, "target_lang": result.target_lang, "output_file": result.output_file,
+                          "cues": result.total, "errors": result.errors, "unsent": result.unsent, "untranslated": result.untranslated, "resumed": result.resumed, "reused": result.reused, "cached": result.cached, "remembered": result.remembered,
+                          "requests": result.requests, "duration_seconds": round(result.duration, 3)})
+    run_info = {"source_lang": args.source_lang, "target_lang": ",".join(target_langs), "model": DEFAULT_MODEL,
+                "engine": engine.name, "stream": args.stream, "combined": args.combined, "incremental": args.incremental, "max_concurrency": args.max_concurrency, "batch_size": args.batch_size,
+                "prompt_version": layout.version, "glossary_terms": len(layout.glossary),
+                "backends": backends.snapshot(), "retry_policy": policy.snapshot(),
+                "translation_memory": memory.stats() if memory is not None else None,
+                "wall_seconds": round(wall_time, 3), "files": files}
+    try:
+        if args.metrics_report:
+            metrics.write_report(args.metrics_report, run_info)
+            print(f"Metrics report saved to: {args.metrics_report}")
+        if args.prometheus:
+            metrics.write_prometheus(args.prometheus)
+            print(f"Prometheus metrics saved to: {args.prometheus}")
+    except OSError as e:
+        print(f"Warning: Could not write metrics: {e}")
+    return 0 if failed_files == 0 and cue_errors == 0 else 1
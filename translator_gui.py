@@ -0,0 +1,670 @@
+"""
+The QuickTranslator window. All translation work is done by translator_core, which
+this module drives from a background thread.
+"""
+import tkinter as tk
+from tkinter import ttk, filedialog, messagebox, scrolledtext
+import threading
+import queue
+import os
+import time
+import sqlite3
+import collections
+
+import translator_core # The per-run objects (backend_pool, request_metrics) are read through the module, as each run replaces them
+from translator_core import (AsyncioEngine, DEFAULT_BATCH_SIZE, DEFAULT_ENGINE, DEFAULT_MAX_THREADS, DEFAULT_MEMORY_THRESHOLD,
+                             DEFAULT_MODEL, DEFAULT_REQUESTS_PER_MINUTE, DEFAULT_SOURCE_LANG, DEFAULT_TARGET_LANG,
+                             DEFAULT_TOKENS_PER_MINUTE, TRANSLATION_ENGINES, TranslationCache, TranslationCancelled,
+                             TranslationMemory, aiohttp_available, cancel_run, configure_backends, configure_cancellation,
+                             configure_prompt_layout, configure_rate_controller, configure_request_metrics,
+                             configure_retry_policy, hit_rate_text, load_glossary, ms_to_timestamp, output_path_for,
+                             parse_target_langs, parse_time_range, time_to_ms, translate_srt_targets)
+
+# --- Constants ---
+GUI_REFRESH_MS = 100 # How often the GUI drains the log and shows the latest progress
+GUI_LOG_MAX_LINES = 5000 # Lines kept in the GUI log; older lines are trimmed (save the full log to a file)
+ETA_WINDOW_SECONDS = 30 # Cues/s and ETA are measured over this trailing window
+
+
+# --- GUI Class (Mostly unchanged, but uses NativeSrtParser) ---
+
+class TranslatorApp:
+    def __init__(self, root):
+        self.root = root
+        self.root.title("DeepSeek SRT Translator (Native Parser) v1.1") # Version bump
+        self.root.geometry("650x820")
+        self.root.minsize(650, 560)
+
+        self.style = ttk.Style(self.root)
+        self.style.theme_use('clam')
+
+        # --- Settings (tabs keep the window short enough for small screens) ---
+        settings = ttk.Notebook(self.root)
+        settings.pack(padx=10, pady=10, fill="x")
+        input_frame = ttk.Frame(settings, padding="10")
+        options_frame = ttk.Frame(settings, padding="10")
+        advanced_frame = ttk.Frame(settings, padding="10")
+        settings.add(input_frame, text="Settings")
+        settings.add(options_frame, text="Options")
+        settings.add(advanced_frame, text="Advanced")
+
+        # (API Key, Languages, Max Threads - same as before)
+        ttk.Label(input_frame, text="DeepSeek API Key:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.api_key_var = tk.StringVar()
+        self.api_key_entry = ttk.Entry(input_frame, textvariable=self.api_key_var, width=40, show="*")
+        self.api_key_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        ttk.Label(input_frame, text="Source Language:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.source_lang_var = tk.StringVar(value=DEFAULT_SOURCE_LANG)
+        self.source_lang_entry = ttk.Entry(input_frame, textvariable=self.source_lang_var, width=10)
+        self.source_lang_entry.grid(row=1, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(input_frame, text="Target Language(s):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.target_lang_var = tk.StringVar(value=DEFAULT_TARGET_LANG)
+        self.target_lang_entry = ttk.Entry(input_frame, textvariable=self.target_lang_var, width=30)
+        self.target_lang_entry.grid(row=2, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(input_frame, text="Max Threads:").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.max_threads_var = tk.IntVar(value=DEFAULT_MAX_THREADS)
+        self.max_threads_spinbox = ttk.Spinbox(input_frame, from_=1, to=500, textvariable=self.max_threads_var, width=8)
+        self.max_threads_spinbox.grid(row=3, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(input_frame, text="Cues per Request:").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.batch_size_var = tk.IntVar(value=DEFAULT_BATCH_SIZE)
+        self.batch_size_spinbox = ttk.Spinbox(input_frame, from_=1, to=200, textvariable=self.batch_size_var, width=8)
+        self.batch_size_spinbox.grid(row=4, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(input_frame, text="Engine:").grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        self.engine_var = tk.StringVar(value=DEFAULT_ENGINE)
+        self.engine_combo = ttk.Combobox(input_frame, textvariable=self.engine_var, values=list(TRANSLATION_ENGINES), state="readonly", width=10)
+        self.engine_combo.grid(row=5, column=1, padx=5, pady=5, sticky="w")
+        ttk.Label(input_frame, text="Requests / Tokens per Minute:").grid(row=6, column=0, padx=5, pady=5, sticky="w")
+        rate_frame = ttk.Frame(input_frame)
+        rate_frame.grid(row=6, column=1, padx=5, pady=5, sticky="w")
+        self.rpm_var = tk.IntVar(value=DEFAULT_REQUESTS_PER_MINUTE)
+        self.rpm_entry = ttk.Entry(rate_frame, textvariable=self.rpm_var, width=8)
+        self.rpm_entry.pack(side="left")
+        self.tpm_var = tk.IntVar(value=DEFAULT_TOKENS_PER_MINUTE)
+        self.tpm_entry = ttk.Entry(rate_frame, textvariable=self.tpm_var, width=10)
+        self.tpm_entry.pack(side="left", padx=5)
+        ttk.Label(rate_frame, text="(0 = unlimited)").pack(side="left")
+        input_frame.columnconfigure(1, weight=1)
+
+        self.use_cache_var = tk.BooleanVar(value=True)
+        self.use_cache_check = ttk.Checkbutton(options_frame, text="Reuse cached translations", variable=self.use_cache_var)
+        self.use_cache_check.grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.http2_var = tk.BooleanVar(value=False)
+        self.http2_check = ttk.Checkbutton(options_frame, text="Use HTTP/2 (requires httpx[http2])", variable=self.http2_var)
+        self.http2_check.grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.save_report_var = tk.BooleanVar(value=True)
+        self.save_report_check = ttk.Checkbutton(options_frame, text="Save metrics report (<output>.metrics.json)", variable=self.save_report_var)
+        self.save_report_check.grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.save_log_var = tk.BooleanVar(value=False)
+        self.save_log_check = ttk.Checkbutton(options_frame, text="Save full log (<output>.log)", variable=self.save_log_var)
+        self.save_log_check.grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.stream_var = tk.BooleanVar(value=False)
+        self.stream_check = ttk.Checkbutton(options_frame, text="Stream replies (stop runaway replies early)", variable=self.stream_var)
+        self.stream_check.grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        self.combined_var = tk.BooleanVar(value=False)
+        self.combined_check = ttk.Checkbutton(options_frame, text="Several languages: ask for all in one request", variable=self.combined_var)
+        self.combined_check.grid(row=5, column=0, padx=5, pady=5, sticky="w")
+        self.incremental_var = tk.BooleanVar(value=False)
+        self.incremental_check = ttk.Checkbutton(options_frame, text="Incremental: reuse translations of unchanged cues (<output>.manifest.json)", variable=self.incremental_var)
+        self.incremental_check.grid(row=6, column=0, padx=5, pady=5, sticky="w")
+
+        ttk.Label(advanced_frame, text="Backends (optional):").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.backends_file_var = tk.StringVar()
+        self.backends_file_entry = ttk.Entry(advanced_frame, textvariable=self.backends_file_var, width=40)
+        self.backends_file_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.browse_backends_btn = ttk.Button(advanced_frame, text="Browse...", command=self.browse_backends)
+        self.browse_backends_btn.grid(row=0, column=2, padx=5, pady=5)
+        self.hedge_var = tk.BooleanVar(value=False)
+        self.hedge_check = ttk.Checkbutton(advanced_frame, text="Hedge slow requests on another backend", variable=self.hedge_var)
+        self.hedge_check.grid(row=1, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        memory_frame = ttk.Frame(advanced_frame)
+        memory_frame.grid(row=2, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        self.use_memory_var = tk.BooleanVar(value=False)
+        self.use_memory_check = ttk.Checkbutton(memory_frame, text="Reuse translations of near-identical lines, similarity", variable=self.use_memory_var)
+        self.use_memory_check.pack(side="left")
+        self.memory_threshold_var = tk.DoubleVar(value=DEFAULT_MEMORY_THRESHOLD)
+        self.memory_threshold_spinbox = ttk.Spinbox(memory_frame, from_=0.5, to=1.0, increment=0.01, textvariable=self.memory_threshold_var, width=5)
+        self.memory_threshold_spinbox.pack(side="left", padx=5)
+        ttk.Label(advanced_frame, text="Translate First (optional):").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        priority_frame = ttk.Frame(advanced_frame)
+        priority_frame.grid(row=3, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        self.priority_range_var = tk.StringVar()
+        self.priority_range_entry = ttk.Entry(priority_frame, textvariable=self.priority_range_var, width=20)
+        self.priority_range_entry.pack(side="left")
+        ttk.Label(priority_frame, text="(time range, e.g. 40:00-45:00)").pack(side="left", padx=5)
+        ttk.Label(advanced_frame, text="Stop After (optional):").grid(row=4, column=0, padx=5, pady=5, sticky="w")
+        deadline_frame = ttk.Frame(advanced_frame)
+        deadline_frame.grid(row=4, column=1, columnspan=2, padx=5, pady=5, sticky="w")
+        self.run_deadline_var = tk.StringVar()
+        self.run_deadline_entry = ttk.Entry(deadline_frame, textvariable=self.run_deadline_var, width=20)
+        self.run_deadline_entry.pack(side="left")
+        ttk.Label(deadline_frame, text="(e.g. 1:30:00; cues left then are marked as errors)").pack(side="left", padx=5)
+        advanced_frame.columnconfigure(1, weight=1)
+
+        # --- File Frame ---
+        file_frame = ttk.LabelFrame(self.root, text="Files", padding="10")
+        file_frame.pack(padx=10, pady=5, fill="x")
+        # (Input/Output File selection - same as before)
+        ttk.Label(file_frame, text="Input SRT File:").grid(row=0, column=0, padx=5, pady=5, sticky="w")
+        self.input_file_var = tk.StringVar()
+        self.input_file_entry = ttk.Entry(file_frame, textvariable=self.input_file_var, state="readonly", width=50)
+        self.input_file_entry.grid(row=0, column=1, padx=5, pady=5, sticky="ew")
+        self.browse_input_btn = ttk.Button(file_frame, text="Browse...", command=self.browse_input)
+        self.browse_input_btn.grid(row=0, column=2, padx=5, pady=5)
+        ttk.Label(file_frame, text="Output SRT File:").grid(row=1, column=0, padx=5, pady=5, sticky="w")
+        self.output_file_var = tk.StringVar()
+        self.output_file_entry = ttk.Entry(file_frame, textvariable=self.output_file_var, state="readonly", width=50)
+        self.output_file_entry.grid(row=1, column=1, padx=5, pady=5, sticky="ew")
+        self.browse_output_btn = ttk.Button(file_frame, text="Save As...", command=self.browse_output)
+        self.browse_output_btn.grid(row=1, column=2, padx=5, pady=5)
+        ttk.Label(file_frame, text="Glossary (optional):").grid(row=2, column=0, padx=5, pady=5, sticky="w")
+        self.glossary_file_var = tk.StringVar()
+        self.glossary_file_entry = ttk.Entry(file_frame, textvariable=self.glossary_file_var, width=50)
+        self.glossary_file_entry.grid(row=2, column=1, padx=5, pady=5, sticky="ew")
+        self.browse_glossary_btn = ttk.Button(file_frame, text="Browse...", command=lambda: self.browse_text_file(self.glossary_file_var, "Select Glossary File"))
+        self.browse_glossary_btn.grid(row=2, column=2, padx=5, pady=5)
+        ttk.Label(file_frame, text="Style Guide (optional):").grid(row=3, column=0, padx=5, pady=5, sticky="w")
+        self.style_file_var = tk.StringVar()
+        self.style_file_entry = ttk.Entry(file_frame, textvariable=self.style_file_var, width=50)
+        self.style_file_entry.grid(row=3, column=1, padx=5, pady=5, sticky="ew")
+        self.browse_style_btn = ttk.Button(file_frame, text="Browse...", command=lambda: self.browse_text_file(self.style_file_var, "Select Style Guide File"))
+        self.browse_style_btn.grid(row=3, column=2, padx=5, pady=5)
+        file_frame.columnconfigure(1, weight=1)
+
+        # --- Progress Bar ---
+        self.progress_var = tk.DoubleVar()
+        self.progress_bar = ttk.Progressbar(self.root, variable=self.progress_var, maximum=100)
+        self.progress_bar.pack(padx=10, pady=5, fill="x")
+        self.progress_text_var = tk.StringVar()
+        ttk.Label(self.root, textvariable=self.progress_text_var).pack(padx=10, fill="x")
+
+        # --- Start / Cancel Buttons ---
+        button_frame = ttk.Frame(self.root)
+        button_frame.pack(padx=10, pady=10)
+        self.start_button = ttk.Button(button_frame, text="Start Translation", command=self.start_translation_thread)
+        self.start_button.pack(side="left", padx=5)
+        self.cancel_button = ttk.Button(button_frame, text="Cancel", command=self.cancel_translation, state=tk.DISABLED)
+        self.cancel_button.pack(side="left", padx=5)
+
+        # --- Live Statistics ---
+        stats_frame = ttk.LabelFrame(self.root, text="Statistics", padding="10")
+        stats_frame.pack(padx=10, pady=5, fill="x")
+        self.stats_var = tk.StringVar(value="No requests yet.")
+        ttk.Label(stats_frame, textvariable=self.stats_var, font=("Consolas", 9), justify="left").pack(anchor="w")
+
+        # --- Log Area ---
+        self.log_frame = ttk.LabelFrame(self.root, text="Log", padding="10")
+        self.log_frame.pack(padx=10, pady=10, fill="both", expand=True)
+        self.log_area = scrolledtext.ScrolledText(self.log_frame, wrap=tk.WORD, height=10, state="disabled", font=("Consolas", 9)) # Monospaced font
+        self.log_area.pack(fill="both", expand=True)
+
+        # --- Queues for Thread Communication ---
+        self.log_queue = queue.Queue()
+        self.log_lines_total = 0
+        self.log_file = None # Optional copy of every log line, written by log_message
+        self.log_file_lock = threading.Lock()
+        self.latest_progress = (0, None, None) # Only the newest value is shown
+        self.shown_progress = self.latest_progress
+        self.progress_samples = collections.deque() # (time, processed cues) for cues/s and ETA
+
+        # Start checking the queues
+        self.root.after(GUI_REFRESH_MS, self.process_log_queue)
+        self.root.after(GUI_REFRESH_MS, self.refresh_progress)
+        self.root.after(1000, self.refresh_stats)
+
+    # --- GUI Helper Methods (log, progress, browse, set_ui_state - same as before) ---
+    def log_message(self, message):
+        """Adds a message to the log area and the optional log file (thread-safe)."""
+        with self.log_file_lock:
+            if self.log_file:
+                self.log_file.write(message + "\n")
+        self.log_queue.put(message)
+
+    def update_progress(self, value, processed=None, total=None):
+        """Records the latest progress (thread-safe); the main thread shows only the newest value."""
+        self.latest_progress = (value, processed, total)
+
+    def process_log_queue(self):
+        """Moves all queued messages into the log area with one insert, keeping the last GUI_LOG_MAX_LINES lines."""
+        try:
+            messages = []
+            try:
+                while True:
+                    messages.append(self.log_queue.get_nowait())
+            except queue.Empty:
+                pass
+            if messages:
+                self.log_lines_total += len(messages)
+                messages = messages[-GUI_LOG_MAX_LINES:] # Anything older would be trimmed right away
+                self.log_area.config(state="normal")
+                self.log_area.insert(tk.END, "\n".join(messages) + "\n")
+                excess = int(self.log_area.index("end-1c").split(".")[0]) - 1 - GUI_LOG_MAX_LINES
+                if excess > 0:
+                    self.log_area.delete("1.0", f"{excess + 1}.0")
+                    self.log_frame.config(text=f"Log (last {GUI_LOG_MAX_LINES} lines of {self.log_lines_total} messages)")
+                self.log_area.see(tk.END) # Scroll to the bottom
+                self.log_area.config(state="disabled")
+        finally:
+            self.root.after(GUI_REFRESH_MS, self.process_log_queue) # Reschedule
+
+    def refresh_progress(self):
+        """Shows the newest progress value with cues/s and ETA, skipping intermediate values."""
+        try:
+            latest = self.latest_progress
+            if latest is not self.shown_progress:
+                self.shown_progress = latest
+                value, processed, total = latest
+                self.progress_var.set(value)
+                if processed is not None and total:
+                    self.progress_text_var.set(self.progress_readout(processed, total))
+        finally:
+            self.root.after(GUI_REFRESH_MS, self.refresh_progress) # Reschedule
+
+    def progress_readout(self, processed, total):
+        """Formats 'processed / total cues, rate, ETA' with the rate taken over the last ETA_WINDOW_SECONDS."""
+        now = time.monotonic()
+        samples = self.progress_samples
+        samples.append((now, processed))
+        while len(samples) > 2 and now - samples[0][0] > ETA_WINDOW_SECONDS:
+            samples.popleft()
+        readout = f"{processed} / {total} cues"
+        first_time, first_processed = samples[0]
+        if now > first_time and processed > first_processed:
+            rate = (processed - first_processed) / (now - first_time)
+            minutes, seconds = divmod(int((total - processed) / rate), 60)
+            hours, minutes = divmod(minutes, 60)
+            eta = f"{hours}h {minutes:02d}m" if hours else f"{minutes}m {seconds:02d}s"
+            readout += f"  |  {rate:.1f} cues/s  |  ETA {eta}"
+        return readout
+
+    def refresh_stats(self):
+        """Shows the current run's request metrics in the statistics panel."""
+        try:
+            stats = translator_core.request_metrics.snapshot()
+            if stats["attempts"]:
+                latency = stats["attempt_latency_seconds"]
+                tokens = stats["tokens"]
+                first_token = stats["first_token_seconds"]
+                statuses = ", ".join(f"{code}: {count}" for code, count in sorted(stats["status_codes"].items()))
+                self.stats_var.set(
+                    f"Requests: {stats['requests']} done, {stats['failed_requests']} failed, {stats['retries']} retries "
+                    f"({stats['requests_per_second']:.1f}/s)\n"
+                    f"Latency p50/p95/p99: {latency['p50']:.2f} / {latency['p95']:.2f} / {latency['p99']:.2f} s "
+                    f"(max {latency['max']:.2f} s)\n"
+                    f"Tokens: {tokens['prompt']} prompt ({hit_rate_text(stats)}), {tokens['completion']} completion\n"
+                    f"Time to first token p50/p95: {first_token['p50']:.2f} / {first_token['p95']:.2f} s  |  "
+                    f"over budget: {stats['truncated_replies']}, stopped early: {stats['aborted_replies']}\n"
+                    f"Status codes: {statuses}"
+                    + (f"\n{translator_core.backend_pool.summary()}" if translator_core.backend_pool.summary() else ""))
+        finally:
+            self.root.after(1000, self.refresh_stats) # Reschedule
+
+    def browse_input(self):
+        filepath = filedialog.askopenfilename(
+            title="Select Input SRT File",
+            filetypes=(("SRT files", "*.srt"), ("All files", "*.*"))
+        )
+        if filepath:
+            self.input_file_var.set(filepath)
+            if not self.output_file_var.get():
+                base, ext = os.path.splitext(filepath)
+                target_lang = (parse_target_langs(self.target_lang_var.get()) or [DEFAULT_TARGET_LANG])[0]
+                suggested_output = f"{base}_{target_lang}{ext}"
+                self.output_file_var.set(suggested_output)
+
+    def browse_output(self):
+        filepath = filedialog.asksaveasfilename(
+            title="Save Translated SRT File As",
+            filetypes=(("SRT files", "*.srt"), ("All files", "*.*")),
+            defaultextension=".srt",
+            initialfile=os.path.basename(self.output_file_var.get() or "translated.srt")
+        )
+        if filepath:
+            self.output_file_var.set(filepath)
+
+    def browse_backends(self):
+        filepath = filedialog.askopenfilename(
+            title="Select Backends File",
+            filetypes=(("JSON files", "*.json"), ("All files", "*.*"))
+        )
+        if filepath:
+            self.backends_file_var.set(filepath)
+
+    def browse_text_file(self, variable, title):
+        filepath = filedialog.askopenfilename(
+            title=title,
+            filetypes=(("Text files", "*.txt"), ("All files", "*.*"))
+        )
+        if filepath:
+            variable.set(filepath)
+
+    def set_ui_state(self, enabled):
+        """Enable or disable UI elements during processing."""
+        state = tk.NORMAL if enabled else tk.DISABLED
+        readonly_state = tk.NORMAL if enabled else 'readonly' # Keep readable
+
+        self.browse_input_btn.config(state=state)
+        self.browse_output_btn.config(state=state)
+        self.browse_glossary_btn.config(state=state)
+        self.browse_style_btn.config(state=state)
+        self.glossary_file_entry.config(state=readonly_state)
+        self.style_file_entry.config(state=readonly_state)
+        self.browse_backends_btn.config(state=state)
+        self.backends_file_entry.config(state=readonly_state)
+        self.start_button.config(state=state)
+        self.cancel_button.config(state=tk.DISABLED if enabled else tk.NORMAL)
+        self.priority_range_entry.config(state=readonly_state)
+        self.run_deadline_entry.config(state=readonly_state)
+        self.api_key_entry.config(state=readonly_state)
+        self.source_lang_entry.config(state=readonly_state)
+        self.target_lang_entry.config(state=readonly_state)
+        self.max_threads_spinbox.config(state=readonly_state)
+        self.batch_size_spinbox.config(state=readonly_state)
+        self.use_cache_check.config(state=state)
+        self.http2_check.config(state=state)
+        self.engine_combo.config(state="readonly" if enabled else tk.DISABLED)
+        self.rpm_entry.config(state=readonly_state)
+        self.tpm_entry.config(state=readonly_state)
+        self.save_report_check.config(state=state)
+        self.save_log_check.config(state=state)
+        self.stream_check.config(state=state)
+        self.hedge_check.config(state=state)
+        self.combined_check.config(state=state)
+        self.incremental_check.config(state=state)
+        self.use_memory_check.config(state=state)
+        self.memory_threshold_spinbox.config(state=readonly_state)
+        # File entries remain readonly always
+        # self.input_file_entry.config(state=readonly_state)
+        # self.output_file_entry.config(state=readonly_state)
+
+    # --- Translation Trigger ---
+    def start_translation_thread(self):
+        """Validates inputs and starts the translation in a separate thread."""
+        api_key = self.api_key_var.get()
+        input_file = self.input_file_var.get()
+        output_file = self.output_file_var.get()
+        source_lang = self.source_lang_var.get() or DEFAULT_SOURCE_LANG
+        target_lang = self.target_lang_var.get() or DEFAULT_TARGET_LANG
+        max_threads = self.max_threads_var.get()
+        batch_size = self.batch_size_var.get()
+        use_cache = self.use_cache_var.get()
+        http2 = self.http2_var.get()
+        engine_name = self.engine_var.get() or DEFAULT_ENGINE
+        save_report = self.save_report_var.get()
+        save_log = self.save_log_var.get()
+        stream = self.stream_var.get()
+        combined = self.combined_var.get()
+        incremental = self.incremental_var.get()
+        use_memory = self.use_memory_var.get()
+        try:
+            memory_threshold = self.memory_threshold_var.get()
+        except tk.TclError:
+            messagebox.showerror("Error", "The translation memory similarity must be a number.")
+            return
+        if not 0 < memory_threshold <= 1:
+            messagebox.showerror("Error", "The translation memory similarity must be greater than 0 and at most 1.")
+            return
+        try:
+            priority_range = parse_time_range(self.priority_range_var.get()) if self.priority_range_var.get().strip() else None
+            run_deadline = time_to_ms(self.run_deadline_var.get()) / 1000 if self.run_deadline_var.get().strip() else None
+        except ValueError as e:
+            messagebox.showerror("Error", str(e))
+            return
+        if run_deadline is not None and run_deadline <= 0:
+            messagebox.showerror("Error", "Stop After must be longer than 0 seconds.")
+            return
+        try:
+            requests_per_minute = self.rpm_var.get()
+            tokens_per_minute = self.tpm_var.get()
+        except tk.TclError:
+            messagebox.showerror("Error", "Requests and tokens per minute must be whole numbers.")
+            return
+
+        # Validation (same as before)
+        if not api_key:
+            messagebox.showerror("Error", "Please enter your DeepSeek API Key.")
+            return
+        if not input_file: # Check only if it's set, existence checked in run_translation
+            messagebox.showerror("Error", "Please select an input SRT file.")
+            return
+        if not output_file:
+            messagebox.showerror("Error", "Please specify an output SRT file path.")
+            return
+        if not parse_target_langs(target_lang):
+             messagebox.showerror("Error", "Please specify a target language.")
+             return
+        if max_threads <= 0:
+             messagebox.showerror("Error", "Max threads must be greater than 0.")
+             return
+        if batch_size <= 0:
+             messagebox.showerror("Error", "Cues per request must be greater than 0.")
+             return
+        if requests_per_minute < 0 or tokens_per_minute < 0:
+             messagebox.showerror("Error", "Requests and tokens per minute cannot be negative.")
+             return
+        if engine_name == AsyncioEngine.name and not aiohttp_available():
+             messagebox.showerror("Error", "The asyncio engine requires the 'aiohttp' package (pip install aiohttp).")
+             return
+        glossary_file = self.glossary_file_var.get().strip()
+        style_file = self.style_file_var.get().strip()
+        try:
+            glossary = load_glossary(glossary_file) if glossary_file else None
+            if style_file:
+                with open(style_file, 'r', encoding='utf-8-sig') as f:
+                    style_guide = f.read()
+            else:
+                style_guide = None
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not read the glossary or style guide:\n{e}")
+            return
+        backends_file = self.backends_file_var.get().strip()
+        try:
+            # Checked here so a bad file is reported before the run starts; unticked hedging leaves the file's setting
+            configure_backends(backends_file or None, self.hedge_var.get() or None, max_threads, self.log_message)
+        except (OSError, ValueError) as e:
+            messagebox.showerror("Error", f"Could not read the backends file:\n{e}")
+            return
+
+        # Disable UI, Clear Log, Reset Progress
+        configure_cancellation()
+        self.set_ui_state(False)
+        self.log_area.config(state="normal")
+        self.log_area.delete(1.0, tk.END)
+        self.log_area.config(state="disabled")
+        self.log_lines_total = 0
+        self.log_frame.config(text="Log")
+        self.progress_var.set(0)
+        self.latest_progress = self.shown_progress = (0, None, None)
+        self.progress_samples.clear()
+        self.progress_text_var.set("")
+        self.stats_var.set("No requests yet.")
+
+        # Start background thread
+        thread = threading.Thread(
+            target=self.run_translation,
+            args=(api_key, input_file, output_file, source_lang, target_lang, max_threads, batch_size, use_cache, http2, engine_name,
+                  requests_per_minute, tokens_per_minute, save_report, save_log, stream, glossary, style_guide, combined,
+                  incremental, use_memory, priority_range, run_deadline, memory_threshold),
+            daemon=True
+        )
+        thread.start()
+
+    # --- Main Translation Logic in Thread ---
+    def run_translation(self, api_key, input_file, output_file, source_lang, target_lang, max_threads, batch_size=DEFAULT_BATCH_SIZE, use_cache=True, http2=False, engine_name=DEFAULT_ENGINE,
+                        requests_per_minute=DEFAULT_REQUESTS_PER_MINUTE, tokens_per_minute=DEFAULT_TOKENS_PER_MINUTE, save_report=True, save_log=False, stream=False,
+                        glossary=None, style_guide=None, combined=False, incremental=False, use_memory=False, priority_range=None,
+                        run_deadline=None, memory_threshold=DEFAULT_MEMORY_THRESHOLD):
+        """
+        The actual translation logic executed in the background thread.
+        target_lang may list several languages separated by commas; output_file is then used for
+        the first one's log and report, and every language is written next to it as <input>_<lang>.srt.
+        """
+        cache = None
+        memory = None
+        engine = None
+        target_langs = parse_target_langs(target_lang)
+        if len(target_langs) > 1:
+            output_files = {language: output_path_for(input_file, language, os.path.dirname(output_file))
+                            for language in target_langs}
+        else:
+            output_files = {target_langs[0]: output_file}
+        try:
+            if save_log:
+                try:
+                    with self.log_file_lock:
+                        self.log_file = open(f"{output_file}.log", "w", encoding="utf-8")
+                except OSError as e:
+                    self.log_message(f"Warning: Could not open log file, logging to the window only: {e}")
+            self.log_message(f"Starting translation...")
+            self.log_message(f"Input: {input_file}")
+            for output_path in output_files.values():
+                self.log_message(f"Output: {output_path}")
+            self.log_message(f"Source Lang: {source_lang}, Target Lang: {', '.join(target_langs)}"
+                             f"{' (all in one request)' if combined and len(target_langs) > 1 else ''}")
+            self.log_message(f"Max Threads: {max_threads}")
+            self.log_message(f"Cues per Request: {batch_size}")
+            self.log_message(f"Translation Cache: {'On' if use_cache else 'Off'}, Translation Memory: {'On' if use_memory else 'Off'}")
+            self.log_message(f"Engine: {engine_name}")
+            self.log_message(f"Streaming Replies: {'On' if stream else 'Off'}")
+            self.log_message(f"Incremental: {'On' if incremental else 'Off'}")
+            if priority_range:
+                self.log_message(f"Translate First: {ms_to_timestamp(priority_range[0])} - {ms_to_timestamp(priority_range[1])}")
+            if run_deadline:
+                self.log_message(f"Stop After: {run_deadline:g}s")
+            self.log_message(f"Glossary: {f'{len(glossary)} terms' if glossary else 'None'}, Style Guide: {'Yes' if style_guide else 'None'}")
+            backends = translator_core.backend_pool
+            if backends.configured:
+                self.log_message(f"Backends: {backends.describe()}")
+            self.log_message(f"Rate Limits: {requests_per_minute or 'unlimited'} requests/min, {tokens_per_minute or 'unlimited'} tokens/min")
+            self.log_message(f"Using Native SRT Parser.")
+            self.log_message("-" * 20)
+
+            start_time = time.time()
+
+            if use_cache:
+                try:
+                    cache = TranslationCache()
+                except (sqlite3.Error, OSError) as e:
+                    self.log_message(f"Warning: Translation cache unavailable, continuing without it: {e}")
+            if use_memory:
+                try:
+                    memory = TranslationMemory(threshold=memory_threshold)
+                except (sqlite3.Error, OSError) as e:
+                    self.log_message(f"Warning: Translation memory unavailable, continuing without it: {e}")
+            engine = TRANSLATION_ENGINES[engine_name](max_threads, http2, self.log_message, stream)
+            controller = configure_rate_controller(max_threads, requests_per_minute, tokens_per_minute, self.log_message)
+            metrics = configure_request_metrics()
+            policy = configure_retry_policy(run_deadline, self.log_message)
+            layout = configure_prompt_layout(glossary, style_guide)
+
+            # Pass self.log_message so parser warnings and per-cue errors appear in the GUI log
+            results = translate_srt_targets(input_file, output_files, api_key, source_lang, engine, batch_size, cache,
+                                            self.log_message, self.update_progress, combined=combined, incremental=incremental,
+                                            memory=memory, priority_range=priority_range)
+            total = sum(result.total for result in results.values())
+            errors = sum(result.errors for result in results.values())
+
+            if total:
+                if cache is not None:
+                    self.log_message(cache.summary())
+                if memory is not None:
+                    self.log_message(memory.summary())
+                self.log_message(engine.summary())
+                self.log_message(controller.summary())
+                self.log_message(policy.summary())
+                if backends.summary():
+                    self.log_message(backends.summary())
+                self.log_message(metrics.summary())
+                if save_report:
+                    report_path = f"{output_file}.metrics.json"
+                    try:
+                        metrics.write_report(report_path, {
+                            "input_file": input_file, "source_lang": source_lang, "model": DEFAULT_MODEL,
+                            "engine": engine_name, "stream": stream, "combined": combined, "incremental": incremental,
+                            "max_threads": max_threads, "batch_size": batch_size,
+                            "prompt_version": layout.version, "glossary_terms": len(layout.glossary),
+                            "backends": backends.snapshot(), "retry_policy": policy.snapshot(),
+                            "translation_memory": memory.stats() if memory is not None else None,
+                            "outputs": [{"target_lang": language, "output_file": result.output_file, "cues": result.total,
+                                         "errors": result.errors, "unsent": result.unsent, "untranslated": result.untranslated, "resumed": result.resumed, "reused": result.reused, "cached": result.cached,
+                                         "remembered": result.remembered, "requests": result.requests, "duration_seconds": round(result.duration, 3)}
+                                        for language, result in results.items()]})
+                        self.log_message(f"Metrics report saved to: {report_path}")
+                    except OSError as e:
+                        self.log_message(f"Warning: Could not write metrics report: {e}")
+            self.finish_translation(start_time, total, errors, saved_to=", ".join(output_files.values()))
+
+        except TranslationCancelled:
+            self.log_message("\n--- Translation Cancelled ---")
+            self.log_message("Cues finished so far were kept; start again with the same settings to translate the rest.")
+            self.root.after(0, lambda: self.set_ui_state(True))
+        except FileNotFoundError as e:
+             self.log_message(f"\n--- Translation Failed ---")
+             self.log_message(f"Error: {e}")
+             self.root.after(0, lambda: self.set_ui_state(True))
+             self.root.after(0, lambda: messagebox.showerror("File Error", f"Could not find input file:\n{e}"))
+        except ValueError as e: # Catch parsing/composing errors
+             self.log_message(f"\n--- Translation Failed ---")
+             self.log_message(f"Error: {e}")
+             self.root.after(0, lambda: self.set_ui_state(True))
+             self.root.after(0, lambda: messagebox.showerror("File Processing Error", f"Error processing SRT file:\n{e}"))
+        except Exception as e:
+            self.log_message(f"\n--- Translation Failed ---")
+            self.log_message(f"Error: {e}")
+            import traceback
+            self.log_message(f"Traceback:\n{traceback.format_exc()}")
+            self.root.after(0, lambda: self.set_ui_state(True))
+            self.root.after(0, lambda: messagebox.showerror("Translation Failed", f"An unexpected error occurred:\n{e}"))
+        finally:
+            if engine:
+                engine.close()
+            if cache is not None:
+                cache.close()
+            if memory is not None:
+                memory.close()
+            translator_core.backend_pool.close()
+            with self.log_file_lock:
+                if self.log_file:
+                    self.log_file.close()
+                    self.log_file = None
+
+    def cancel_translation(self):
+        """Stops the running translation; the run thread then reports and re-enables the UI."""
+        cancel_run()
+        self.cancel_button.config(state=tk.DISABLED)
+        self.log_message("Cancelling: no new requests will be sent...")
+
+    # --- Completion Handling (Unchanged) ---
+    def finish_translation(self, start_time, total_subs, error_count, success=True, saved_to=None):
+        """Logs completion message and re-enables UI."""
+        saved_to = saved_to or self.output_file_var.get()
+        end_time = time.time()
+        duration = end_time - start_time
+        self.log_message("-" * 20)
+        if success:
+            if total_subs > 0 :
+                 success_count = total_subs - error_count
+                 self.log_message(f"Translation complete!")
+                 self.log_message(f"Processed {total_subs} subtitles ({success_count} successful, {error_count} errors) in {duration:.2f} seconds.")
+                 self.log_message(f"Translated file saved to: {saved_to}")
+                 if error_count == 0:
+                     self.root.after(0, lambda: messagebox.showinfo("Success", f"Translation successful!\nSaved to {saved_to}"))
+                 else:
+                     self.root.after(0, lambda: messagebox.showwarning("Partial Success", f"Translation finished with {error_count} errors.\nCheck log for details.\nSaved to {saved_to}"))
+            else:
+                 self.log_message(f"Finished. No valid subtitle entries were found in the input file.")
+                 self.root.after(0, lambda: messagebox.showinfo("Finished", "Operation complete. No subtitles found or processed."))
+
+            self.update_progress(100)
+        # Re-enable UI (scheduled in main thread)
+        self.root.after(0, lambda: self.set_ui_state(True))
+
+
+def main():
+    """Opens the window and runs the Tk event loop until it is closed."""
+    root = tk.Tk()
+    TranslatorApp(root)
+    root.mainloop()
+
+
+if __name__ == "__main__":
+    main()